@@ -53,6 +53,19 @@ class User(BaseModel):
         
         return '/static/avatar-default.svg'
 
+class AuthContext(BaseModel):
+    """Authentication resolved once per request (user and valid access token)"""
+    user: Optional[User] = None
+    token: Optional[str] = None
+
+    @property
+    def is_admin(self) -> bool:
+        """Superadmins and users with admin panel access"""
+        if self.user is None:
+            return False
+        access = self.user.system_access
+        return self.user.role == "superadmin" or bool(access and (access.is_superadmin or access.can_access_admin))
+
 class UserProfile(BaseModel):
     id: Optional[str] = None
     username: str
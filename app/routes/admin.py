@@ -1,28 +1,28 @@
 """
 Admin routes for Opera Panel
 """
+import logging
+
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 
 from app.models.auth import User
-from app.services.auth import get_current_user_optional
+from app.services.auth import get_auth_context
 from app.services.stardust_api import stardust_api
+from app.services.tracing import TracedTemplates
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+templates = TracedTemplates(directory="app/templates")
 
 @router.get("/patients", response_class=HTMLResponse)
 async def patients_list(request: Request):
     """Patients management page"""
     # Check authentication via session
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login")
-    
-    user = await get_current_user_optional(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user:
         return RedirectResponse(url="/login")
+    user, token = auth.user, auth.token
     
     try:
         # Fetch patients from Stardust API
@@ -46,13 +46,10 @@ async def patients_list(request: Request):
 @router.get("/hospitals", response_class=HTMLResponse)
 async def hospitals_list(request: Request):
     """Hospitals management page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login")
-    
-    user = await get_current_user_optional(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user:
         return RedirectResponse(url="/login")
+    user, token = auth.user, auth.token
     
     try:
         # Get filter parameters
@@ -87,9 +84,9 @@ async def hospitals_list(request: Request):
         try:
             provinces_data = await stardust_api.get_provinces(token, 0, 1000)
             provinces = provinces_data.get("data", {}).get("provinces", [])
-            print(f"DEBUG: Fetched {len(provinces)} provinces")
+            logger.debug("Fetched %d provinces", len(provinces))
         except Exception as e:
-            print(f"DEBUG: Error fetching provinces: {e}")
+            logger.warning("Error fetching provinces: %s", e)
             provinces = []
         
         return templates.TemplateResponse("admin/hospitals.html", {
@@ -112,13 +109,10 @@ async def hospitals_list(request: Request):
 @router.get("/audit-logs", response_class=HTMLResponse)
 async def audit_logs(request: Request):
     """Audit logs page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login")
-    
-    user = await get_current_user_optional(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user:
         return RedirectResponse(url="/login")
+    user, token = auth.user, auth.token
     
     try:
         # Fetch audit logs from Stardust API
@@ -142,13 +136,10 @@ async def audit_logs(request: Request):
 @router.get("/settings", response_class=HTMLResponse)
 async def settings(request: Request):
     """Settings page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login")
-    
-    user = await get_current_user_optional(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user:
         return RedirectResponse(url="/login")
+    user, token = auth.user, auth.token
     
     return templates.TemplateResponse("admin/settings.html", {
         "request": request,
@@ -1,7 +1,7 @@
 """
 API routes for Opera Panel CRUD operations
 """
-from fastapi import APIRouter, Request, HTTPException, Form, Depends
+from fastapi import APIRouter, Request, HTTPException, Form, Depends, Query
 from fastapi.responses import RedirectResponse, JSONResponse
 from typing import Optional
 
@@ -10,11 +10,39 @@ from app.models.patient import PatientCreate, PatientUpdate
 from app.models.ava4 import AVA4DeviceCreate, AVA4DeviceUpdate
 from app.models.kati import KatiDeviceCreate, KatiDeviceUpdate
 from app.models.qube_vital import QubeVitalDeviceCreate, QubeVitalDeviceUpdate
-from app.services.auth import get_current_user_optional
+from app.services.auth import get_session_token, get_valid_token
+from app.services.codec import FastJSONResponse
+from app.routes.master_data import MASTER_DATA_TYPES
+from app.services.geography import filter_locations, location_names
+from app.services.spatial import record_point
 from app.services.stardust_api import stardust_api
 
 router = APIRouter()
 
+
+def suggestion_item(record: dict) -> dict:
+    """Compact picker entry: id, code, both names and parent codes when present"""
+    en_name, th_name = location_names(record)
+    item = {"code": record.get("code"), "name": {"en": en_name, "th": th_name}}
+    record_id = record.get("_id") or record.get("id")
+    if record_id is not None:
+        item["id"] = str(record_id)
+    for parent in ("province_code", "district_code"):
+        if record.get(parent) is not None:
+            item[parent] = record[parent]
+    return item
+
+
+def hospital_geo_item(record: dict, distance_km: Optional[float] = None) -> dict:
+    """Map marker entry: picker fields plus coordinates, type, active flag and distance"""
+    item = suggestion_item(record)
+    item["location"] = list(record_point(record) or ())
+    item["hospital_type_code"] = record.get("hospital_type_code")
+    item["is_active"] = record.get("is_active", True)
+    if distance_km is not None:
+        item["distance_km"] = round(distance_km, 3)
+    return item
+
 # ===============================
 # PATIENT CRUD OPERATIONS
 # ===============================
@@ -33,7 +61,7 @@ async def create_patient(
     medical_record_number: Optional[str] = Form(None)
 ):
     """Create new patient"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         return RedirectResponse(url="/login", status_code=302)
     
@@ -74,7 +102,7 @@ async def update_patient(
     patient_data: PatientUpdate
 ):
     """Update patient"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -92,7 +120,7 @@ async def delete_patient(
     request: Request
 ):
     """Delete patient"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -118,7 +146,7 @@ async def create_ava4_device(
     patient_id: Optional[str] = Form(None)
 ):
     """Create new AVA4 device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         return RedirectResponse(url="/login", status_code=302)
     
@@ -153,7 +181,7 @@ async def update_ava4_device(
     device_data: AVA4DeviceUpdate
 ):
     """Update AVA4 device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -171,7 +199,7 @@ async def delete_ava4_device(
     request: Request
 ):
     """Delete AVA4 device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -196,7 +224,7 @@ async def create_kati_device(
     hospital_id: Optional[str] = Form(None)
 ):
     """Create new Kati device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         return RedirectResponse(url="/login", status_code=302)
     
@@ -230,7 +258,7 @@ async def update_kati_device(
     device_data: KatiDeviceUpdate
 ):
     """Update Kati device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -248,7 +276,7 @@ async def delete_kati_device(
     request: Request
 ):
     """Delete Kati device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -273,7 +301,7 @@ async def create_qube_vital_device(
     location: Optional[str] = Form(None)
 ):
     """Create new Qube-Vital device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         return RedirectResponse(url="/login", status_code=302)
     
@@ -307,7 +335,7 @@ async def update_qube_vital_device(
     device_data: QubeVitalDeviceUpdate
 ):
     """Update Qube-Vital device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -325,7 +353,7 @@ async def delete_qube_vital_device(
     request: Request
 ):
     """Delete Qube-Vital device"""
-    token = request.session.get("access_token")
+    token = get_session_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -337,46 +365,138 @@ async def delete_qube_vital_device(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ===============================
+# HOSPITAL GEO QUERIES
+# ===============================
+
+@router.get("/hospitals/nearest")
+async def nearest_hospitals(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100),
+    max_distance_km: Optional[float] = Query(None, gt=0),
+    is_active: Optional[bool] = Query(None),
+    hospital_type_code: Optional[str] = Query(None)
+):
+    """k nearest hospitals to a point, nearest first"""
+    token = await get_valid_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    try:
+        matches = await stardust_api.nearest_hospitals(token, lat, lng, k, max_distance_km,
+                                                       is_active, hospital_type_code)
+        return FastJSONResponse(content={"data": [hospital_geo_item(record, distance) for distance, record in matches]})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/hospitals/within")
+async def hospitals_within(
+    request: Request,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(1000, ge=1, le=10000),
+    is_active: Optional[bool] = Query(None),
+    hospital_type_code: Optional[str] = Query(None)
+):
+    """Hospitals inside a bounding box (e.g. the visible map area)"""
+    token = await get_valid_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="Bounding box minimum must not exceed maximum")
+    
+    try:
+        matches = await stardust_api.hospitals_within(token, min_lat, min_lng, max_lat, max_lng, limit,
+                                                      is_active, hospital_type_code)
+        return FastJSONResponse(content={"data": [hospital_geo_item(record) for record in matches]})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ===============================
 # MASTER DATA DROPDOWN OPERATIONS
 # ===============================
 
+@router.get("/master-data/{data_type}/suggest")
+async def suggest_master_data(
+    request: Request,
+    data_type: str,
+    q: str = Query(..., min_length=1, description="Prefix of a Thai/English name or a code"),
+    limit: int = Query(10, ge=1, le=50),
+    province_code: Optional[int] = Query(None),
+    district_code: Optional[int] = Query(None)
+):
+    """Typeahead suggestions (top-k prefix matches) for master data pickers"""
+    token = await get_valid_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if data_type not in MASTER_DATA_TYPES:
+        raise HTTPException(status_code=404, detail="Master data type not found")
+    
+    try:
+        matches = await stardust_api.suggest_master_data(token, data_type, q, limit, province_code, district_code)
+        return FastJSONResponse(content={"data": [suggestion_item(record) for record in matches]})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/master-data/{data_type}/pages")
+async def get_master_data_pages(
+    request: Request,
+    data_type: str,
+    cursor: str = Query("", description="next_cursor of the previous page; empty for the first page"),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = Query(None),
+    province_code: Optional[int] = Query(None),
+    district_code: Optional[int] = Query(None),
+    sub_district_code: Optional[int] = Query(None)
+):
+    """Keyset (cursor) pages of master data from the in-memory snapshot: every page costs the same"""
+    token = await get_valid_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if data_type not in MASTER_DATA_TYPES:
+        raise HTTPException(status_code=404, detail="Master data type not found")
+    
+    try:
+        page = await stardust_api.get_master_data_page(
+            token, data_type, cursor=cursor, limit=limit, search=search, province_code=province_code,
+            district_code=district_code, sub_district_code=sub_district_code
+        )
+        return FastJSONResponse(content={
+            "data": page.records,
+            "total": page.total,
+            "limit": limit,
+            "next_cursor": page.next_cursor
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/master-data/provinces")
 async def get_provinces_dropdown(request: Request):
     """Get provinces for dropdown"""
-    token = request.session.get("access_token")
+    token = await get_valid_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
     
     try:
-        provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-        
-        # Handle nested structure for provinces
-        if "data" in provinces_response and "provinces" in provinces_response["data"]:
-            provinces = provinces_response["data"]["provinces"]
-        elif "data" in provinces_response and "data" in provinces_response["data"]:
-            provinces = provinces_response["data"]["data"]
-        elif "data" in provinces_response:
-            provinces = provinces_response["data"]
-        else:
-            provinces = []
-        
-        # Normalize data structure
-        normalized_provinces = []
-        for province in provinces:
-            if isinstance(province, dict):
-                normalized_province = province.copy()
-                # Convert en_name/th_name to name structure
-                if 'en_name' in province and 'th_name' in province:
-                    normalized_province['name'] = {
-                        'en': province['en_name'],
-                        'th': province['th_name']
-                    }
-                normalized_provinces.append(normalized_province)
-            else:
-                normalized_provinces.append(province)
-        
-        return JSONResponse(content={"data": normalized_provinces})
+        # Served from the in-process geography cache
+        geography = await stardust_api.geography.get(token)
+        return FastJSONResponse(content={"data": filter_locations(geography.provinces)})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -384,39 +504,13 @@ async def get_provinces_dropdown(request: Request):
 @router.get("/master-data/districts/{province_code}")
 async def get_districts_dropdown(request: Request, province_code: int):
     """Get districts for dropdown by province"""
-    token = request.session.get("access_token")
+    token = await get_valid_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
     
     try:
-        districts_response = await stardust_api.get_districts(token, 0, 1000, None, province_code)
-        
-        # Handle nested structure for districts
-        if "data" in districts_response and "districts" in districts_response["data"]:
-            districts = districts_response["data"]["districts"]
-        elif "data" in districts_response and "data" in districts_response["data"]:
-            districts = districts_response["data"]["data"]
-        elif "data" in districts_response:
-            districts = districts_response["data"]
-        else:
-            districts = []
-        
-        # Normalize data structure
-        normalized_districts = []
-        for district in districts:
-            if isinstance(district, dict):
-                normalized_district = district.copy()
-                # Convert en_name/th_name to name structure
-                if 'en_name' in district and 'th_name' in district:
-                    normalized_district['name'] = {
-                        'en': district['en_name'],
-                        'th': district['th_name']
-                    }
-                normalized_districts.append(normalized_district)
-            else:
-                normalized_districts.append(district)
-        
-        return JSONResponse(content={"data": normalized_districts})
+        geography = await stardust_api.geography.get(token)
+        return FastJSONResponse(content={"data": filter_locations(geography.districts_in(province_code))})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -424,39 +518,13 @@ async def get_districts_dropdown(request: Request, province_code: int):
 @router.get("/master-data/sub-districts/{district_code}")
 async def get_sub_districts_dropdown(request: Request, district_code: int, province_code: int):
     """Get sub-districts for dropdown by district and province"""
-    token = request.session.get("access_token")
+    token = await get_valid_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
     
     try:
-        sub_districts_response = await stardust_api.get_sub_districts(token, 0, 1000, None, province_code, district_code)
-        
-        # Handle nested structure for sub-districts
-        if "data" in sub_districts_response and "sub_districts" in sub_districts_response["data"]:
-            sub_districts = sub_districts_response["data"]["sub_districts"]
-        elif "data" in sub_districts_response and "data" in sub_districts_response["data"]:
-            sub_districts = sub_districts_response["data"]["data"]
-        elif "data" in sub_districts_response:
-            sub_districts = sub_districts_response["data"]
-        else:
-            sub_districts = []
-        
-        # Normalize data structure
-        normalized_sub_districts = []
-        for sub_district in sub_districts:
-            if isinstance(sub_district, dict):
-                normalized_sub_district = sub_district.copy()
-                # Convert en_name/th_name to name structure
-                if 'en_name' in sub_district and 'th_name' in sub_district:
-                    normalized_sub_district['name'] = {
-                        'en': sub_district['en_name'],
-                        'th': sub_district['th_name']
-                    }
-                normalized_sub_districts.append(normalized_sub_district)
-            else:
-                normalized_sub_districts.append(sub_district)
-        
-        return JSONResponse(content={"data": normalized_sub_districts})
+        geography = await stardust_api.geography.get(token)
+        return FastJSONResponse(content={"data": filter_locations(geography.sub_districts_in(district_code, province_code))})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,39 +1,37 @@
 """
 Authentication routes for Opera Panel
 """
+import logging
+
 from fastapi import APIRouter, Request, HTTPException, status, Form, Form
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
 
 from app.models.auth import LoginRequest
-from app.services.auth import auth_service
+from app.services.auth import auth_service, get_auth_context
+from app.services.tracing import TracedTemplates
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+templates = TracedTemplates(directory="app/templates")
 
 @router.post("/login")
 async def login(request: Request, login_data: LoginRequest):
     """Handle login JSON submission"""
     try:
-        print(f"DEBUG: Login attempt for user: {login_data.username}")
         token = await auth_service.login(login_data)
-        print(f"DEBUG: Successfully got token from Stardust: {token.access_token[:20]}...")
-        print(f"DEBUG: Refresh token: {token.refresh_token[:20] if token.refresh_token else 'None'}...")
+        logger.info("Login succeeded for user %s", login_data.username)
         
         # Store tokens in session
         request.session["access_token"] = token.access_token
         if token.refresh_token:
             request.session["refresh_token"] = token.refresh_token
-        print(f"DEBUG: Tokens stored in session")
-        print(f"DEBUG: Session after storing tokens: {dict(request.session)}")
-        
         return JSONResponse(
             content={"success": True, "message": "Login successful"},
             status_code=200
         )
     
     except HTTPException as e:
-        print(f"DEBUG: Login failed: {e.detail}")
+        logger.info("Login failed for user %s: %s", login_data.username, e.detail)
         return JSONResponse(
             content={"detail": e.detail},
             status_code=e.status_code
@@ -43,23 +41,19 @@ async def login(request: Request, login_data: LoginRequest):
 async def login_form(request: Request, username: str = Form(...), password: str = Form(...)):
     """Handle traditional form-based login submission"""
     try:
-        print(f"DEBUG: Form login attempt for user: {username}")
         login_data = LoginRequest(username=username, password=password)
         token = await auth_service.login(login_data)
-        print(f"DEBUG: Successfully got token from Stardust: {token.access_token[:20]}...")
-        print(f"DEBUG: Refresh token: {token.refresh_token[:20] if token.refresh_token else 'None'}...")
+        logger.info("Login succeeded for user %s", username)
         
         # Store tokens in session
         request.session["access_token"] = token.access_token
         if token.refresh_token:
             request.session["refresh_token"] = token.refresh_token
-        print(f"DEBUG: Tokens stored in session")
-        
         # Redirect to dashboard
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     except HTTPException as e:
-        print(f"DEBUG: Login failed: {e.detail}")
+        logger.info("Login failed for user %s: %s", username, e.detail)
         return templates.TemplateResponse("auth/login.html", {
             "request": request,
             "error": e.detail,
@@ -69,13 +63,14 @@ async def login_form(request: Request, username: str = Form(...), password: str
 @router.get("/logout")
 async def logout(request: Request):
     """Handle logout"""
+    auth_service.invalidate_profile(request.session.get("access_token"))
     request.session.clear()
     return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.get("/me", response_class=HTMLResponse)
 async def get_profile(request: Request):
     """Get current user profile"""
-    token = request.session.get("access_token")
+    token = (await get_auth_context(request)).token
     if not token:
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
     
@@ -101,7 +96,7 @@ async def get_profile(request: Request):
 @router.get("/me/json")
 async def get_profile_json(request: Request):
     """Get current user profile as JSON"""
-    token = request.session.get("access_token")
+    token = (await get_auth_context(request)).token
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -115,5 +110,7 @@ async def debug_auth():
     return {
         "stardust_auth_url": os.getenv("STARDUST_AUTH_URL", "Not configured"),
         "dev_username": os.getenv("DEV_USERNAME", "Not configured"),
+        "validation_mode": "local" if auth_service.local_validation else "remote",
+        "profile_cache": auth_service.profile_cache.stats(),
         "status": "Authentication service ready"
     }
@@ -3,25 +3,22 @@ Kati device routes for Opera Panel
 """
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 
 from app.models.auth import User
-from app.services.auth import get_current_user_optional
+from app.services.auth import get_auth_context
 from app.services.stardust_api import stardust_api
+from app.services.tracing import TracedTemplates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+templates = TracedTemplates(directory="app/templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def kati_list(request: Request):
     """Kati devices list page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login")
-    
-    user = await get_current_user_optional(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user:
         return RedirectResponse(url="/login")
+    user, token = auth.user, auth.token
     
     try:
         # Fetch Kati devices from Stardust API
@@ -45,13 +42,10 @@ async def kati_list(request: Request):
 @router.get("/{device_id}", response_class=HTMLResponse)
 async def kati_detail(request: Request, device_id: str):
     """Kati device detail page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login")
-    
-    user = await get_current_user_optional(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user:
         return RedirectResponse(url="/login")
+    user, token = auth.user, auth.token
     
     try:
         # Fetch specific Kati device from Stardust API
@@ -2,22 +2,30 @@
 Master Data routes for Opera Panel
 """
 import json
+import logging
 from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
 from typing import Optional
 
 from app.models.auth import User
 from app.models.master_data import MasterDataCreate, MasterDataUpdate
-from app.services.auth import get_current_user_optional, get_valid_token, get_current_user_with_refresh
+from app.services.auth import get_auth_context
+from app.services.codec import FastJSONResponse
+from app.services.geography import filter_locations
+from app.services.records import LocalizedName, reference_record
 from app.services.stardust_api import stardust_api
+from app.services.tracing import TracedTemplates
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+templates = TracedTemplates(directory="app/templates")
 
 # Add custom template filter for name extraction
 def get_localized_name(name_data, language='en'):
     """Extract localized name from Stardust API name structure"""
+    if isinstance(name_data, LocalizedName):
+        # Cached reference records (provinces, districts, sub-districts, hospital types)
+        return name_data.localized(language)
     if isinstance(name_data, dict):
         # Handle new structure from API with en_name/th_name
         if 'en_name' in name_data and 'th_name' in name_data:
@@ -45,24 +53,6 @@ def get_localized_name(name_data, language='en'):
 # Add the filter to Jinja environment
 templates.env.filters['localized_name'] = get_localized_name
 
-# Normalize data structure for consistent use in templates
-def normalize_location_data(data_list):
-    """Normalize location data to have consistent name structure"""
-    normalized = []
-    for item in data_list:
-        if isinstance(item, dict):
-            normalized_item = item.copy()
-            # Convert en_name/th_name to name structure
-            if 'en_name' in item and 'th_name' in item:
-                normalized_item['name'] = {
-                    'en': item['en_name'],
-                    'th': item['th_name']
-                }
-            normalized.append(normalized_item)
-        else:
-            normalized.append(item)
-    return normalized
-
 # Master Data Types Configuration
 MASTER_DATA_TYPES = {
     "provinces": {
@@ -304,29 +294,19 @@ MASTER_DATA_TYPES = {
 
 async def _check_auth(request: Request):
     """Check authentication helper with token refresh"""
-    user = await get_current_user_with_refresh(request)
-    if not user:
-        return None, RedirectResponse(url="/login")
-    
-    token = await get_valid_token(request)
-    if not token:
+    auth = await get_auth_context(request)
+    if not auth.user or not auth.token:
         return None, RedirectResponse(url="/login")
     
-    return user, token
+    return auth.user, auth.token
 
 async def _check_auth_api(request: Request):
     """Check authentication helper for API endpoints with token refresh"""
-    user = await get_current_user_with_refresh(request)
-    if not user:
+    auth = await get_auth_context(request)
+    if not auth.user or not auth.token:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    token = await get_valid_token(request)
-    if not token:
-        raise HTTPException(status_code=401, detail="Authentication required")
-    
-    return user, token
-    
-    return user, token
+    return auth.user, auth.token
 
 @router.get("/master-data", response_class=HTMLResponse)
 async def master_data_index(request: Request):
@@ -347,7 +327,7 @@ async def master_data_list(request: Request, data_type: str, page: int = 1, sear
                           province_code: Optional[str] = None, district_code: Optional[str] = None,
                           sub_district_code: Optional[str] = None, status: Optional[str] = None, 
                           date_from: Optional[str] = None, date_to: Optional[str] = None, 
-                          limit: int = 25, skip: Optional[int] = None):
+                          limit: int = 25, skip: Optional[int] = None, cursor: Optional[str] = None):
     """List master data records"""
     user, auth_result = await _check_auth(request)
     if not user:
@@ -404,274 +384,59 @@ async def master_data_list(request: Request, data_type: str, page: int = 1, sear
     else:
         is_active_bool = None
     
-    print(f"DEBUG: is_active conversion: '{status}' -> {is_active_bool}")
-    
     try:
-        # For hospitals, fetch all data to ensure proper sorting, then paginate client-side
-        if data_type == "hospitals":
-            # Fetch all records first for proper sorting
-            data_response = await stardust_api.get_master_data(
-                token, data_type, 0, 1000, search, province_code_int, district_code_int,
-                sub_district_code_int, is_active_bool, date_from, date_to
-            )
-            
-            # Extract the actual data from the response
-            if "data" in data_response and "data" in data_response["data"]:
-                all_records = data_response["data"]["data"]
-                total_count = data_response["data"].get("total", 0)
-            elif "data" in data_response:
-                all_records = data_response["data"]
-                total_count = data_response.get("total", len(all_records) if isinstance(all_records, list) else 0)
-            else:
-                all_records = []
-                total_count = 0
-            
-            # Sort all records by updated_at in descending order (most recent first)
-            if isinstance(all_records, list) and all_records:
-                def get_sort_date(record):
-                    updated = record.get('updated_at')
-                    created = record.get('created_at')
-                    return updated if updated else (created if created else '')
-
-                all_records = sorted(all_records, key=get_sort_date, reverse=True)
-                
-                # Apply client-side status filtering if the API doesn't support it
-                if is_active_bool is not None:
-                    print(f"DEBUG: Applying client-side status filtering for is_active={is_active_bool}")
-                    print(f"DEBUG: Total records before filtering: {len(all_records)}")
-                    
-                    # Debug: Check what is_active values we actually have
-                    active_values = {}
-                    for record in all_records[:10]:  # Check first 10 records
-                        is_active_value = record.get('is_active')
-                        if is_active_value not in active_values:
-                            active_values[is_active_value] = 0
-                        active_values[is_active_value] += 1
-                    print(f"DEBUG: Sample is_active values in data: {active_values}")
-                    
-                    filtered_records = []
-                    none_count = 0
-                    matched_count = 0
-                    
-                    for record in all_records:
-                        # Check if record is active/inactive based on is_active field
-                        record_is_active = record.get('is_active')
-                        
-                        # Handle different possible values
-                        if record_is_active is None:
-                            # If no is_active field, treat as inactive (False) by default
-                            record_is_active = False
-                            none_count += 1
-                        elif isinstance(record_is_active, str):
-                            # Handle string values
-                            record_is_active = record_is_active.lower() in ['true', '1', 'active', 'yes']
-                        elif isinstance(record_is_active, bool):
-                            # Already a boolean, use as is
-                            pass
-                        else:
-                            # Unknown type, treat as inactive
-                            record_is_active = False
-                            
-                        if record_is_active == is_active_bool:
-                            filtered_records.append(record)
-                            matched_count += 1
-                            
-                    print(f"DEBUG: Records with None is_active: {none_count}")
-                    print(f"DEBUG: Records matching filter: {matched_count}")
-                    all_records = filtered_records
-                    print(f"DEBUG: After client-side filtering: {len(all_records)} records")
-                
-                # Update total count after filtering
-                total_count = len(all_records)
-                
-                # Now apply client-side pagination
-                start_idx = actual_skip
-                end_idx = actual_skip + limit
-                records_data = all_records[start_idx:end_idx]
-            else:
-                records_data = []
-                
-        else:
-            # For other data types, use normal pagination
-            data_response = await stardust_api.get_master_data(
-                token, data_type, actual_skip, limit, search, province_code_int, district_code_int,
-                sub_district_code_int, is_active_bool, date_from, date_to
-            )
-            
-            # Extract the actual data from the response
-            if "data" in data_response and "data" in data_response["data"]:
-                records_data = data_response["data"]["data"]
-                total_count = data_response["data"].get("total", 0)
-            elif "data" in data_response:
-                records_data = data_response["data"]
-                total_count = data_response.get("total", len(records_data) if isinstance(records_data, list) else 0)
-            else:
-                records_data = []
-                total_count = 0
+        # Served from in-memory snapshots: with a cursor, the page seeks straight to the
+        # records after it (keyset pagination); without one, skip/limit is sliced locally
+        result_page = await stardust_api.get_master_data_page(
+            token, data_type, cursor=cursor, skip=actual_skip, limit=limit, search=search,
+            province_code=province_code_int, district_code=district_code_int,
+            sub_district_code=sub_district_code_int, is_active=is_active_bool,
+            date_from=date_from, date_to=date_to
+        )
+        records_data, total_count, next_cursor = result_page
         
         # Get reference data for dropdowns
+        geography = None
         provinces = []
         districts = []
         sub_districts = []
         hospital_types = []
         
         if data_type in ["districts", "sub-districts", "hospitals"]:
-            provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-            print(f"DEBUG: Provinces response structure: {list(provinces_response.keys()) if provinces_response else 'None'}")
-            
-            # Handle nested structure for provinces
-            if "data" in provinces_response and "provinces" in provinces_response["data"]:
-                provinces = provinces_response["data"]["provinces"]
-                print(f"DEBUG: Using provinces from data.provinces - count: {len(provinces)}")
-            elif "data" in provinces_response and "data" in provinces_response["data"]:
-                provinces = provinces_response["data"]["data"]
-                print(f"DEBUG: Using provinces from data.data - count: {len(provinces)}")
-            elif "data" in provinces_response:
-                provinces = provinces_response["data"]
-                print(f"DEBUG: Using provinces from data - count: {len(provinces)}")
-            else:
-                provinces = []
-                print(f"DEBUG: No provinces found in response")
-                
-            # Normalize provinces data for template
-            provinces = normalize_location_data(provinces)
-            print(f"DEBUG: Normalized provinces count: {len(provinces)}")
-            if provinces:
-                print(f"DEBUG: First normalized province: {provinces[0]}")
+            # Geography reference data is served from the in-process cache
+            geography = await stardust_api.geography.get(token)
+            provinces = filter_locations(geography.provinces)
         
         # Load districts for sub-districts and hospitals pages
         if data_type in ["sub-districts", "hospitals"]:
             if province_code_int:
-                # Load districts filtered by province for the dropdown filter
-                districts_response = await stardust_api.get_districts(token, 0, 1000, None, province_code_int)
-                
-                # Handle nested structure for districts
-                if "data" in districts_response and "districts" in districts_response["data"]:
-                    districts = districts_response["data"]["districts"]
-                elif "data" in districts_response and "data" in districts_response["data"]:
-                    districts = districts_response["data"]["data"]
-                elif "data" in districts_response:
-                    districts = districts_response["data"]
-                else:
-                    districts = []
-                    
-                # Normalize districts data for template
-                districts = normalize_location_data(districts)
-            else:
-                # For hospitals page, load ALL districts initially so table can show district names
-                if data_type == "hospitals":
-                    try:
-                        # Get all provinces to fetch all districts
-                        all_districts = []
-                        for province in provinces:
-                            province_code = province.get('code')
-                            if province_code:
-                                try:
-                                    province_code_int = int(province_code)
-                                    districts_response = await stardust_api.get_districts(token, 0, 1000, None, province_code_int)
-                                    
-                                    # Handle nested structure for districts
-                                    if "data" in districts_response and "districts" in districts_response["data"]:
-                                        province_districts = districts_response["data"]["districts"]
-                                    elif "data" in districts_response and "data" in districts_response["data"]:
-                                        province_districts = districts_response["data"]["data"]
-                                    elif "data" in districts_response:
-                                        province_districts = districts_response["data"]
-                                    else:
-                                        province_districts = []
-                                    
-                                    all_districts.extend(province_districts)
-                                except (ValueError, Exception) as e:
-                                    print(f"DEBUG: Error loading districts for province {province_code}: {e}")
-                                    continue
-                        
-                        districts = normalize_location_data(all_districts)
-                        print(f"DEBUG: Loaded all districts for table display: {len(districts)}")
-                    except Exception as e:
-                        print(f"DEBUG: Error loading all districts: {e}")
-                        districts = []
-                else:
-                    districts = []
+                # Districts filtered by province for the dropdown filter
+                districts = filter_locations(geography.districts_in(province_code_int))
+            elif data_type == "hospitals":
+                # For hospitals page, offer ALL districts in the filter
+                districts = filter_locations(geography.districts)
             
-        # Load sub-districts for hospitals pages
+        # Load sub-districts for hospitals pages (from the memoized geography index,
+        # so the page costs a constant number of upstream calls)
         if data_type == "hospitals":
             if province_code_int and district_code_int:
-                # Load sub-districts filtered by province and district for the dropdown filter
-                sub_districts_response = await stardust_api.get_sub_districts(token, 0, 1000, None, province_code_int, district_code_int)
-                
-                # Handle nested structure for sub-districts
-                if "data" in sub_districts_response and "sub_districts" in sub_districts_response["data"]:
-                    sub_districts = sub_districts_response["data"]["sub_districts"]
-                elif "data" in sub_districts_response and "data" in sub_districts_response["data"]:
-                    sub_districts = sub_districts_response["data"]["data"]
-                elif "data" in sub_districts_response:
-                    sub_districts = sub_districts_response["data"]
-                else:
-                    sub_districts = []
-                    
-                # Normalize sub-districts data for template
-                sub_districts = normalize_location_data(sub_districts)
+                # Sub-districts filtered by province and district for the dropdown filter
+                sub_districts = filter_locations(geography.sub_districts_in(district_code_int, province_code_int))
+            elif province_code_int:
+                # Sub-districts of every district in the selected province
+                sub_districts = filter_locations([sub_district for district in districts
+                                                  for sub_district in geography.sub_districts_in(district.get('code'))])
             else:
-                # Load ALL sub-districts for table display
-                try:
-                    all_sub_districts = []
-                    for district in districts:
-                        district_code = district.get('code')
-                        district_province_code = district.get('province_code')
-                        if district_code and district_province_code:
-                            try:
-                                district_code_int = int(district_code)
-                                province_code_int = int(district_province_code)
-                                sub_districts_response = await stardust_api.get_sub_districts(token, 0, 1000, None, province_code_int, district_code_int)
-                                
-                                # Handle nested structure for sub-districts
-                                if "data" in sub_districts_response and "sub_districts" in sub_districts_response["data"]:
-                                    district_sub_districts = sub_districts_response["data"]["sub_districts"]
-                                elif "data" in sub_districts_response and "data" in sub_districts_response["data"]:
-                                    district_sub_districts = sub_districts_response["data"]["data"]
-                                elif "data" in sub_districts_response:
-                                    district_sub_districts = sub_districts_response["data"]
-                                else:
-                                    district_sub_districts = []
-                                
-                                all_sub_districts.extend(district_sub_districts)
-                            except (ValueError, Exception) as e:
-                                print(f"DEBUG: Error loading sub-districts for district {district_code}: {e}")
-                                continue
-                    
-                    sub_districts = normalize_location_data(all_sub_districts)
-                    print(f"DEBUG: Loaded all sub-districts for table display: {len(sub_districts)}")
-                except Exception as e:
-                    print(f"DEBUG: Error loading all sub-districts: {e}")
-                    sub_districts = []
+                # ALL sub-districts in the filter
+                sub_districts = filter_locations(geography.sub_districts)
         
         if data_type == "hospitals":
-            hospital_types_response = await stardust_api.get_hospital_types(token, 0, 1000)
-            
-            # Handle nested structure for hospital_types
-            if "data" in hospital_types_response and "hospital_types" in hospital_types_response["data"]:
-                hospital_types = hospital_types_response["data"]["hospital_types"]
-            elif "data" in hospital_types_response and "data" in hospital_types_response["data"]:
-                hospital_types = hospital_types_response["data"]["data"]
-            elif "data" in hospital_types_response:
-                hospital_types = hospital_types_response["data"]
-            else:
-                hospital_types = []
-                
-            # Normalize hospital types data for template
-            hospital_types = normalize_location_data(hospital_types)
-        
-        # Normalize data structure for consistent use in templates
-        provinces = normalize_location_data(provinces)
-        districts = normalize_location_data(districts)
-        sub_districts = normalize_location_data(sub_districts)
+            # Same compact form as the cached geography records the template reads
+            hospital_types = [reference_record(t) for t in await stardust_api.list_hospital_types(token)]
         
-        # Debug output for dropdown data
-        print(f"DEBUG: Template data - provinces: {len(provinces)}, districts: {len(districts)}, sub_districts: {len(sub_districts)}, hospital_types: {len(hospital_types)}")
-        print(f"DEBUG: First province: {provinces[0] if provinces else 'None'}")
-        print(f"DEBUG: First district: {districts[0] if districts else 'None'}")
-        print(f"DEBUG: First sub_district: {sub_districts[0] if sub_districts else 'None'}")
-        print(f"DEBUG: is_active filter: {status}")
+        logger.debug("List %s: provinces=%d districts=%d sub_districts=%d hospital_types=%d is_active=%s",
+                     data_type, len(provinces), len(districts), len(sub_districts), len(hospital_types),
+                     is_active_bool, extra={"sample": True})
         
         return templates.TemplateResponse("admin/master_data/list.html", {
             "request": request,
@@ -684,6 +449,8 @@ async def master_data_list(request: Request, data_type: str, page: int = 1, sear
             "total_count": total_count,  # Add this for pagination template compatibility
             "page": actual_page,
             "limit": limit,
+            "cursor": cursor,
+            "next_cursor": next_cursor,
             "search": search,
             "province_code": province_code,
             "district_code": district_code,
@@ -695,6 +462,8 @@ async def master_data_list(request: Request, data_type: str, page: int = 1, sear
             "districts": districts,
             "sub_districts": sub_districts,
             "hospital_types": hospital_types,
+            # Table cells look names up by code instead of scanning the lists above
+            "geography": geography,
             "language": request.headers.get("Accept-Language", "en")[:2]
         })
         
@@ -738,24 +507,11 @@ async def master_data_create_form(request: Request, data_type: str):
         hospital_types = []
         
         if data_type in ["districts", "sub-districts", "hospitals"]:
-            provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-            # Handle nested structure for provinces
-            if "data" in provinces_response and "data" in provinces_response["data"]:
-                provinces = provinces_response["data"]["data"]
-            elif "data" in provinces_response:
-                provinces = provinces_response["data"]
-            else:
-                provinces = []
+            geography = await stardust_api.geography.get(token)
+            provinces = filter_locations(geography.provinces)
         
         if data_type == "hospitals":
-            hospital_types_response = await stardust_api.get_hospital_types(token, 0, 1000)
-            # Handle nested structure for hospital_types
-            if "data" in hospital_types_response and "data" in hospital_types_response["data"]:
-                hospital_types = hospital_types_response["data"]["data"]
-            elif "data" in hospital_types_response:
-                hospital_types = hospital_types_response["data"]
-            else:
-                hospital_types = []
+            hospital_types = await stardust_api.list_hospital_types(token)
         
         return templates.TemplateResponse("admin/master_data/form.html", {
             "request": request,
@@ -801,28 +557,8 @@ async def master_data_edit_form(request: Request, data_type: str, record_id: str
     
     try:
         # Get the record
-        api_response = await stardust_api.get_master_data_record(token, data_type, record_id)
-        
-        # Extract the actual record from the API response
-        if api_response.get("success") and "data" in api_response:
-            if data_type == "hospitals" and "hospital" in api_response["data"]:
-                record = api_response["data"]["hospital"]
-            elif data_type == "provinces" and "province" in api_response["data"]:
-                record = api_response["data"]["province"]
-            elif data_type == "districts" and "district" in api_response["data"]:
-                record = api_response["data"]["district"]
-            elif data_type == "sub-districts" and "sub_district" in api_response["data"]:
-                record = api_response["data"]["sub_district"]
-            elif data_type == "hospital-types" and "hospital_type" in api_response["data"]:
-                record = api_response["data"]["hospital_type"]
-            else:
-                # Fallback: try to get the data directly or use the first value
-                data_content = api_response["data"]
-                if isinstance(data_content, dict) and len(data_content) == 1:
-                    record = list(data_content.values())[0]
-                else:
-                    record = data_content
-        else:
+        record = await stardust_api.get_master_data_item(token, data_type, record_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="Record not found")
         
         # Get reference data for dropdowns
@@ -831,34 +567,14 @@ async def master_data_edit_form(request: Request, data_type: str, record_id: str
         hospital_types = []
         
         if data_type in ["districts", "sub-districts", "hospitals"]:
-            provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-            # Handle nested structure for provinces
-            if "data" in provinces_response and "data" in provinces_response["data"]:
-                provinces = provinces_response["data"]["data"]
-            elif "data" in provinces_response:
-                provinces = provinces_response["data"]
-            else:
-                provinces = []
+            geography = await stardust_api.geography.get(token)
+            provinces = filter_locations(geography.provinces)
         
         if data_type in ["sub-districts", "hospitals"] and record.get("province_code"):
-            districts_response = await stardust_api.get_districts(token, 0, 1000, None, record.get("province_code"))
-            # Handle nested structure for districts
-            if "data" in districts_response and "data" in districts_response["data"]:
-                districts = districts_response["data"]["data"]
-            elif "data" in districts_response:
-                districts = districts_response["data"]
-            else:
-                districts = []
+            districts = filter_locations(geography.districts_in(record.get("province_code")))
             
         if data_type == "hospitals":
-            hospital_types_response = await stardust_api.get_hospital_types(token, 0, 1000)
-            # Handle nested structure for hospital_types
-            if "data" in hospital_types_response and "data" in hospital_types_response["data"]:
-                hospital_types = hospital_types_response["data"]["data"]
-            elif "data" in hospital_types_response:
-                hospital_types = hospital_types_response["data"]
-            else:
-                hospital_types = []
+            hospital_types = await stardust_api.list_hospital_types(token)
         
         # For hospitals, get raw document data for enhanced editing
         raw_document_data = {}
@@ -867,20 +583,9 @@ async def master_data_edit_form(request: Request, data_type: str, record_id: str
                 # Get raw document for this hospital using its ID
                 hospital_id = str(record.get("_id", record.get("id", "")))
                 if hospital_id:
-                    raw_response = await stardust_api.get_hospitals_raw_documents(
-                        token, skip=0, limit=1, hospital_id=hospital_id, include_deleted=True
-                    )
-                    
-                    if raw_response.get("success") and raw_response.get("data", {}).get("raw_documents"):
-                        raw_documents = raw_response["data"]["raw_documents"]
-                        if raw_documents:
-                            raw_document_data = {
-                                "raw_document": raw_documents[0],
-                                "field_analysis": raw_response["data"].get("field_analysis", {}),
-                                "metadata": raw_response["data"].get("metadata", {})
-                            }
+                    raw_document_data = await stardust_api.get_hospital_raw_document(token, hospital_id)
             except Exception as e:
-                print(f"Error loading raw document for hospital edit: {e}")
+                logger.warning("Error loading raw document for hospital edit: %s", e)
                 pass
         
         return templates.TemplateResponse("admin/master_data/form.html", {
@@ -917,128 +622,42 @@ async def master_data_detail(request: Request, data_type: str, record_id: str):
     
     try:
         # Get the record
-        api_response = await stardust_api.get_master_data_record(token, data_type, record_id)
-        
-        # Extract the actual record from the API response
-        if api_response.get("success") and "data" in api_response:
-            if data_type == "hospitals" and "hospital" in api_response["data"]:
-                record = api_response["data"]["hospital"]
-            elif data_type == "provinces" and "province" in api_response["data"]:
-                record = api_response["data"]["province"]
-            elif data_type == "districts" and "district" in api_response["data"]:
-                record = api_response["data"]["district"]
-            elif data_type == "sub-districts" and "sub_district" in api_response["data"]:
-                record = api_response["data"]["sub_district"]
-            elif data_type == "hospital-types" and "hospital_type" in api_response["data"]:
-                record = api_response["data"]["hospital_type"]
-            else:
-                # Fallback: try to get the data directly or use the first value
-                data_content = api_response["data"]
-                if isinstance(data_content, dict) and len(data_content) == 1:
-                    record = list(data_content.values())[0]
-                else:
-                    record = data_content
-        else:
+        record = await stardust_api.get_master_data_item(token, data_type, record_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="Record not found")
         
         # Get related data for context display
         related_data = {}
         
-        # For districts, get province info
+        # Location hierarchy comes from the geography index (sub-district -> district -> province)
         if data_type == "districts" and record.get("province_code"):
-            try:
-                provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-                provinces = provinces_response.get("data", [])
-                # Use string comparison for robustness
-                province = next((p for p in provinces if str(p.get("code")) == str(record.get("province_code"))), None)
-                if province:
-                    related_data["province"] = province
-            except Exception as e:
-                print(f"Error loading province for district: {e}")
-                pass
+            related_data.update(await stardust_api.resolve_location_chain(
+                token, province_code=record.get("province_code")
+            ))
         
-        # For sub-districts, get district and province info
-        if data_type == "sub-districts":
-            try:
-                district_code = record.get("district_code")
-                if district_code:
-                    # Use the new helper method to find district by code
-                    district = await stardust_api.find_district_by_code(token, str(district_code))
-                    if district:
-                        related_data["district"] = district
-                        
-                        if district.get("province_code"):
-                            provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-                            provinces = provinces_response.get("data", [])
-                            # Use string comparison for robustness
-                            province = next((p for p in provinces if str(p.get("code")) == str(district.get("province_code"))), None)
-                            if province:
-                                related_data["province"] = province
-            except Exception as e:
-                print(f"Error loading related data for sub-district: {e}")
-                pass
+        if data_type == "sub-districts" and record.get("district_code"):
+            related_data.update(await stardust_api.resolve_location_chain(
+                token, district_code=record.get("district_code"), province_code=record.get("province_code")
+            ))
         
         # For hospitals, get all location hierarchy and hospital type
         if data_type == "hospitals":
+            related_data.update(await stardust_api.resolve_location_chain(
+                token,
+                sub_district_code=record.get("sub_district_code"),
+                district_code=record.get("district_code"),
+                province_code=record.get("province_code")
+            ))
+            
             try:
                 if record.get("hospital_type_code"):
-                    hospital_types_response = await stardust_api.get_hospital_types(token, 0, 1000)
-                    hospital_types = hospital_types_response.get("data", [])
+                    hospital_types = await stardust_api.list_hospital_types(token)
                     # Use string comparison for robustness
                     hospital_type = next((ht for ht in hospital_types if str(ht.get("code")) == str(record.get("hospital_type_code"))), None)
                     if hospital_type:
                         related_data["hospital_type"] = hospital_type
-                
-                # Try to get location hierarchy through sub_district_code first
-                if record.get("sub_district_code"):
-                    sub_districts_response = await stardust_api.get_sub_districts(token, 0, 1000)
-                    sub_districts = sub_districts_response.get("data", [])
-                    # Use string comparison for robustness
-                    sub_district = next((sd for sd in sub_districts if str(sd.get("code")) == str(record.get("sub_district_code"))), None)
-                    if sub_district:
-                        related_data["sub_district"] = sub_district
-                        
-                        if sub_district.get("district_code"):
-                            # Use the new helper method to find district by code
-                            district = await stardust_api.find_district_by_code(token, str(sub_district.get("district_code")))
-                            if district:
-                                related_data["district"] = district
-                                
-                                if district.get("province_code"):
-                                    provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-                                    provinces = provinces_response.get("data", [])
-                                    # Use string comparison for robustness
-                                    province = next((p for p in provinces if str(p.get("code")) == str(district.get("province_code"))), None)
-                                    if province:
-                                        related_data["province"] = province
-                
-                # If location hierarchy not found through sub_district, try direct district/province codes
-                district_code = record.get("district_code")
-                if not related_data.get("district") and district_code:
-                    # Use the new helper method to find district by code
-                    district = await stardust_api.find_district_by_code(token, str(district_code))
-                    if district:
-                        related_data["district"] = district
-                        
-                        if district.get("province_code"):
-                            provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-                            provinces = provinces_response.get("data", [])
-                            # Use string comparison for robustness
-                            province = next((p for p in provinces if str(p.get("code")) == str(district.get("province_code"))), None)
-                            if province:
-                                related_data["province"] = province
-                
-                # If still no province, try direct province code
-                if not related_data.get("province") and record.get("province_code"):
-                    provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-                    provinces = provinces_response.get("data", [])
-                    # Use string comparison for robustness
-                    province = next((p for p in provinces if str(p.get("code")) == str(record.get("province_code"))), None)
-                    if province:
-                        related_data["province"] = province
-                        
             except Exception as e:
-                print(f"Error in hospital location lookup: {e}")
+                logger.warning("Error in hospital location lookup: %s", e)
                 pass
         
         # For hospitals, get raw document data for enhanced details
@@ -1048,20 +667,9 @@ async def master_data_detail(request: Request, data_type: str, record_id: str):
                 # Get raw document for this hospital using its ID
                 hospital_id = str(record.get("_id", record.get("id", "")))
                 if hospital_id:
-                    raw_response = await stardust_api.get_hospitals_raw_documents(
-                        token, skip=0, limit=1, hospital_id=hospital_id, include_deleted=True
-                    )
-                    
-                    if raw_response.get("success") and raw_response.get("data", {}).get("raw_documents"):
-                        raw_documents = raw_response["data"]["raw_documents"]
-                        if raw_documents:
-                            raw_document_data = {
-                                "raw_document": raw_documents[0],
-                                "field_analysis": raw_response["data"].get("field_analysis", {}),
-                                "metadata": raw_response["data"].get("metadata", {})
-                            }
+                    raw_document_data = await stardust_api.get_hospital_raw_document(token, hospital_id)
             except Exception as e:
-                print(f"Error loading raw document for hospital: {e}")
+                logger.warning("Error loading raw document for hospital: %s", e)
                 pass
         
         return templates.TemplateResponse("admin/master_data/detail.html", {
@@ -1260,10 +868,8 @@ async def get_provinces(request: Request):
     user, token = await _check_auth_api(request)
     
     try:
-        provinces_response = await stardust_api.get_provinces(token, 0, 1000)
-        # The dropdown API returns the data directly in the 'data' field
-        provinces_data = provinces_response.get("data", {}).get("provinces", [])
-        return JSONResponse({"data": provinces_data})
+        geography = await stardust_api.geography.get(token)
+        return FastJSONResponse({"data": filter_locations(geography.provinces)})
     except HTTPException as e:
         return JSONResponse({"error": str(e.detail)}, status_code=e.status_code)
 
@@ -1273,9 +879,8 @@ async def get_districts_by_province(request: Request, province_code: int):
     user, token = await _check_auth_api(request)
     
     try:
-        districts_response = await stardust_api.get_districts(token, 0, 1000, None, province_code)
-        districts_data = districts_response.get("data", {}).get("districts", [])
-        return JSONResponse({"data": districts_data})
+        geography = await stardust_api.geography.get(token)
+        return FastJSONResponse({"data": filter_locations(geography.districts_in(province_code))})
     except HTTPException as e:
         return JSONResponse({"error": str(e.detail)}, status_code=e.status_code)
 
@@ -1289,9 +894,8 @@ async def get_sub_districts_by_district(request: Request, district_code: int, pr
         if province_code is None:
             return JSONResponse({"error": "province_code is required"}, status_code=400)
         
-        sub_districts_response = await stardust_api.get_sub_districts(token, 0, 1000, None, province_code, district_code)
-        sub_districts_data = sub_districts_response.get("data", {}).get("sub_districts", [])
-        return JSONResponse({"data": sub_districts_data})
+        geography = await stardust_api.geography.get(token)
+        return FastJSONResponse({"data": filter_locations(geography.sub_districts_in(district_code, province_code))})
     except HTTPException as e:
         return JSONResponse({"error": str(e.detail)}, status_code=e.status_code)
 
@@ -1349,20 +953,10 @@ async def admin_get_provinces_dropdown(
     user, token = await _check_auth_api(request)
     
     try:
-        # Build query parameters for Stardust API
-        params = {
-            "limit": limit or 1000,
-            "skip": 0,
-            "search": search,
-            "include_inactive": include_inactive,
-            "include_deleted": include_deleted,
-            "sort_by": sort_by
-        }
-        
-        result = await stardust_api.get_master_data(token, "provinces", **{k: v for k, v in params.items() if v is not None})
-        provinces = result.get("data", {}).get("data", [])
+        geography = await stardust_api.geography.get(token)
+        provinces = filter_locations(geography.provinces, search, include_inactive, include_deleted, sort_by, limit)
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": {
                 "provinces": provinces,
@@ -1375,7 +969,7 @@ async def admin_get_provinces_dropdown(
             },
             "request_id": "dropdown-provinces",
             "timestamp": "2025-01-08T05:42:00.000Z"
-        }
+        })
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1395,20 +989,11 @@ async def admin_get_districts_dropdown(
     user, token = await _check_auth_api(request)
     
     try:
-        params = {
-            "limit": limit or 1000,
-            "skip": 0, 
-            "search": search,
-            "province_code": province_code,
-            "include_inactive": include_inactive,
-            "include_deleted": include_deleted,
-            "sort_by": sort_by
-        }
-        
-        result = await stardust_api.get_master_data(token, "districts", **{k: v for k, v in params.items() if v is not None})
-        districts = result.get("data", {}).get("data", [])
+        geography = await stardust_api.geography.get(token)
+        districts = filter_locations(geography.districts_in(province_code), search, include_inactive,
+                                     include_deleted, sort_by, limit)
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": {
                 "districts": districts,
@@ -1422,7 +1007,7 @@ async def admin_get_districts_dropdown(
             },
             "request_id": "dropdown-districts",
             "timestamp": "2025-01-08T05:42:00.000Z"
-        }
+        })
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1438,17 +1023,10 @@ async def admin_get_sub_districts_dropdown(
     user, token = await _check_auth_api(request)
     
     try:
-        params = {
-            "limit": 1000,
-            "skip": 0,
-            "province_code": str(province_code),
-            "district_code": str(district_code)
-        }
+        geography = await stardust_api.geography.get(token)
+        sub_districts = filter_locations(geography.sub_districts_in(district_code, province_code))
         
-        result = await stardust_api.get_master_data(token, "sub_districts", **{k: v for k, v in params.items() if v is not None})
-        sub_districts = result.get("data", {}).get("data", [])
-        
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": {
                 "sub_districts": sub_districts,
@@ -1458,7 +1036,7 @@ async def admin_get_sub_districts_dropdown(
             },
             "request_id": "dropdown-sub-districts", 
             "timestamp": "2025-01-08T05:42:00.000Z"
-        }
+        })
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1513,13 +1091,13 @@ async def admin_get_master_data(
         
         result = await stardust_api.get_master_data(token, data_type, **{k: v for k, v in params.items() if v is not None})
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "message": "Master data retrieved successfully",
             "data": result.get("data"),
             "request_id": f"admin-master-data-{data_type}",
             "timestamp": "2025-01-08T05:42:00.000Z"
-        }
+        })
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1536,13 +1114,13 @@ async def admin_get_master_data_record(
     
     try:
         result = await stardust_api.get_master_data_record(token, data_type, record_id)
-        return {
+        return FastJSONResponse({
             "success": True,
             "message": "Master data record retrieved successfully",
             "data": result.get("data"),
             "request_id": f"admin-master-data-{data_type}-{record_id}",
             "timestamp": "2025-01-08T05:42:00.000Z"
-        }
+        })
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1639,7 +1217,7 @@ async def get_hospitals_raw_documents(
             token, skip, limit, hospital_id, include_deleted, 
             province_code, district_code, sub_district_code
         )
-        return result
+        return FastJSONResponse(result)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1654,22 +1232,13 @@ async def get_hospital_raw_document(
     user, token = await _check_auth_api(request)
     
     try:
-        result = await stardust_api.get_hospitals_raw_documents(
-            token, skip=0, limit=1, hospital_id=hospital_id, include_deleted=True
-        )
-        
-        if result.get("success") and result.get("data", {}).get("raw_documents"):
-            raw_documents = result["data"]["raw_documents"]
-            if raw_documents:
-                return {
-                    "success": True,
-                    "message": "Hospital raw document retrieved successfully",
-                    "data": {
-                        "raw_document": raw_documents[0],
-                        "field_analysis": result["data"].get("field_analysis", {}),
-                        "metadata": result["data"].get("metadata", {})
-                    }
-                }
+        raw_document_data = await stardust_api.get_hospital_raw_document(token, hospital_id)
+        if raw_document_data:
+            return FastJSONResponse({
+                "success": True,
+                "message": "Hospital raw document retrieved successfully",
+                "data": raw_document_data
+            })
         
         raise HTTPException(status_code=404, detail="Hospital not found")
     except HTTPException as e:
@@ -2,7 +2,10 @@
 Authentication service for Opera Panel
 Handles JWT authentication with Stardust-V1 API
 """
+import hashlib
 import httpx
+import json
+import logging
 import os
 from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -10,19 +13,93 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 
-from app.models.auth import User, Token, LoginRequest, UserProfile, SystemAccess
+from app.models.auth import User, Token, LoginRequest, UserProfile, SystemAccess, AuthContext
+from app.services.cache import TTLCache
+from app.services.http_client import upstream
+from app.services.tracing import trace_methods, traced
+
+logger = logging.getLogger(__name__)
 
 # Environment variables
 STARDUST_AUTH_URL = os.getenv("STARDUST_AUTH_URL", "https://stardust.my-firstcare.com")
 SECRET_KEY = os.getenv("SECRET_KEY", "opera-panel-secret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
+# Profile cache configuration (entries also expire with the JWT exp claim)
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_MAXSIZE = int(os.getenv("PROFILE_CACHE_MAXSIZE", "1024"))
+
+# Token validation mode: "remote" calls /auth/me for every new token,
+# "local" verifies Stardust access tokens in-process with the shared secret
+# or public key and only calls /auth/me when no cached profile matches the claims
+AUTH_VALIDATION_MODE = os.getenv("AUTH_VALIDATION_MODE", "remote").lower()
+STARDUST_JWT_SECRET = os.getenv("STARDUST_JWT_SECRET")
+STARDUST_JWT_PUBLIC_KEY = os.getenv("STARDUST_JWT_PUBLIC_KEY")
+STARDUST_JWT_ALGORITHMS = [a.strip() for a in os.getenv("STARDUST_JWT_ALGORITHMS", ALGORITHM).split(",") if a.strip()]
+STARDUST_JWT_AUDIENCE = os.getenv("STARDUST_JWT_AUDIENCE")
+STARDUST_JWT_ISSUER = os.getenv("STARDUST_JWT_ISSUER")
+# Build the profile straight from the claims when they carry username and role
+AUTH_PROFILE_FROM_CLAIMS = os.getenv("AUTH_PROFILE_FROM_CLAIMS", "false").lower() == "true"
+
+# Per-token claims that do not describe the user
+_VOLATILE_CLAIMS = {"exp", "iat", "nbf", "jti"}
+
 security = HTTPBearer()
 
+def _load_verification_key() -> Optional[str]:
+    """Public key (PEM text or file path) takes precedence over the shared secret"""
+    if STARDUST_JWT_PUBLIC_KEY:
+        if os.path.isfile(STARDUST_JWT_PUBLIC_KEY):
+            with open(STARDUST_JWT_PUBLIC_KEY) as key_file:
+                return key_file.read()
+        return STARDUST_JWT_PUBLIC_KEY.replace("\\n", "\n")
+    return STARDUST_JWT_SECRET
+
+@trace_methods("auth")
 class AuthService:
     def __init__(self):
         self.auth_url = STARDUST_AUTH_URL
-        self.client = httpx.AsyncClient()
+        # Shared, lifecycle-managed connection pool (see app.services.http_client)
+        self.client = upstream
+        self.profile_cache = TTLCache("auth_profiles", PROFILE_CACHE_TTL, PROFILE_CACHE_MAXSIZE)
+        self.verification_key = _load_verification_key()
+        self.local_validation = AUTH_VALIDATION_MODE == "local" and bool(self.verification_key)
+        if AUTH_VALIDATION_MODE == "local" and not self.verification_key:
+            logger.warning("AUTH_VALIDATION_MODE=local but no STARDUST_JWT_SECRET/STARDUST_JWT_PUBLIC_KEY set, using remote validation")
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        """Cache key for a token (never store raw tokens as keys)"""
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _token_expiry(token: str) -> Optional[float]:
+        """Read the exp claim without verifying the signature"""
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+            return float(exp) if exp is not None else None
+        except (JWTError, ValueError, TypeError):
+            return None
+
+    @staticmethod
+    def _claims_key(claims: dict) -> str:
+        """Cache key for the user described by token claims (stable across refreshes)"""
+        identity = {k: v for k, v in claims.items() if k not in _VOLATILE_CLAIMS}
+        return "claims:" + hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def invalidate_profile(self, token: Optional[str], refreshed: bool = False):
+        """Drop the cached profile for a token (logout / refresh)
+
+        On refresh the claims-keyed profile is kept for the new token of the same user.
+        """
+        if not token:
+            return
+        self.profile_cache.pop(self._token_key(token))
+        if self.local_validation and not refreshed:
+            try:
+                self.profile_cache.pop(self._claims_key(jwt.get_unverified_claims(token)))
+            except JWTError:
+                pass
 
     async def login(self, login_data: LoginRequest) -> Token:
         """Login user with Stardust-V1 API"""
@@ -108,6 +185,59 @@ class AuthService:
             )
 
     async def get_user_profile(self, token: str) -> UserProfile:
+        """Get user profile, served from the profile cache when possible"""
+        if self.local_validation:
+            return await self._get_user_profile_local(token)
+
+        key = self._token_key(token)
+        profile = self.profile_cache.get(key)
+        if profile is not None:
+            return profile
+
+        profile = await self._fetch_user_profile(token)
+        self.profile_cache.set(key, profile, expires_at=self._token_expiry(token))
+        return profile
+
+    async def _get_user_profile_local(self, token: str) -> UserProfile:
+        """Validate the token in-process and resolve the profile without /auth/me when possible"""
+        claims = self.verify_token(token)
+
+        if AUTH_PROFILE_FROM_CLAIMS and claims.get("role") and (claims.get("username") or claims.get("sub")):
+            return self._profile_from_claims(claims)
+
+        # Profiles are keyed by the user claims, so a refreshed token for the
+        # same user reuses the cached profile and a role change forces a refetch
+        key = self._claims_key(claims)
+        profile = self.profile_cache.get(key)
+        if profile is not None:
+            return profile
+
+        profile = await self._fetch_user_profile(token)
+        self.profile_cache.set(key, profile)
+        return profile
+
+    @staticmethod
+    def _profile_from_claims(claims: dict) -> UserProfile:
+        """Build a user profile from verified token claims"""
+        system_access = None
+        if isinstance(claims.get("system_access"), dict):
+            system_access = SystemAccess(**claims["system_access"])
+
+        return UserProfile(
+            id=claims.get("user_id") or claims.get("id") or claims.get("sub"),
+            username=claims.get("username") or claims["sub"],
+            email=claims.get("email"),
+            full_name=claims.get("full_name"),
+            role=claims["role"],
+            profile_photo=claims.get("profile_photo"),
+            phone=claims.get("phone"),
+            permissions=claims.get("permissions", []),
+            authentication_source="local_jwt",
+            token_type=claims.get("token_type"),
+            system_access=system_access
+        )
+
+    async def _fetch_user_profile(self, token: str) -> UserProfile:
         """Get user profile from Stardust-V1 API"""
         try:
             response = await self.client.get(
@@ -148,16 +278,23 @@ class AuthService:
                     detail="Invalid token"
                 )
         except httpx.RequestError as e:
-            print(f"Network error connecting to Stardust: {str(e)}")
+            logger.error("Network error connecting to Stardust: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Authentication service unavailable: {str(e)}"
             )
 
     def verify_token(self, token: str) -> dict:
-        """Verify JWT token"""
+        """Verify JWT signature, exp and configured audience/issuer claims"""
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = jwt.decode(
+                token,
+                self.verification_key or SECRET_KEY,
+                algorithms=STARDUST_JWT_ALGORITHMS,
+                audience=STARDUST_JWT_AUDIENCE,
+                issuer=STARDUST_JWT_ISSUER,
+                options={"verify_aud": bool(STARDUST_JWT_AUDIENCE), "require_exp": True}
+            )
             return payload
         except JWTError:
             raise HTTPException(
@@ -168,13 +305,8 @@ class AuthService:
 
 auth_service = AuthService()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Get current authenticated user"""
-    token = credentials.credentials
-    
-    # Get user profile from Stardust-V1
-    profile = await auth_service.get_user_profile(token)
-    
+def _user_from_profile(profile: UserProfile) -> User:
+    """Build the panel User model from a Stardust profile"""
     return User(
         id=profile.id or profile.username,  # Use username as fallback ID
         username=profile.username,
@@ -187,110 +319,87 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         system_access=profile.system_access
     )
 
-async def get_current_user_optional(request: Request) -> Optional[User]:
-    """Get current user from session (for template rendering)"""
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    """Get current authenticated user"""
+    token = credentials.credentials
+    
+    # Get user profile from Stardust-V1
+    profile = await auth_service.get_user_profile(token)
+    
+    return _user_from_profile(profile)
+
+async def _resolve_auth_context(request: Request) -> AuthContext:
+    """Resolve the session user and a valid token, refreshing the token if it expired"""
+    token = request.session.get("access_token")
+    refresh_token = request.session.get("refresh_token")
+    
+    if not token:
+        return AuthContext()
+    
+    # Try to get user profile with current token
     try:
-        token = request.session.get("access_token")
-        if not token:
-            return None
-        
         profile = await auth_service.get_user_profile(token)
-        return User(
-            id=profile.id or profile.username,  # Use username as fallback ID
-            username=profile.username,
-            email=profile.email,
-            full_name=profile.full_name,
-            role=profile.role,
-            profile_photo=profile.profile_photo,
-            phone=profile.phone,
-            permissions=profile.permissions or [],
-            system_access=profile.system_access
-        )
-    except:
-        return None
-
-async def get_current_user_with_refresh(request: Request) -> Optional[User]:
-    """Get current user from session with automatic token refresh"""
+        return AuthContext(user=_user_from_profile(profile), token=token)
+    except HTTPException as e:
+        # If token is invalid/expired and we have refresh token, try to refresh
+        if e.status_code != 401 or not refresh_token:
+            return AuthContext()
+    
+    logger.debug("Access token expired, attempting refresh")
     try:
-        token = request.session.get("access_token")
-        refresh_token = request.session.get("refresh_token")
+        new_token = await auth_service.refresh_token(refresh_token)
+        auth_service.invalidate_profile(token, refreshed=True)
+        # Update session with new tokens
+        request.session["access_token"] = new_token.access_token
+        if new_token.refresh_token:
+            request.session["refresh_token"] = new_token.refresh_token
         
-        if not token:
-            return None
-        
-        # Try to get user profile with current token
-        try:
-            profile = await auth_service.get_user_profile(token)
-            return User(
-                id=profile.id or profile.username,
-                username=profile.username,
-                email=profile.email,
-                full_name=profile.full_name,
-                role=profile.role,
-                profile_photo=profile.profile_photo,
-                phone=profile.phone,
-                permissions=profile.permissions or [],
-                system_access=profile.system_access
-            )
-        except HTTPException as e:
-            # If token is invalid/expired and we have refresh token, try to refresh
-            if e.status_code == 401 and refresh_token:
-                print(f"DEBUG: Access token expired, attempting refresh...")
-                try:
-                    new_token = await auth_service.refresh_token(refresh_token)
-                    # Update session with new tokens
-                    request.session["access_token"] = new_token.access_token
-                    if new_token.refresh_token:
-                        request.session["refresh_token"] = new_token.refresh_token
-                    
-                    # Try again with new token
-                    profile = await auth_service.get_user_profile(new_token.access_token)
-                    return User(
-                        id=profile.id or profile.username,
-                        username=profile.username,
-                        email=profile.email,
-                        full_name=profile.full_name,
-                        role=profile.role,
-                        profile_photo=profile.profile_photo,
-                        phone=profile.phone,
-                        permissions=profile.permissions or [],
-                        system_access=profile.system_access
-                    )
-                except HTTPException as refresh_error:
-                    print(f"Token refresh failed: {refresh_error.detail}")
-                    return None
-            return None
+        # Try again with new token
+        profile = await auth_service.get_user_profile(new_token.access_token)
+        return AuthContext(user=_user_from_profile(profile), token=new_token.access_token)
+    except HTTPException as refresh_error:
+        logger.info("Token refresh failed: %s", refresh_error.detail)
+        return AuthContext()
+
+@traced("auth.context")
+async def get_auth_context(request: Request) -> AuthContext:
+    """Get the request-scoped auth context, resolving it at most once per request
+    
+    Usable directly or as a FastAPI dependency; the result is stored on
+    request.state.auth so every later caller in the same request reuses it.
+    """
+    context = getattr(request.state, "auth", None)
+    if context is not None:
+        return context
+    
+    try:
+        context = await _resolve_auth_context(request)
     except Exception as e:
-        print(f"Error in get_current_user_with_refresh: {str(e)}")
-        return None
+        logger.exception("Error resolving auth context: %s", e)
+        context = AuthContext()
+    
+    request.state.auth = context
+    return context
+
+async def get_current_user_optional(request: Request) -> Optional[User]:
+    """Get current user from session (for template rendering)"""
+    return (await get_auth_context(request)).user
+
+async def get_current_user_with_refresh(request: Request) -> Optional[User]:
+    """Get current user from session with automatic token refresh"""
+    return (await get_auth_context(request)).user
 
 async def get_valid_token(request: Request) -> Optional[str]:
     """Get a valid access token, refreshing if necessary"""
-    try:
-        token = request.session.get("access_token")
-        refresh_token = request.session.get("refresh_token")
-        
-        if not token:
-            return None
-        
-        # Try to use the current token by making a simple API call
-        try:
-            await auth_service.get_user_profile(token)
-            return token  # Token is valid
-        except HTTPException as e:
-            # If token is invalid/expired and we have refresh token, try to refresh
-            if e.status_code == 401 and refresh_token:
-                try:
-                    new_token = await auth_service.refresh_token(refresh_token)
-                    # Update session with new tokens
-                    request.session["access_token"] = new_token.access_token
-                    if new_token.refresh_token:
-                        request.session["refresh_token"] = new_token.refresh_token
-                    return new_token.access_token
-                except HTTPException as refresh_error:
-                    print(f"Token refresh failed: {refresh_error.detail}")
-                    return None
-            return None
-    except Exception as e:
-        print(f"Error in get_valid_token: {str(e)}")
-        return None
+    return (await get_auth_context(request)).token
+
+def get_session_token(request: Request) -> Optional[str]:
+    """Access token for write calls without a profile lookup
+
+    Reuses the request's auth context when something already resolved it; otherwise
+    the session token goes to Stardust as-is and Stardust rejects it if expired.
+    """
+    context = getattr(request.state, "auth", None)
+    if context is not None:
+        return context.token
+    return request.session.get("access_token")
@@ -0,0 +1,264 @@
+"""
+In-process caching utilities for Opera Panel
+Small TTL caches with hit/miss counters shared by the service layer
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from fastapi import HTTPException
+
+# All caches created in the process, keyed by name (used for stats reporting);
+# any object with a stats() -> dict method can be registered
+CACHE_REGISTRY: Dict[str, Any] = {}
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """In-process cache with per-entry expiry, LRU eviction and hit/miss counters"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        register_cache(name, self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, or default when missing or expired"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        """Store a value; expires_at is a wall-clock timestamp that can shorten the TTL"""
+        lifetime = self.ttl if ttl is None else ttl
+        if expires_at is not None:
+            lifetime = min(lifetime, expires_at - time.time())
+        if lifetime <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + lifetime, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        """Remove an entry and return its value (None if absent)"""
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        self.evictions += 1
+        return entry[1]
+
+    def clear(self):
+        """Remove all entries"""
+        self.evictions += len(self._data)
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SnapshotCache:
+    """Whole-dataset snapshot with TTL, background refresh and serve-stale-on-error
+
+    The first request loads the snapshot with its own token. Once the snapshot is
+    older than the TTL, the next request is still answered from memory while a
+    background task reloads it with that request's token; a failed reload keeps
+    the old snapshot and waits retry_after seconds before trying again.
+    After invalidate() (a write through the panel) the next request waits for a
+    reload that started after the write, so the write is visible to it.
+
+    One snapshot serves every user, whoever's token loaded it, so it must only hold
+    data that Stardust returns identically to all panel users (reference data).
+    Before a user is first served from memory, _check_scope(token) asks Stardust
+    whether that user sees the same data: access errors (401/403) propagate, and a
+    different view is logged and forces a reload. Users are re-checked after `ttl`.
+    Subclasses implement _load(token) and _check_scope(token), and may add fields
+    via _snapshot_stats().
+    """
+
+    def __init__(self, name: str, ttl: float, retry_after: float):
+        self.name = name
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._snapshot: Any = None
+        self._loaded_at = 0.0
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        # Bumped by invalidate(); the snapshot is current once a load started at this generation
+        self._generation = 0
+        self._loaded_generation = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Users whose view of the data was checked against the snapshot (keyed by token hash)
+        self._checked = TTLCache(f"{name}:checked_users", ttl, maxsize=4096)
+        self.scope_mismatches = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.stale_served = 0
+        register_cache(name, self)
+
+    async def _load(self, token: str) -> Any:
+        raise NotImplementedError
+
+    async def _check_scope(self, token: str) -> bool:
+        """Whether this token sees the same data as the snapshot; raises if it may not read it"""
+        return True
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() >= self._expires_at
+
+    async def get(self, token: str) -> Any:
+        """Return the snapshot, loading it on first use"""
+        user = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        if self._snapshot is None:
+            self.misses += 1
+            async with self._lock:
+                if self._snapshot is None:
+                    await self._reload(token)
+                    self._checked.set(user, True)
+                    return self._snapshot
+
+        if self._checked.get(user) is None:
+            await self._check_user(user, token)
+        if self._loaded_generation != self._generation and time.monotonic() >= self._retry_at:
+            self.misses += 1
+            async with self._lock:
+                if self._loaded_generation != self._generation:
+                    try:
+                        await self._reload(token)
+                    except Exception as e:
+                        self.stale_served += 1
+                        logger.warning("%s reload after a write failed, serving stale data: %s", self.name, e)
+            return self._snapshot
+
+        snapshot = self._snapshot
+        self.hits += 1
+        if self.is_stale:
+            self.stale_served += 1
+            self._schedule_refresh(token)
+        return snapshot
+
+    async def _check_user(self, user: str, token: str):
+        try:
+            same = await self._check_scope(token)
+        except HTTPException as e:
+            if e.status_code in (401, 403):
+                raise
+            logger.warning("%s: could not check a user's view of the data: %s", self.name, e.detail)
+            return
+        except Exception as e:
+            logger.warning("%s: could not check a user's view of the data: %s", self.name, e)
+            return
+        if not same:
+            self.scope_mismatches += 1
+            logger.warning("%s: a user sees different data than the shared snapshot, reloading", self.name)
+            # Everyone is checked again against the reloaded snapshot
+            self._checked.clear()
+            self.invalidate()
+        self._checked.set(user, True)
+
+    def invalidate(self):
+        """Discard the snapshot's freshness: the next request waits for a reload"""
+        self._generation += 1
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+
+    def _schedule_refresh(self, token: str):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh(token))
+
+    async def _background_refresh(self, token: str):
+        try:
+            async with self._lock:
+                await self._reload(token)
+        except Exception as e:
+            # Serve stale data until the next retry window
+            logger.warning("%s refresh failed, serving stale data: %s", self.name, e)
+
+    async def _reload(self, token: str):
+        generation = self._generation
+        try:
+            snapshot = await self._load(token)
+        except Exception:
+            self.refresh_errors += 1
+            self._retry_at = time.monotonic() + self.retry_after
+            raise
+        self._snapshot = snapshot
+        self._loaded_generation = generation
+        self._loaded_at = time.monotonic()
+        self._expires_at = self._loaded_at + self.ttl
+        self.refreshes += 1
+
+    def _snapshot_stats(self) -> dict:
+        return {}
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "loaded": self._snapshot is not None,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._snapshot is not None else None,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "stale_served": self.stale_served,
+            "scope_mismatches": self.scope_mismatches,
+            **(self._snapshot_stats() if self._snapshot is not None else {})
+        }
+
+
+def register_cache(name: str, cache: Any):
+    """Register a cache so its stats are reported with the others"""
+    CACHE_REGISTRY[name] = cache
+
+
+def get_cache_stats() -> Dict[str, dict]:
+    """Stats for every registered cache"""
+    return {name: cache.stats() for name, cache in CACHE_REGISTRY.items()}
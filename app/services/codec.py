@@ -0,0 +1,83 @@
+"""
+JSON codec for Opera Panel
+Decodes Stardust responses and encodes the panel's JSON API responses with orjson when it
+is installed, falling back to the standard library (also for values orjson rejects)
+"""
+import json
+import logging
+import os
+from collections.abc import Mapping
+from typing import Any, Union
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib codec is always available
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# "auto" prefers orjson, "json" forces the standard library
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+
+def _default(value: Any) -> Any:
+    # Read-only mappings such as cached ReferenceRecords encode as objects
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _std_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+def _std_dumps(content: Any) -> bytes:
+    # Same output as Starlette's JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _orjson_loads(data: Union[bytes, str]) -> Any:
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # e.g. integers beyond 64 bits; malformed input raises the same error from json
+        return json.loads(data)
+
+
+def _orjson_dumps(content: Any) -> bytes:
+    try:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        return _std_dumps(content)
+
+
+def _select() -> str:
+    if JSON_CODEC == "json":
+        return "json"
+    if orjson is None:
+        if JSON_CODEC == "orjson":
+            logger.warning("JSON_CODEC=orjson but orjson is not installed; using json")
+        return "json"
+    return "orjson"
+
+
+CODEC = _select()
+loads = _orjson_loads if CODEC == "orjson" else _std_loads
+dumps = _orjson_dumps if CODEC == "orjson" else _std_dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the active codec
+
+    Return it directly from routes: FastAPI then skips jsonable_encoder, so the
+    content must already be JSON types (as decoded Stardust data is).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
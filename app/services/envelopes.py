@@ -0,0 +1,160 @@
+"""
+Response envelope decoding for Stardust API
+Stardust wraps payloads differently per endpoint ({"data": {"data": [...], "total": n}},
+{"data": {"hospital": {...}}}, {"items": [...]}, ...). The decoder declares or learns each
+endpoint's shape once, then extracts items, total and record with direct key lookups
+"""
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.services.metrics import upstream_decode_duration
+
+logger = logging.getLogger(__name__)
+
+# Keys from the response root down to the list or record
+Path = Tuple[str, ...]
+
+# Stardust collection name -> key of a single record in its record endpoint
+RECORD_KEYS = {"provinces": "province", "districts": "district", "sub_districts": "sub_district",
+               "hospital_types": "hospital_type", "hospitals": "hospital"}
+
+# Known shapes, by endpoint template; anything else (or a declared shape that stops
+# matching) is learned from the first response that has one
+DECLARED_LIST_PATHS: Dict[str, Path] = {
+    **{f"/admin/master-data/{collection}": ("data", "data") for collection in RECORD_KEYS},
+    **{f"/admin/dropdown/{collection}": ("data", collection.replace("-", "_"))
+       for collection in ("provinces", "districts", "sub-districts")},
+    "/admin/hospitals-raw-documents": ("data", "raw_documents"),
+    "/patients": ("items",),
+    "/hospitals": ("items",),
+    "/audit-logs": ("items",),
+    **{f"/devices/{kind}": ("items",) for kind in ("ava4", "kati", "qube-vital")},
+}
+DECLARED_RECORD_PATHS: Dict[str, Path] = {
+    f"/admin/master-data/{collection}/{{id}}": ("data", key) for collection, key in RECORD_KEYS.items()
+}
+
+# Preferred names when probing for a list; any other list of objects is the fallback
+_LIST_KEYS = ("data", "items", "results")
+_MISSING = object()
+
+
+class Listing(NamedTuple):
+    items: List[dict]
+    total: Optional[int]
+    # Fields next to the list in its envelope (e.g. field_analysis, metadata)
+    meta: dict
+
+
+def _lookup(node, path: Path):
+    for key in path:
+        if not isinstance(node, dict):
+            return _MISSING
+        node = node.get(key, _MISSING)
+        if node is _MISSING:
+            return _MISSING
+    return node
+
+
+def _find_list(node, path: Path = ()) -> Optional[Path]:
+    if isinstance(node, list):
+        return path
+    if not isinstance(node, dict):
+        return None
+    for key in _LIST_KEYS:
+        if key in node:
+            found = _find_list(node[key], path + (key,))
+            if found is not None:
+                return found
+    for key, value in node.items():
+        if isinstance(value, list) and (not value or isinstance(value[0], dict)):
+            return path + (key,)
+    return None
+
+
+def _find_record(response: dict, hint: Optional[str]) -> Optional[Path]:
+    data = response.get("data", _MISSING)
+    if data is _MISSING:
+        return ()
+    if not isinstance(data, dict):
+        return None
+    if hint and isinstance(data.get(hint), dict):
+        return ("data", hint)
+    if len(data) == 1:
+        key, value = next(iter(data.items()))
+        if isinstance(value, dict):
+            return ("data", key)
+    return ("data",)
+
+
+class EnvelopeDecoder:
+    """Per-endpoint envelope shapes, declared up front or learned on first sight"""
+
+    def __init__(self):
+        self._list_paths: Dict[str, Path] = dict(DECLARED_LIST_PATHS)
+        self._record_paths: Dict[str, Path] = dict(DECLARED_RECORD_PATHS)
+        self.decoded = 0
+        self.learned = 0
+        self.seconds = 0.0
+
+    def _learn(self, shapes: Dict[str, Path], template: str, path: Optional[Path]) -> Optional[Path]:
+        if path is not None and shapes.get(template) != path:
+            logger.info("Learned Stardust envelope for %s: %s", template, "/".join(path) or "<root>")
+            shapes[template] = path
+            self.learned += 1
+        return path
+
+    def _observe(self, template: str, start: float):
+        elapsed = time.perf_counter() - start
+        self.decoded += 1
+        self.seconds += elapsed
+        upstream_decode_duration.observe(elapsed, template)
+
+    def listing(self, template: str, response) -> Listing:
+        """Items, total and sibling fields of a list response"""
+        start = time.perf_counter()
+        path = self._list_paths.get(template)
+        items = _MISSING if path is None else _lookup(response, path)
+        if not isinstance(items, list):
+            path = self._learn(self._list_paths, template, _find_list(response))
+            items = _MISSING if path is None else _lookup(response, path)
+        if not isinstance(items, list):
+            self._observe(template, start)
+            return Listing([], 0, {})
+
+        container = _lookup(response, path[:-1]) if path else None
+        meta, total = {}, None
+        if isinstance(container, dict):
+            meta = {key: value for key, value in container.items() if key != path[-1] and key != "total"}
+            total = container.get("total")
+        if total is None and isinstance(response, dict):
+            total = response.get("total")
+        self._observe(template, start)
+        return Listing(items, total, meta)
+
+    def list_path(self, template: str) -> Path:
+        """Declared or learned path of the records in a list response (data/data if unknown)"""
+        return self._list_paths.get(template, ("data", "data"))
+
+    def record(self, template: str, response, hint: Optional[str] = None) -> Optional[dict]:
+        """The single record in a record response; None when Stardust reports no success"""
+        if not isinstance(response, dict) or response.get("success") is False:
+            return None
+        start = time.perf_counter()
+        path = self._record_paths.get(template)
+        record = _MISSING if path is None else _lookup(response, path)
+        if not isinstance(record, dict):
+            path = self._learn(self._record_paths, template, _find_record(response, hint))
+            record = _MISSING if path is None else _lookup(response, path)
+        self._observe(template, start)
+        return record if isinstance(record, dict) else None
+
+    def stats(self) -> dict:
+        return {
+            "decoded": self.decoded,
+            "learned": self.learned,
+            "decode_ms": round(self.seconds * 1000, 2),
+            "list_shapes": {template: "/".join(path) for template, path in sorted(self._list_paths.items())},
+            "record_shapes": {template: "/".join(path) for template, path in sorted(self._record_paths.items())}
+        }
@@ -0,0 +1,162 @@
+"""
+Thai geography reference cache for Opera Panel
+Holds provinces, districts and sub-districts in memory as compact records with O(1) code indexes
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+from app.services.cache import SnapshotCache
+from app.services.records import LocalizedName, ReferenceRecord, reference_record
+from app.services.sync import DeltaSync
+
+# Geography changes rarely; refresh in the background once entries are this old (seconds)
+GEOGRAPHY_CACHE_TTL = int(os.getenv("GEOGRAPHY_CACHE_TTL", "3600"))
+# After a failed refresh, keep serving stale data and wait this long before retrying
+GEOGRAPHY_RETRY_AFTER = int(os.getenv("GEOGRAPHY_RETRY_AFTER", "60"))
+
+GEOGRAPHY_TYPES = ("provinces", "districts", "sub-districts")
+
+
+def code_key(value) -> str:
+    """Normalize a province/district/sub-district code for index lookups ("010", 10 -> "10")"""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    try:
+        return str(int(text))
+    except ValueError:
+        return text
+
+
+def location_names(item: dict) -> Tuple[str, str]:
+    """Return (english, thai) names from any of the Stardust name formats"""
+    if isinstance(item, ReferenceRecord) and isinstance(item.name, LocalizedName):
+        return item.name.en or '', item.name.th or ''
+    if 'en_name' in item or 'th_name' in item:
+        return item.get('en_name') or '', item.get('th_name') or ''
+
+    name = item.get('name')
+    if isinstance(name, dict):
+        return name.get('en') or '', name.get('th') or ''
+    if isinstance(name, list):
+        names = {n.get('code'): n.get('name') or '' for n in name if isinstance(n, dict)}
+        return names.get('en', ''), names.get('th', '')
+    return (str(name) if name else ''), ''
+
+
+class GeographyIndex:
+    """Immutable snapshot of the geography tree with indexes by code and by parent code"""
+
+    def __init__(self, provinces: List[dict], districts: List[dict], sub_districts: List[dict]):
+        self.provinces = [reference_record(p) for p in provinces]
+        self.districts = [reference_record(d) for d in districts]
+        self.sub_districts = [reference_record(s) for s in sub_districts]
+
+        self.province_by_code: Dict[str, ReferenceRecord] = {code_key(p.get('code')): p for p in self.provinces}
+        self.district_by_code: Dict[str, ReferenceRecord] = {code_key(d.get('code')): d for d in self.districts}
+        self.sub_district_by_code: Dict[str, ReferenceRecord] = {code_key(s.get('code')): s for s in self.sub_districts}
+
+        self.districts_by_province: Dict[str, List[ReferenceRecord]] = {}
+        for district in self.districts:
+            self.districts_by_province.setdefault(code_key(district.get('province_code')), []).append(district)
+
+        self.sub_districts_by_district: Dict[str, List[ReferenceRecord]] = {}
+        for sub_district in self.sub_districts:
+            self.sub_districts_by_district.setdefault(code_key(sub_district.get('district_code')), []).append(sub_district)
+
+    def get_province(self, code) -> Optional[ReferenceRecord]:
+        return self.province_by_code.get(code_key(code))
+
+    def get_district(self, code) -> Optional[ReferenceRecord]:
+        return self.district_by_code.get(code_key(code))
+
+    def get_sub_district(self, code) -> Optional[ReferenceRecord]:
+        return self.sub_district_by_code.get(code_key(code))
+
+    def districts_in(self, province_code) -> List[ReferenceRecord]:
+        return self.districts_by_province.get(code_key(province_code), [])
+
+    def sub_districts_in(self, district_code, province_code=None) -> List[ReferenceRecord]:
+        sub_districts = self.sub_districts_by_district.get(code_key(district_code), [])
+        if province_code is None:
+            return sub_districts
+        province_key = code_key(province_code)
+        return [s for s in sub_districts
+                if s.get('province_code') is None or code_key(s.get('province_code')) == province_key]
+
+    def resolve_chain(self, sub_district_code=None, district_code=None, province_code=None) -> Dict[str, ReferenceRecord]:
+        """Resolve sub-district -> district -> province, falling back to the direct codes"""
+        related: Dict[str, ReferenceRecord] = {}
+
+        sub_district = self.get_sub_district(sub_district_code) if sub_district_code else None
+        if sub_district:
+            related["sub_district"] = sub_district
+            district_code = sub_district.get("district_code") or district_code
+
+        district = self.get_district(district_code) if district_code else None
+        if district:
+            related["district"] = district
+            province_code = district.get("province_code") or province_code
+
+        province = self.get_province(province_code) if province_code else None
+        if province:
+            related["province"] = province
+        return related
+
+    def counts(self) -> dict:
+        return {
+            "provinces": len(self.provinces),
+            "districts": len(self.districts),
+            "sub_districts": len(self.sub_districts)
+        }
+
+
+def filter_locations(items: List[dict], search: Optional[str] = None, include_inactive: bool = False,
+                     include_deleted: bool = False, sort_by: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[dict]:
+    """Apply the dropdown filters (status, search, sort, limit) to cached items"""
+    results = []
+    needle = search.strip().lower() if search else None
+    for item in items:
+        if not include_deleted and item.get('is_deleted'):
+            continue
+        if not include_inactive and item.get('is_active') is False:
+            continue
+        if needle:
+            en_name, th_name = location_names(item)
+            if needle not in en_name.lower() and needle not in th_name and needle != str(item.get('code', '')).lower():
+                continue
+        results.append(item)
+
+    if sort_by == "code":
+        results.sort(key=lambda i: (len(code_key(i.get('code'))), code_key(i.get('code'))))
+    elif sort_by == "en_name":
+        results.sort(key=lambda i: location_names(i)[0].lower())
+
+    if limit:
+        results = results[:limit]
+    return results
+
+
+class GeographyCache(SnapshotCache):
+    """Serves the geography tree from memory with TTL, background refresh and serve-stale-on-error"""
+
+    def __init__(self, api, ttl: int = GEOGRAPHY_CACHE_TTL):
+        super().__init__("geography", ttl, GEOGRAPHY_RETRY_AFTER)
+        self._syncs = {data_type: DeltaSync(api, data_type, compact=reference_record) for data_type in GEOGRAPHY_TYPES}
+
+    async def _load(self, token: str) -> GeographyIndex:
+        changed = await asyncio.gather(*(sync.sync(token) for sync in self._syncs.values()))
+        if self._snapshot is not None and not any(changed):
+            return self._snapshot
+        return GeographyIndex(*(self._syncs[data_type].values() for data_type in GEOGRAPHY_TYPES))
+
+    async def _check_scope(self, token: str) -> bool:
+        return all(await asyncio.gather(*(sync.same_view(token) for sync in self._syncs.values())))
+
+    def _snapshot_stats(self) -> dict:
+        return {
+            **self._snapshot.counts(),
+            "sync": {data_type: sync.stats() for data_type, sync in self._syncs.items()}
+        }
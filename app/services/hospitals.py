@@ -0,0 +1,155 @@
+"""
+Hospital snapshot for Opera Panel
+Keeps every hospital in memory so list pages are sorted, filtered and paginated locally
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.services.cache import SnapshotCache
+from app.services.geography import code_key, location_names
+from app.services.pagination import (
+    KeysetIndex, Page, decode_cursor, encode_cursor, record_is_active, updated_key
+)
+from app.services.search import NgramIndex
+from app.services.spatial import SpatialGrid
+from app.services.sync import DeltaSync
+
+# Age before the snapshot is refreshed in the background, and back-off after a failed refresh (seconds)
+HOSPITAL_SNAPSHOT_TTL = int(os.getenv("HOSPITAL_SNAPSHOT_TTL", "300"))
+HOSPITAL_SNAPSHOT_RETRY_AFTER = int(os.getenv("HOSPITAL_SNAPSHOT_RETRY_AFTER", "60"))
+
+
+def _strings(value) -> List[str]:
+    """Every string inside a (possibly nested) address value"""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [text for item in value.values() for text in _strings(item)]
+    if isinstance(value, list):
+        return [text for item in value for text in _strings(item)]
+    return []
+
+
+def hospital_search_fields(record: dict) -> List[Tuple[str, float]]:
+    """Searchable text of a hospital: names weigh most, then code, then address"""
+    en_name, th_name = location_names(record)
+    fields = [(th_name, 3.0), (en_name, 3.0), (str(record.get('code') or ''), 2.0)]
+    for field in ('address', 'address_details'):
+        fields.extend((text, 1.0) for text in _strings(record.get(field)))
+    return fields
+
+
+def hospital_filter(is_active: Optional[bool] = None, hospital_type_code=None):
+    """Predicate for geo queries: never deleted hospitals, optionally by active flag and type"""
+    type_key = code_key(hospital_type_code) if hospital_type_code else None
+
+    def matches(record: dict) -> bool:
+        if record.get('is_deleted'):
+            return False
+        if is_active is not None and record_is_active(record) != is_active:
+            return False
+        return type_key is None or code_key(record.get('hospital_type_code')) == type_key
+
+    return matches
+
+
+class HospitalIndex:
+    """Immutable hospital snapshot sorted newest first, indexed by ID and location codes"""
+
+    def __init__(self, hospitals: List[dict]):
+        self.keyset = KeysetIndex(hospitals, updated_key, descending=True)
+        self.records = self.keyset.records
+        self.by_id: Dict[str, dict] = {}
+        buckets: Dict[str, Dict[str, List[dict]]] = {"province": {}, "district": {}, "sub_district": {}}
+        for record in self.records:
+            record_id = record.get('_id') or record.get('id')
+            if record_id is not None:
+                self.by_id[str(record_id)] = record
+            # Buckets keep the newest-first order of self.records
+            for level, codes in buckets.items():
+                codes.setdefault(code_key(record.get(f'{level}_code')), []).append(record)
+
+        def index(codes):
+            return {code: KeysetIndex(records, updated_key, descending=True, presorted=True)
+                    for code, records in codes.items()}
+
+        self.by_province = index(buckets["province"])
+        self.by_district = index(buckets["district"])
+        self.by_sub_district = index(buckets["sub_district"])
+        self._text_index: Optional[NgramIndex] = None
+        self._spatial_index: Optional[SpatialGrid] = None
+
+    @property
+    def text_index(self) -> NgramIndex:
+        """Bilingual n-gram index over names and address, built on first search"""
+        if self._text_index is None:
+            self._text_index = NgramIndex(self.records, hospital_search_fields)
+        return self._text_index
+
+    @property
+    def spatial_index(self) -> SpatialGrid:
+        """Grid over hospital coordinates, built on first geo query"""
+        if self._spatial_index is None:
+            self._spatial_index = SpatialGrid(self.records)
+        return self._spatial_index
+
+    def search(self, query: str, predicate=None, cursor: Optional[str] = None,
+               skip: int = 0, limit: int = 25) -> Page:
+        """Ranked search results; the cursor carries the rank offset of the next page"""
+        if cursor:
+            position = decode_cursor(cursor)
+            if len(position) != 2 or position[0] != "rank" or not isinstance(position[1], int):
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+            skip = position[1]
+        ranked = self.text_index.search(query, predicate)
+        records = ranked[skip:skip + limit]
+        next_cursor = encode_cursor(("rank", skip + limit)) if skip + limit < len(ranked) else None
+        return Page(records, len(ranked), next_cursor)
+
+    def get(self, record_id) -> Optional[dict]:
+        return self.by_id.get(str(record_id))
+
+    def keyset_for(self, province_code=None, district_code=None, sub_district_code=None) -> KeysetIndex:
+        """Narrowest location bucket for the given filters"""
+        empty = KeysetIndex([], updated_key, descending=True, presorted=True)
+        if sub_district_code:
+            return self.by_sub_district.get(code_key(sub_district_code), empty)
+        if district_code:
+            return self.by_district.get(code_key(district_code), empty)
+        if province_code:
+            return self.by_province.get(code_key(province_code), empty)
+        return self.keyset
+
+    def counts(self) -> dict:
+        return {"hospitals": len(self.records)}
+
+
+class HospitalSnapshot(SnapshotCache):
+    """Serves the full hospital list from memory with background refresh"""
+
+    def __init__(self, api, ttl: int = HOSPITAL_SNAPSHOT_TTL):
+        super().__init__("hospitals", ttl, HOSPITAL_SNAPSHOT_RETRY_AFTER)
+        self._sync = DeltaSync(api, "hospitals")
+
+    async def _load(self, token: str) -> HospitalIndex:
+        changed = await self._sync.sync(token)
+        if self._snapshot is not None and not changed:
+            return self._snapshot
+        index = HospitalIndex(self._sync.values())
+        # Build the search and spatial indexes here, off the request path on refreshes
+        index.text_index
+        index.spatial_index
+        return index
+
+    async def _check_scope(self, token: str) -> bool:
+        return await self._sync.same_view(token)
+
+    def _snapshot_stats(self) -> dict:
+        stats = {**self._snapshot.counts(), "sync": self._sync.stats()}
+        if self._snapshot._text_index is not None:
+            stats["search_index"] = self._snapshot._text_index.stats()
+        if self._snapshot._spatial_index is not None:
+            stats["spatial_index"] = self._snapshot._spatial_index.stats()
+        return stats
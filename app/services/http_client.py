@@ -0,0 +1,191 @@
+"""
+Shared upstream HTTP client for Opera Panel
+One tuned, lifecycle-managed connection pool for all Stardust traffic
+"""
+import contextlib
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.services.metrics import upstream_pool_wait
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration
+STARDUST_POOL_MAX_CONNECTIONS = int(os.getenv("STARDUST_POOL_MAX_CONNECTIONS", "100"))
+STARDUST_POOL_MAX_KEEPALIVE = int(os.getenv("STARDUST_POOL_MAX_KEEPALIVE", "20"))
+STARDUST_POOL_KEEPALIVE_EXPIRY = float(os.getenv("STARDUST_POOL_KEEPALIVE_EXPIRY", "60"))
+STARDUST_HTTP2 = os.getenv("STARDUST_HTTP2", "true").lower() == "true"
+
+# Per-phase timeouts (seconds)
+STARDUST_CONNECT_TIMEOUT = float(os.getenv("STARDUST_CONNECT_TIMEOUT", "5"))
+STARDUST_READ_TIMEOUT = float(os.getenv("STARDUST_READ_TIMEOUT", "30"))
+STARDUST_WRITE_TIMEOUT = float(os.getenv("STARDUST_WRITE_TIMEOUT", "10"))
+STARDUST_POOL_TIMEOUT = float(os.getenv("STARDUST_POOL_TIMEOUT", "5"))
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _RequestTrace:
+    """httpcore trace callback measuring connection setup and pool wait for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect_time = 0.0
+        self.new_connection = False
+        self.sent_at: Optional[float] = None
+        self._phase_started = 0.0
+
+    async def __call__(self, event_name: str, info: dict):
+        if event_name.endswith((".connect_tcp.started", ".start_tls.started")):
+            self.new_connection = True
+            self._phase_started = time.perf_counter()
+        elif event_name.endswith((".connect_tcp.complete", ".start_tls.complete")):
+            self.connect_time += time.perf_counter() - self._phase_started
+        elif event_name.endswith(".send_request_headers.started") and self.sent_at is None:
+            self.sent_at = time.perf_counter()
+
+    @property
+    def wait_time(self) -> float:
+        """Time spent queued for a pooled connection (excludes TCP/TLS setup)"""
+        if self.sent_at is None:
+            return 0.0
+        return max(0.0, self.sent_at - self.started - self.connect_time)
+
+
+class UpstreamClient:
+    """Owns the shared httpx.AsyncClient; created and closed by the FastAPI lifespan
+
+    The client is also created lazily on first use so scripts and tests that
+    never run the lifespan keep working.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport = transport
+        self.http2 = STARDUST_HTTP2 and http2_available()
+        self.requests = 0
+        self.new_connections = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.connect_time_total = 0.0
+
+    def _create_client(self) -> httpx.AsyncClient:
+        if self._transport is not None:
+            return httpx.AsyncClient(transport=self._transport, timeout=STARDUST_READ_TIMEOUT)
+        if STARDUST_HTTP2 and not self.http2:
+            logger.warning("STARDUST_HTTP2 is enabled but the h2 package is not installed, using HTTP/1.1")
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=STARDUST_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=STARDUST_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=STARDUST_POOL_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=STARDUST_CONNECT_TIMEOUT,
+                read=STARDUST_READ_TIMEOUT,
+                write=STARDUST_WRITE_TIMEOUT,
+                pool=STARDUST_POOL_TIMEOUT
+            )
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def start(self):
+        """Open the pool (called on application startup)"""
+        _ = self.client
+
+    async def close(self):
+        """Close pooled connections (called on application shutdown)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def use_transport(self, transport: Optional[httpx.AsyncBaseTransport]):
+        """Route upstream traffic through a custom transport (e.g. an in-process fake Stardust);
+        None restores the real connection pool"""
+        await self.close()
+        self._transport = transport
+
+    def _record(self, trace: _RequestTrace):
+        self.requests += 1
+        if trace.new_connection:
+            self.new_connections += 1
+            self.connect_time_total += trace.connect_time
+        wait_time = trace.wait_time
+        upstream_pool_wait.observe(wait_time)
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the shared pool, recording pool-level stats"""
+        trace = _RequestTrace()
+        extensions = kwargs.pop("extensions", None) or {}
+        extensions["trace"] = trace
+        try:
+            return await self.client.request(method, url, extensions=extensions, **kwargs)
+        finally:
+            self._record(trace)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Like request(), but the caller reads the body incrementally inside the block"""
+        trace = _RequestTrace()
+        extensions = kwargs.pop("extensions", None) or {}
+        extensions["trace"] = trace
+        try:
+            async with self.client.stream(method, url, extensions=extensions, **kwargs) as response:
+                yield response
+        finally:
+            self._record(trace)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _pool_connections(self) -> tuple:
+        """(active, idle) connection counts from the httpcore pool, if reachable"""
+        try:
+            connections = self._client._transport._pool.connections
+        except AttributeError:
+            return None, None
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return len(connections) - idle, idle
+
+    def stats(self) -> dict:
+        active, idle = self._pool_connections() if self._client is not None else (0, 0)
+        reused = self.requests - self.new_connections
+        return {
+            "http2": self.http2,
+            "max_connections": STARDUST_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": STARDUST_POOL_MAX_KEEPALIVE,
+            "active_connections": active,
+            "idle_connections": idle,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+            "avg_connect_ms": round(self.connect_time_total / self.new_connections * 1000, 2) if self.new_connections else 0.0,
+            "avg_wait_ms": round(self.wait_time_total / self.requests * 1000, 2) if self.requests else 0.0,
+            "max_wait_ms": round(self.wait_time_max * 1000, 2)
+        }
+
+
+# Global instance shared by AuthService and StardustAPIService
+upstream = UpstreamClient()
@@ -0,0 +1,220 @@
+"""
+Structured logging for Opera Panel
+JSON (or text) records through a non-blocking queue handler, with per-module levels,
+request-ID correlation, sampling of high-volume events and token redaction
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+# Root level, per-logger overrides ("app.services.stardust_api=DEBUG,app.routes.auth=WARNING"),
+# output format (json or text) and the share of sampled events kept (0-1)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Correlates every record logged while handling one HTTP request
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+_REDACT_PATTERNS = (
+    (re.compile(r"(?i)(bearer\s+)[\w\-.~+/]+=*"), r"\1[REDACTED]"),
+    (re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]*"), "[REDACTED_JWT]"),
+    (re.compile(r"(?i)(['\"]?(?:access_token|refresh_token|password|token)['\"]?\s*[:=]\s*['\"]?)[^'\",\s}]+"),
+     r"\1[REDACTED]"),
+)
+
+# LogRecord attributes that aren't user-supplied extra fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def redact(text: str) -> str:
+    """Mask bearer tokens, JWTs and token/password values"""
+    for pattern, replacement in _REDACT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every 1/rate records flagged `extra={"sample": True}`, per call site;
+    warnings and errors are never sampled out"""
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counts: Dict[tuple, int] = {}
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False) or record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            self.dropped += 1
+            return False
+        site = (record.name, record.msg)
+        count = self._counts.get(site, 0)
+        self._counts[site] = count + 1
+        if count % self.every:
+            self.dropped += 1
+            return False
+        record.sampled_every = self.every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": redact(record.getMessage())
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key != "sample":
+                entry[key] = redact(value) if isinstance(value, str) else value
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+# The formatted output the listener writes to; stays on the root logger between shutdown and restart
+_output: Optional[logging.Handler] = None
+_lock = threading.Lock()
+sampling = SamplingFilter()
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """"name=LEVEL,name=LEVEL" -> {name: levelno}, skipping malformed entries"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        level = level.strip().upper()
+        if name.strip() and isinstance(logging.getLevelName(level), int):
+            levels[name.strip()] = logging.getLevelName(level)
+    return levels
+
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT,
+                      stream=None) -> logging.handlers.QueueListener:
+    """Route all records through a QueueHandler; a background thread formats and writes them
+
+    Safe to call again after shutdown_logging(): the listener is restarted on the
+    previous output unless a new stream is given.
+    """
+    global _listener, _output
+    with _lock:
+        if _listener is not None:
+            return _listener
+        if stream is not None or _output is None:
+            _output = logging.StreamHandler(stream or sys.stdout)
+        output = _output
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        # Filters run on the QueueHandler while the listener is up (see shutdown_logging)
+        output.filters = []
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(sampling)
+        # Keep the record as-is (lazy %-args are formatted on the listener thread, not the caller's)
+        handler.prepare = lambda record: record
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(logging.getLevelName(level) if isinstance(logging.getLevelName(level), int) else logging.INFO)
+        for name, levelno in parse_levels(levels).items():
+            logging.getLogger(name).setLevel(levelno)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.unregister(shutdown_logging)
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread
+
+    The root logger then writes straight to the output, so records logged before
+    configure_logging() runs again are not left in a queue nobody drains.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+                for log_filter in handler.filters:
+                    _output.addFilter(log_filter)
+        if _output not in root.handlers:
+            root.addHandler(_output)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: adopt the caller's X-Request-ID (or mint one), expose it to log records
+    and echo it on the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or new_request_id()
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,260 @@
+"""
+Prometheus-style metrics for Opera Panel
+Minimal counters, gauges and histograms rendered in the text exposition format, plus
+collectors that read pool, cache, single-flight and circuit breaker stats at scrape time
+"""
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Latency bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Envelope decoding is a few key lookups, so its buckets start in microseconds
+DECODE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+# Waiting for a pooled connection is near zero until the pool is saturated
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _series_order(item) -> tuple:
+    # Label values mix types (e.g. status 200 and "error"), so order them as text
+    return tuple(str(value) for value in item[0])
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(self._values.items(), key=_series_order)]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observe() is a bisect and three increments"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._series.items(), key=_series_order):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+# A collector returns (name, type, help, [(labels dict, value)]) tuples, read at scrape time
+Sample = Tuple[str, str, str, List[Tuple[dict, float]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], List[Sample]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, collect: Callable[[], List[Sample]]):
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue  # not known (e.g. pool internals unreachable): no sample
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "opera_http_request_duration_seconds", "Panel request latency by route template",
+    ("method", "route", "status"))
+http_requests_in_flight = registry.gauge(
+    "opera_http_requests_in_flight", "Panel requests currently being handled")
+upstream_request_duration = registry.histogram(
+    "opera_upstream_request_duration_seconds", "Stardust call latency by endpoint template and status",
+    ("method", "endpoint", "status"))
+upstream_requests_in_flight = registry.gauge(
+    "opera_upstream_requests_in_flight", "Stardust calls currently awaiting a response")
+upstream_decode_duration = registry.histogram(
+    "opera_upstream_decode_duration_seconds", "Time to extract items/record from a Stardust envelope",
+    ("endpoint",), buckets=DECODE_BUCKETS)
+upstream_pool_wait = registry.histogram(
+    "opera_upstream_pool_wait_seconds", "Time Stardust requests waited for a pooled connection",
+    buckets=POOL_WAIT_BUCKETS)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request, labelled by the matched route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route on the scope; unmatched paths share one label
+            route = scope.get("route")
+            template = getattr(route, "path", None) or ("/static" if scope["path"].startswith("/static/") else "unmatched")
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], template, status[0])
+
+
+@registry.collector
+def service_stats() -> List[Sample]:
+    """Pool, cache, single-flight and breaker gauges from the services' own stats()"""
+    from app.services.cache import get_cache_stats
+    from app.services.http_client import upstream
+    from app.services.stardust_api import stardust_api
+
+    pool = upstream.stats()
+    caches = get_cache_stats()
+    flights = stardust_api.single_flight_stats()
+    resilience = stardust_api.resilience_stats()
+    breaker_states = {"closed": 0, "half_open": 1, "open": 2}
+
+    def per_cache(field):
+        return [({"cache": name}, stats.get(field, 0)) for name, stats in sorted(caches.items())]
+
+    def per_breaker(value):
+        return [({"endpoint": name}, value(stats)) for name, stats in resilience["breakers"].items()]
+
+    return [
+        ("opera_upstream_pool_connections", "gauge", "Stardust pool connections by state",
+         [({"state": "active"}, pool["active_connections"]), ({"state": "idle"}, pool["idle_connections"])]),
+        ("opera_upstream_pool_requests_total", "counter", "Requests sent through the Stardust pool",
+         [({}, pool["requests"])]),
+        ("opera_upstream_pool_new_connections_total", "counter", "Connections opened by the Stardust pool",
+         [({}, pool["new_connections"])]),
+        ("opera_upstream_pool_reuse_ratio", "gauge", "Share of requests that reused a pooled connection",
+         [({}, pool["reuse_rate"])]),
+        ("opera_cache_hits_total", "counter", "Cache hits", per_cache("hits")),
+        ("opera_cache_misses_total", "counter", "Cache misses", per_cache("misses")),
+        ("opera_cache_hit_ratio", "gauge", "Cache hits / lookups", per_cache("hit_ratio")),
+        ("opera_single_flight_total", "counter", "Upstream GETs sent (leader) or joined in flight (coalesced)",
+         [({"role": "leader"}, flights["leaders"]), ({"role": "coalesced"}, flights["coalesced"])]),
+        ("opera_retry_budget_tokens", "gauge", "Retry tokens available",
+         [({}, resilience["retry_budget"]["tokens"])]),
+        ("opera_retries_total", "counter", "Stardust requests retried",
+         [({}, resilience["retry_budget"]["retries"])]),
+        ("opera_retry_budget_exhausted_total", "counter", "Retries skipped because the budget was spent",
+         [({}, resilience["retry_budget"]["exhausted"])]),
+        ("opera_circuit_breaker_state", "gauge", "Breaker state per endpoint (0 closed, 1 half-open, 2 open)",
+         per_breaker(lambda stats: breaker_states.get(stats["state"], 0))),
+        ("opera_circuit_breaker_trips_total", "counter", "Times each endpoint's breaker opened",
+         per_breaker(lambda stats: stats["trips"])),
+        ("opera_circuit_breaker_rejected_total", "counter", "Calls failed fast by each endpoint's open breaker",
+         per_breaker(lambda stats: stats["rejected"])),
+    ]
+
+
+def render_metrics() -> str:
+    return registry.render()
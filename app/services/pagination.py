@@ -0,0 +1,184 @@
+"""
+Keyset (cursor) pagination over in-memory master data snapshots
+Pages seek by the sort key of the last record seen, so every page costs the same
+and paging stays stable while records are added or removed
+"""
+import base64
+import json
+import os
+from bisect import bisect_left, bisect_right
+from typing import Callable, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+from app.services.cache import SnapshotCache
+from app.services.geography import code_key, location_names
+from app.services.sync import DeltaSync
+
+# Snapshot lifetime for master data types without a dedicated cache (seconds)
+MASTER_DATA_SNAPSHOT_TTL = int(os.getenv("MASTER_DATA_SNAPSHOT_TTL", "300"))
+MASTER_DATA_SNAPSHOT_RETRY_AFTER = int(os.getenv("MASTER_DATA_SNAPSHOT_RETRY_AFTER", "60"))
+
+
+def record_sort_date(record: dict) -> str:
+    """Last-modified timestamp used for newest-first ordering (updated_at, then created_at)"""
+    return str(record.get('updated_at') or record.get('created_at') or '')
+
+
+def record_is_active(record: dict) -> bool:
+    """Interpret is_active the way the list filter always has (missing or unknown -> inactive)"""
+    value = record.get('is_active')
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.lower() in ['true', '1', 'active', 'yes']
+    return False
+
+
+def updated_key(record: dict) -> tuple:
+    """(updated_at, id) keyset for newest-first lists"""
+    return record_sort_date(record), str(record.get('_id') or record.get('id') or record.get('code') or '')
+
+
+def code_order_key(record: dict) -> tuple:
+    """(code) keyset for code-ordered lists; numeric codes sort numerically"""
+    code = code_key(record.get('code'))
+    return (0, int(code), '') if code.isdigit() else (1, 0, code)
+
+
+def encode_cursor(key: tuple) -> str:
+    """Opaque, URL-safe cursor for a sort key"""
+    raw = json.dumps(list(key), separators=(',', ':'), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Sort key from a cursor; 400 if it was tampered with or truncated"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if not isinstance(key, list):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return tuple(key)
+
+
+def record_filter(search: Optional[str] = None, province_code=None, district_code=None,
+                  sub_district_code=None, is_active: Optional[bool] = None, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None) -> Optional[Callable[[dict], bool]]:
+    """Predicate for the master data list filters, or None when no filter is set"""
+    needle = search.strip().lower() if search and search.strip() else None
+    province_key = code_key(province_code) if province_code else None
+    district_key = code_key(district_code) if district_code else None
+    sub_district_key = code_key(sub_district_code) if sub_district_code else None
+    if not (needle or province_key or district_key or sub_district_key
+            or is_active is not None or date_from or date_to):
+        return None
+
+    def matches(record: dict) -> bool:
+        if province_key and code_key(record.get('province_code')) != province_key:
+            return False
+        if district_key and code_key(record.get('district_code')) != district_key:
+            return False
+        if sub_district_key and code_key(record.get('sub_district_code')) != sub_district_key:
+            return False
+        if is_active is not None and record_is_active(record) != is_active:
+            return False
+        if date_from or date_to:
+            day = record_sort_date(record)[:10]
+            if (date_from and day < date_from) or (date_to and day > date_to):
+                return False
+        if needle:
+            en_name, th_name = location_names(record)
+            if (needle not in en_name.lower() and needle not in th_name
+                    and needle not in str(record.get('code', '')).lower()):
+                return False
+        return True
+
+    return matches
+
+
+class Page(NamedTuple):
+    records: List[dict]
+    total: int
+    next_cursor: Optional[str]
+
+
+class KeysetIndex:
+    """Records in display order with their sort keys, for O(log n) cursor seeks"""
+
+    def __init__(self, records: List[dict], key: Callable[[dict], tuple], descending: bool = False,
+                 presorted: bool = False):
+        self.key = key
+        self.descending = descending
+        self.records = records if presorted else sorted(records, key=key, reverse=descending)
+        keys = [key(record) for record in self.records]
+        # bisect needs ascending keys; descending lists keep theirs reversed
+        self._ascending_keys = keys[::-1] if descending else keys
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def seek(self, cursor: Optional[str]) -> int:
+        """Display position of the first record after the cursor"""
+        if not cursor:
+            return 0
+        key = decode_cursor(cursor)
+        try:
+            if self.descending:
+                return len(self.records) - bisect_left(self._ascending_keys, key)
+            return bisect_right(self._ascending_keys, key)
+        except TypeError:
+            # Cursor from a list with a different key shape
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    def page(self, cursor: Optional[str] = None, limit: int = 25,
+             predicate: Optional[Callable[[dict], bool]] = None, skip: int = 0) -> Page:
+        """One page after the cursor (or after `skip` matches when no cursor is given)"""
+        start = self.seek(cursor)
+        if predicate is None:
+            start += skip
+            records = self.records[start:start + limit]
+            has_more = start + limit < len(self.records)
+            total = len(self.records)
+        else:
+            records = []
+            has_more = False
+            to_skip = skip
+            for position in range(start, len(self.records)):
+                record = self.records[position]
+                if not predicate(record):
+                    continue
+                if to_skip:
+                    to_skip -= 1
+                    continue
+                if len(records) == limit:
+                    has_more = True
+                    break
+                records.append(record)
+            total = sum(1 for record in self.records if predicate(record))
+
+        next_cursor = encode_cursor(self.key(records[-1])) if has_more and records else None
+        return Page(records, total, next_cursor)
+
+
+class MasterDataSnapshot(SnapshotCache):
+    """Whole master data collection in memory, newest first, for types without a dedicated snapshot"""
+
+    def __init__(self, api, data_type: str, ttl: int = MASTER_DATA_SNAPSHOT_TTL):
+        super().__init__(f"master_data:{data_type}", ttl, MASTER_DATA_SNAPSHOT_RETRY_AFTER)
+        self.data_type = data_type
+        self._sync = DeltaSync(api, data_type)
+
+    async def _load(self, token: str) -> KeysetIndex:
+        changed = await self._sync.sync(token)
+        if self._snapshot is not None and not changed:
+            return self._snapshot
+        return KeysetIndex(self._sync.values(), updated_key, descending=True)
+
+    async def _check_scope(self, token: str) -> bool:
+        return await self._sync.same_view(token)
+
+    def _snapshot_stats(self) -> dict:
+        return {"records": len(self._snapshot), "sync": self._sync.stats()}
@@ -0,0 +1,196 @@
+"""
+Compact records for cached reference data
+Provinces, districts, sub-districts and hospital types are held as __slots__ objects with
+shared, interned localized names instead of generic dicts (and normalized copies of them)
+"""
+import sys
+import weakref
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional, Tuple
+
+# Fields stored in slots; anything else Stardust sends is kept in a per-record dict
+FIELDS = ("_id", "code", "province_code", "district_code", "is_active", "is_deleted",
+          "created_at", "updated_at")
+_FIELD_SET = frozenset(FIELDS)
+_MISSING = object()
+
+# How the name was sent, so the mapping view gives it back in the same shape
+_NO_NAME, _NAME_FIELDS, _NAME_DICT, _NAME_LIST_EN_TH, _NAME_LIST_TH_EN, _NAME_TEXT, _NAME_RAW = range(7)
+_NAME_KEYS = {_NO_NAME: frozenset(), _NAME_FIELDS: frozenset(("name", "en_name", "th_name"))}
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class LocalizedName:
+    """English/Thai name pair; records with the same names share one instance"""
+
+    __slots__ = ("en", "th", "__weakref__")
+
+    def __init__(self, en: Optional[str], th: Optional[str]):
+        self.en = en
+        self.th = th
+
+    def localized(self, language: str = "en") -> str:
+        if language == "th":
+            return self.th or self.en or ""
+        return self.en or self.th or ""
+
+    def __bool__(self) -> bool:
+        return bool(self.en or self.th)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, LocalizedName):
+            return NotImplemented
+        return self.en == other.en and self.th == other.th
+
+    def __hash__(self) -> int:
+        return hash((self.en, self.th))
+
+    def __str__(self) -> str:
+        return self.localized()
+
+    def __repr__(self) -> str:
+        return f"LocalizedName(en={self.en!r}, th={self.th!r})"
+
+
+_names: "weakref.WeakValueDictionary[Tuple, LocalizedName]" = weakref.WeakValueDictionary()
+
+
+def localized_name(en, th) -> LocalizedName:
+    """The shared LocalizedName for a pair of names"""
+    key = (en, th)
+    name = _names.get(key)
+    if name is None:
+        name = _names[key] = LocalizedName(_intern(en), _intern(th))
+    return name
+
+
+def _list_entry(entry, language: str) -> bool:
+    return type(entry) is dict and len(entry) == 2 and entry.get("code") == language and "name" in entry
+
+
+def _compact_name(record: Mapping) -> Tuple[Any, int]:
+    if "en_name" in record and "th_name" in record:
+        # Same result as the old normalization: en_name/th_name plus a {"en", "th"} name
+        return localized_name(record["en_name"], record["th_name"]), _NAME_FIELDS
+    name = record.get("name", _MISSING)
+    if name is _MISSING:
+        return None, _NO_NAME
+    if type(name) is dict and len(name) == 2 and "en" in name and "th" in name:
+        return localized_name(name["en"], name["th"]), _NAME_DICT
+    if type(name) is list and len(name) == 2:
+        if _list_entry(name[0], "en") and _list_entry(name[1], "th"):
+            return localized_name(name[0]["name"], name[1]["name"]), _NAME_LIST_EN_TH
+        if _list_entry(name[0], "th") and _list_entry(name[1], "en"):
+            return localized_name(name[1]["name"], name[0]["name"]), _NAME_LIST_TH_EN
+    if type(name) is str:
+        return localized_name(name, None), _NAME_TEXT
+    return name, _NAME_RAW
+
+
+class ReferenceRecord(Mapping):
+    """Read-only cached reference record
+
+    Templates use attribute access (record.code, record.name as a LocalizedName);
+    filters, JSON responses and everything else see a mapping in the shape Stardust sent.
+    """
+
+    __slots__ = FIELDS + ("_name", "_name_format", "_extra")
+
+    def __init__(self, record: Mapping):
+        for field in FIELDS:
+            value = record.get(field, _MISSING)
+            if value is not _MISSING:
+                setattr(self, field, value)
+        self._name, self._name_format = _compact_name(record)
+        name_keys = _NAME_KEYS.get(self._name_format, frozenset(("name",)))
+        extra = {key: value for key, value in record.items() if key not in _FIELD_SET and key not in name_keys}
+        self._extra = extra or None
+
+    @property
+    def name(self):
+        """LocalizedName (or the name as sent, if it has an unknown shape)"""
+        return self._name
+
+    def _name_items(self) -> Tuple[Tuple[str, Any], ...]:
+        name, name_format = self._name, self._name_format
+        if name_format == _NO_NAME:
+            return ()
+        if name_format == _NAME_FIELDS:
+            return ("en_name", name.en), ("th_name", name.th), ("name", {"en": name.en, "th": name.th})
+        if name_format == _NAME_DICT:
+            return (("name", {"en": name.en, "th": name.th}),)
+        if name_format == _NAME_LIST_EN_TH:
+            return (("name", [{"code": "en", "name": name.en}, {"code": "th", "name": name.th}]),)
+        if name_format == _NAME_LIST_TH_EN:
+            return (("name", [{"code": "th", "name": name.th}, {"code": "en", "name": name.en}]),)
+        if name_format == _NAME_TEXT:
+            return (("name", name.en),)
+        return (("name", name),)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        for name_key, value in self._name_items():
+            if name_key == key:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self) -> Iterator[str]:
+        for field in FIELDS:
+            if hasattr(self, field):
+                yield field
+        for name_key, _ in self._name_items():
+            yield name_key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        """The record as a plain dict, in the shape Stardust sent it"""
+        record = {}
+        for field in FIELDS:
+            value = getattr(self, field, _MISSING)
+            if value is not _MISSING:
+                record[field] = value
+        record.update(self._name_items())
+        if self._extra is not None:
+            record.update(self._extra)
+        return record
+
+    def _state(self) -> tuple:
+        return tuple(getattr(self, field, _MISSING) for field in FIELDS) + (self._name, self._name_format, self._extra)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ReferenceRecord):
+            return self._state() == other._state()
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ReferenceRecord({self.to_dict()!r})"
+
+
+def reference_record(record) -> ReferenceRecord:
+    """Compact a Stardust record (records that already are compact are returned as is)"""
+    if isinstance(record, ReferenceRecord):
+        return record
+    return ReferenceRecord(record)
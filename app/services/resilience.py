@@ -0,0 +1,201 @@
+"""
+Resilience primitives for Stardust calls
+Jittered exponential backoff, a shared retry budget and per-endpoint circuit breakers
+"""
+import os
+import random
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+# Retries for idempotent requests (GET) on transient failures
+STARDUST_RETRY_ATTEMPTS = int(os.getenv("STARDUST_RETRY_ATTEMPTS", "2"))
+STARDUST_RETRY_BASE_DELAY = float(os.getenv("STARDUST_RETRY_BASE_DELAY", "0.1"))
+STARDUST_RETRY_MAX_DELAY = float(os.getenv("STARDUST_RETRY_MAX_DELAY", "2.0"))
+# No retry is started once this many seconds have passed since the first attempt
+STARDUST_RETRY_DEADLINE = float(os.getenv("STARDUST_RETRY_DEADLINE", "10"))
+# Retries may add at most this fraction of extra load on top of the original requests,
+# plus a small reserve so a quiet process can still retry
+STARDUST_RETRY_BUDGET_RATIO = float(os.getenv("STARDUST_RETRY_BUDGET_RATIO", "0.2"))
+STARDUST_RETRY_BUDGET_MIN = float(os.getenv("STARDUST_RETRY_BUDGET_MIN", "10"))
+
+# Consecutive failures that open an endpoint's breaker, and how long it stays open (seconds)
+STARDUST_BREAKER_FAILURE_THRESHOLD = int(os.getenv("STARDUST_BREAKER_FAILURE_THRESHOLD", "5"))
+STARDUST_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("STARDUST_BREAKER_RECOVERY_TIMEOUT", "30"))
+# A half-open probe that has not reported back after this long no longer blocks the next one
+STARDUST_BREAKER_PROBE_TIMEOUT = float(os.getenv("STARDUST_BREAKER_PROBE_TIMEOUT", "60"))
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Responses worth retrying, and responses that count against the endpoint's health
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+BREAKER_FAILURE_STATUS = frozenset({500, 502, 503, 504})
+
+# Collections whose trailing path segment is a record ID
+_ID_COLLECTIONS = (
+    ("patients",),
+    ("hospitals",),
+    ("devices", "ava4"),
+    ("devices", "kati"),
+    ("devices", "qube-vital"),
+)
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Collapse record IDs so all calls to one route share a key ("/patients/p1" -> "/patients/{id}")"""
+    path = endpoint.split("?", 1)[0]
+    segments = [s for s in path.split("/") if s]
+    if len(segments) == 4 and segments[:2] == ["admin", "master-data"]:
+        segments[3] = "{id}"
+    else:
+        for collection in _ID_COLLECTIONS:
+            if len(segments) == len(collection) + 1 and tuple(segments[:-1]) == collection:
+                segments[-1] = "{id}"
+                break
+    return "/" + "/".join(segments)
+
+
+def backoff_delay(attempt: int, base: float = STARDUST_RETRY_BASE_DELAY,
+                  cap: float = STARDUST_RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of recent requests
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so
+    during an outage retries stop amplifying load instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float = STARDUST_RETRY_BUDGET_RATIO, minimum: float = STARDUST_RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.capacity = max(minimum, 1.0) * 2
+        self.tokens = minimum
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry token; False when the budget is exhausted"""
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tokens": round(self.tokens, 2),
+            "ratio": self.ratio,
+            "retries": self.retries,
+            "exhausted": self.exhausted
+        }
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe after the recovery timeout"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = STARDUST_BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = STARDUST_BREAKER_RECOVERY_TIMEOUT,
+                 probe_timeout: float = STARDUST_BREAKER_PROBE_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> bool:
+        """Raise 503 without calling upstream while the breaker is open
+
+        Returns True when this call is the half-open probe; the caller must then
+        release_probe() once it is done, however it ends.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return False
+        if state == self.HALF_OPEN:
+            now = time.monotonic()
+            if not self._probe_in_flight or now - self._probe_started_at >= self.probe_timeout:
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                return True
+        self.rejected += 1
+        raise HTTPException(status_code=503, detail=f"Stardust API temporarily unavailable ({self.name})")
+
+    def release_probe(self):
+        """Let the next call probe again if this probe ended without recording a result"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self._state = self.CLOSED
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.trips += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected
+        }
+
+
+class BreakerRegistry:
+    """One circuit breaker per endpoint template, created on first use"""
+
+    def __init__(self, failure_threshold: int = STARDUST_BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = STARDUST_BREAKER_RECOVERY_TIMEOUT,
+                 probe_timeout: float = STARDUST_BREAKER_PROBE_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        name = endpoint_template(endpoint)
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, self.failure_threshold, self.recovery_timeout, self.probe_timeout)
+            self._breakers[name] = breaker
+        return breaker
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: breaker.stats() for name, breaker in sorted(self._breakers.items())}
+
+    def open_count(self) -> int:
+        return sum(1 for breaker in self._breakers.values() if breaker.state != CircuitBreaker.CLOSED)
+
+
+def is_retryable(method: str, status_code: Optional[int]) -> bool:
+    return method in IDEMPOTENT_METHODS and status_code in RETRYABLE_STATUS
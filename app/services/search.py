@@ -0,0 +1,170 @@
+"""
+In-memory full-text search for Opera Panel
+Character n-gram inverted index, so Thai text (no spaces between words) is searchable
+without a dictionary; results are ranked by where and how well each term matches.
+Also a sorted-array prefix index for typeahead suggestions
+"""
+import unicodedata
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.geography import location_names
+
+# (text, weight) pairs extracted from a record
+FieldExtractor = Callable[[dict], List[Tuple[str, float]]]
+
+# How well a term matched one field: whole field, prefix of a word, anywhere, or only by n-grams
+EXACT, PREFIX, SUBSTRING, GRAMS = 3.0, 2.0, 1.0, 0.25
+
+
+def normalize_text(text) -> str:
+    """Case-fold and compose Unicode so equivalent Thai/English spellings compare equal"""
+    if text is None:
+        return ''
+    return ' '.join(unicodedata.normalize("NFC", str(text)).casefold().split())
+
+
+def text_grams(text: str) -> Set[str]:
+    """Bigrams and trigrams of every word (words shorter than two characters are kept whole)"""
+    grams: Set[str] = set()
+    for word in text.split():
+        if len(word) < 2:
+            grams.add(word)
+            continue
+        for size in (2, 3):
+            for start in range(len(word) - size + 1):
+                grams.add(word[start:start + size])
+    return grams
+
+
+def query_grams(term: str) -> Set[str]:
+    """The grams a term needs: trigrams, or the term itself when it is a single bigram"""
+    if len(term) < 3:
+        return {term}
+    return {term[start:start + 3] for start in range(len(term) - 2)}
+
+
+class NgramIndex:
+    """Inverted index from character n-grams to record positions"""
+
+    def __init__(self, records: List[dict], fields: FieldExtractor):
+        self.records = records
+        self._fields: List[List[Tuple[str, float]]] = []
+        self._postings: Dict[str, Set[int]] = {}
+        for position, record in enumerate(records):
+            texts = [(normalize_text(text), weight) for text, weight in fields(record)]
+            texts = [(text, weight) for text, weight in texts if text]
+            self._fields.append(texts)
+            for text, _ in texts:
+                for gram in text_grams(text):
+                    self._postings.setdefault(gram, set()).add(position)
+
+    def _candidates(self, terms: List[str]) -> Iterable[int]:
+        grams = set()
+        for term in terms:
+            if len(term) < 2:
+                # Single characters aren't indexed; scan instead
+                return range(len(self.records))
+            grams |= query_grams(term)
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        if not postings or not postings[0]:
+            return ()
+        return sorted(set.intersection(*postings))
+
+    def _score(self, position: int, terms: List[str]) -> float:
+        total = 0.0
+        for term in terms:
+            best = 0.0
+            for text, weight in self._fields[position]:
+                if text == term:
+                    quality = EXACT
+                elif text.startswith(term) or f' {term}' in text:
+                    quality = PREFIX
+                elif term in text:
+                    quality = SUBSTRING
+                elif len(term) >= 3:
+                    quality = GRAMS
+                else:
+                    continue
+                best = max(best, quality * weight)
+            if not best:
+                return 0.0
+            total += best
+        return total
+
+    def search(self, query: str, predicate: Optional[Callable[[dict], bool]] = None) -> List[dict]:
+        """Records matching every query term, best first (ties keep index order)"""
+        terms = normalize_text(query).split()
+        if not terms:
+            return []
+        scored = []
+        for position in self._candidates(terms):
+            score = self._score(position, terms)
+            if score and (predicate is None or predicate(self.records[position])):
+                scored.append((-score, position))
+        scored.sort()
+        return [self.records[position] for _, position in scored]
+
+    def stats(self) -> dict:
+        return {
+            "records": len(self.records),
+            "grams": len(self._postings),
+            "postings": sum(len(p) for p in self._postings.values())
+        }
+
+
+# Administrative/organisational prefixes users usually skip when typing a Thai name
+THAI_NAME_PREFIXES = ("โรงพยาบาล", "จังหวัด", "อำเภอ", "ตำบล", "เขต", "แขวง")
+
+
+def suggest_keys(record: dict) -> List[str]:
+    """Prefix keys for typeahead: both names, the code, later English words and
+    Thai names without their administrative prefix"""
+    en_name, th_name = location_names(record)
+    keys = [en_name, th_name, str(record.get('code') or '')]
+    words = en_name.split()
+    keys.extend(' '.join(words[start:]) for start in range(1, len(words)))
+    for prefix in THAI_NAME_PREFIXES:
+        if th_name.startswith(prefix) and len(th_name) > len(prefix):
+            keys.append(th_name[len(prefix):])
+    return keys
+
+
+class PrefixIndex:
+    """Sorted array of (key, record) pairs; prefix lookups are a binary search plus a short scan"""
+
+    def __init__(self, records: List[dict], keys: Callable[[dict], Iterable[str]] = suggest_keys):
+        self.records = records
+        entries = []
+        for position, record in enumerate(records):
+            for key in {normalize_text(key) for key in keys(record)}:
+                if key:
+                    entries.append((key, position))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._positions = [position for _, position in entries]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def suggest(self, prefix: str, limit: int = 10,
+                predicate: Optional[Callable[[dict], bool]] = None) -> List[dict]:
+        """Up to `limit` records with a key starting with prefix, shortest/alphabetical key first"""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        results: List[dict] = []
+        seen: Set[int] = set()
+        for index in range(bisect_left(self._keys, prefix), len(self._keys)):
+            if not self._keys[index].startswith(prefix):
+                break
+            position = self._positions[index]
+            if position in seen:
+                continue
+            seen.add(position)
+            record = self.records[position]
+            if predicate is None or predicate(record):
+                results.append(record)
+                if len(results) >= limit:
+                    break
+        return results
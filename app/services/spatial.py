@@ -0,0 +1,146 @@
+"""
+In-memory spatial index for hospital locations
+Uniform latitude/longitude grid answering k-nearest and bounding-box queries
+"""
+import heapq
+import math
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Grid cell size in degrees (0.25° is roughly 28 km in Thailand)
+SPATIAL_CELL_DEGREES = float(os.getenv("SPATIAL_CELL_DEGREES", "0.25"))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _valid(lat: float, lng: float) -> bool:
+    return -90 <= lat <= 90 and -180 <= lng <= 180 and not (lat == 0 and lng == 0)
+
+
+def record_point(record: dict) -> Optional[Tuple[float, float]]:
+    """(lat, lng) of a record from GeoJSON, the panel's [lat, lng] list, or latitude/longitude fields"""
+    location = record.get('location')
+    try:
+        if isinstance(location, dict) and isinstance(location.get('coordinates'), (list, tuple)):
+            lng, lat = (float(v) for v in location['coordinates'][:2])
+            return (lat, lng) if _valid(lat, lng) else None
+        if isinstance(location, (list, tuple)) and len(location) == 2:
+            lat, lng = float(location[0]), float(location[1])
+            if abs(lat) > 90 >= abs(lng):
+                # Stored GeoJSON-style as [lng, lat]
+                lat, lng = lng, lat
+            return (lat, lng) if _valid(lat, lng) else None
+        if record.get('latitude') is not None and record.get('longitude') is not None:
+            lat, lng = float(record['latitude']), float(record['longitude'])
+            return (lat, lng) if _valid(lat, lng) else None
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class SpatialGrid:
+    """Points bucketed into fixed-size lat/lng cells"""
+
+    def __init__(self, records: List[dict], cell_degrees: float = SPATIAL_CELL_DEGREES):
+        self.cell = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, dict]]] = {}
+        self.size = 0
+        for record in records:
+            point = record_point(record)
+            if point is None:
+                continue
+            self._cells.setdefault(self._cell_of(*point), []).append((point[0], point[1], record))
+            self.size += 1
+        if self._cells:
+            rows = [row for row, _ in self._cells]
+            columns = [column for _, column in self._cells]
+            self._bounds = (min(rows), max(rows), min(columns), max(columns))
+        else:
+            self._bounds = (0, -1, 0, -1)
+
+    def _cell_of(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell), math.floor(lng / self.cell)
+
+    def _ring(self, row: int, column: int, radius: int):
+        if radius == 0:
+            yield row, column
+            return
+        for c in range(column - radius, column + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, column - radius
+            yield r, column + radius
+
+    def nearest(self, lat: float, lng: float, k: int = 10, max_distance_km: Optional[float] = None,
+                predicate: Optional[Callable[[dict], bool]] = None) -> List[Tuple[float, dict]]:
+        """k closest (distance_km, record) pairs, nearest first"""
+        if not self._cells or k <= 0:
+            return []
+        row, column = self._cell_of(lat, lng)
+        min_row, max_row, min_column, max_column = self._bounds
+        max_radius = max(abs(row - min_row), abs(row - max_row), abs(column - min_column), abs(column - max_column))
+
+        best: List[Tuple[float, int, dict]] = []  # max-heap of the k best via negated distance
+        for radius in range(max_radius + 1):
+            for cell in self._ring(row, column, radius):
+                for point_lat, point_lng, record in self._cells.get(cell, ()):
+                    if predicate is not None and not predicate(record):
+                        continue
+                    distance = haversine_km(lat, lng, point_lat, point_lng)
+                    if max_distance_km is not None and distance > max_distance_km:
+                        continue
+                    entry = (-distance, id(record), record)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, entry)
+
+            # Nothing outside the searched square can be closer than its nearest edge
+            south = (row - radius) * self.cell
+            north = (row + radius + 1) * self.cell
+            west = (column - radius) * self.cell
+            east = (column + radius + 1) * self.cell
+            widest_lat = min(89.9, max(abs(south), abs(north)))
+            edge_km = min(
+                (lat - south) * KM_PER_DEGREE,
+                (north - lat) * KM_PER_DEGREE,
+                min(lng - west, east - lng) * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+            )
+            if max_distance_km is not None and edge_km > max_distance_km:
+                break
+            if len(best) == k and -best[0][0] <= edge_km:
+                break
+
+        return [(-negated, record) for negated, _, record in sorted(best, reverse=True)]
+
+    def within(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+               predicate: Optional[Callable[[dict], bool]] = None, limit: Optional[int] = None) -> List[dict]:
+        """Records inside the bounding box"""
+        first_row, first_column = self._cell_of(min_lat, min_lng)
+        last_row, last_column = self._cell_of(max_lat, max_lng)
+        min_row, max_row, min_column, max_column = self._bounds
+        results = []
+        for row in range(max(first_row, min_row), min(last_row, max_row) + 1):
+            for column in range(max(first_column, min_column), min(last_column, max_column) + 1):
+                for point_lat, point_lng, record in self._cells.get((row, column), ()):
+                    if not (min_lat <= point_lat <= max_lat and min_lng <= point_lng <= max_lng):
+                        continue
+                    if predicate is not None and not predicate(record):
+                        continue
+                    results.append(record)
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
+
+    def stats(self) -> dict:
+        return {"points": self.size, "cells": len(self._cells), "cell_degrees": self.cell}
@@ -1,18 +1,159 @@
 """
 Stardust API service for data operations
 """
+import asyncio
+import hashlib
 import httpx
+import logging
 import os
-from typing import List, Optional
+import time
+from contextlib import AsyncExitStack, aclosing
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException
 
+from app.services.codec import loads
+from app.services.envelopes import EnvelopeDecoder, Listing, RECORD_KEYS
+from app.services.geography import GeographyCache, GEOGRAPHY_TYPES
+from app.services.hospitals import HospitalSnapshot, hospital_filter
+from app.services.http_client import upstream
+from app.services.metrics import upstream_request_duration, upstream_requests_in_flight
+from app.services.pagination import (
+    KeysetIndex, MasterDataSnapshot, Page, code_order_key, record_filter
+)
+from app.services.search import PrefixIndex
+from app.services.streaming import ArrayStreamDecoder
+from app.services.resilience import (
+    BreakerRegistry, RetryBudget, backoff_delay, endpoint_template, is_retryable,
+    BREAKER_FAILURE_STATUS, STARDUST_RETRY_ATTEMPTS, STARDUST_RETRY_DEADLINE
+)
+from app.services.tracing import busy_span, span, trace_methods
+
+logger = logging.getLogger(__name__)
+
+# Largest page the Stardust master-data endpoints accept, and how many pages to fetch at once
+MASTER_DATA_PAGE_SIZE = 1000
+MASTER_DATA_FETCH_CONCURRENCY = int(os.getenv("MASTER_DATA_FETCH_CONCURRENCY", "4"))
+# Share one upstream call between concurrent identical GETs
+SINGLE_FLIGHT_ENABLED = os.getenv("STARDUST_SINGLE_FLIGHT", "true").lower() == "true"
+# Panel data type -> Stardust master-data collection (some use underscores)
+MASTER_DATA_COLLECTIONS = {"provinces": "provinces", "districts": "districts", "sub-districts": "sub_districts",
+                           "hospital-types": "hospital_types", "hospitals": "hospitals"}
+
+@trace_methods("stardust")
 class StardustAPIService:
     def __init__(self):
         self.base_url = os.getenv("STARDUST_API_BASE_URL", "https://stardust.my-firstcare.com")
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # Shared, lifecycle-managed connection pool (see app.services.http_client)
+        self.client = upstream
+        self.reset_snapshots()
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
+        self.single_flight = {"leaders": 0, "coalesced": 0}
+        self.breakers = BreakerRegistry()
+        self.retry_budget = RetryBudget()
+        self.envelopes = EnvelopeDecoder()
+
+    def reset_snapshots(self):
+        """Start over with empty in-memory snapshots and indexes (e.g. for a different upstream)"""
+        self.geography = GeographyCache(self)
+        self.hospitals = HospitalSnapshot(self)
+        self._master_data_snapshots: Dict[str, MasterDataSnapshot] = {}
+        self._geography_keysets: tuple = (None, {})
+        self._prefix_indexes: Dict[str, tuple] = {}
+
+    @staticmethod
+    def _flight_key(method: str, endpoint: str, token: str, params: Optional[dict]) -> tuple:
+        """Identity of a request: method, URL, params and authorization scope"""
+        scope = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        query = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return method, endpoint, query, scope
+
+    def single_flight_stats(self) -> dict:
+        """How many GETs were sent upstream vs. served by joining an in-flight call"""
+        total = self.single_flight["leaders"] + self.single_flight["coalesced"]
+        return {
+            **self.single_flight,
+            "in_flight": len(self._in_flight),
+            "coalesced_ratio": round(self.single_flight["coalesced"] / total, 4) if total else 0.0
+        }
 
     async def _make_request(self, method: str, endpoint: str, token: str, data: Optional[dict] = None, params: Optional[dict] = None):
-        """Make authenticated request to Stardust API"""
+        """Make authenticated request to Stardust API, coalescing identical in-flight GETs
+        
+        Coalesced callers receive the same result object, so responses must be
+        treated as read-only.
+        """
+        if method != "GET" or not SINGLE_FLIGHT_ENABLED:
+            return await self._send_request(method, endpoint, token, data, params)
+        
+        key = self._flight_key(method, endpoint, token, params)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send_request(method, endpoint, token, data, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish_flight(k, t))
+            self.single_flight["leaders"] += 1
+        else:
+            self.single_flight["coalesced"] += 1
+        
+        # Shield so one cancelled caller (e.g. client disconnect) doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    def resilience_stats(self) -> dict:
+        """Retry budget usage and per-endpoint circuit breaker state"""
+        return {
+            "retry_budget": self.retry_budget.stats(),
+            "open_breakers": self.breakers.open_count(),
+            "breakers": self.breakers.stats()
+        }
+
+    def _finish_flight(self, key: tuple, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter was cancelled
+
+    async def _send_request(self, method: str, endpoint: str, token: str, data: Optional[dict] = None, params: Optional[dict] = None):
+        """Send a request through the endpoint's circuit breaker, retrying transient GET failures
+
+        Timeouts while waiting for the response are not retried: the request may have been
+        processed, and a second wait would double the time the caller is held.
+        """
+        breaker = self.breakers.get(endpoint)
+        self.retry_budget.deposit()
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            probe = breaker.before_call()
+            try:
+                result = await self._send_once(method, endpoint, token, data, params)
+            except HTTPException as e:
+                if e.status_code in BREAKER_FAILURE_STATUS:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                delay = backoff_delay(attempt)
+                if (not is_retryable(method, e.status_code) or attempt >= STARDUST_RETRY_ATTEMPTS
+                        or isinstance(e.__cause__, (httpx.ReadTimeout, httpx.WriteTimeout))
+                        or time.monotonic() - started + delay > STARDUST_RETRY_DEADLINE
+                        or not self.retry_budget.withdraw()):
+                    raise
+            except Exception:
+                # e.g. an HTML page with a 200 that does not decode
+                breaker.record_failure()
+                raise
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                if probe:
+                    breaker.release_probe()  # cancelled before a result was recorded
+            
+            attempt += 1
+            logger.info("Retrying %s %s in %.2fs (attempt %d)", method, endpoint, delay, attempt + 1)
+            await asyncio.sleep(delay)
+
+    async def _send_once(self, method: str, endpoint: str, token: str, data: Optional[dict] = None, params: Optional[dict] = None):
+        """Send an authenticated request to Stardust API"""
         headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
@@ -20,37 +161,191 @@ class StardustAPIService:
         
         url = f"{self.base_url}{endpoint}"
         
-        print(f"DEBUG: Making Stardust API request to {url}")
-        print(f"DEBUG: Token: {token[:20]}...")
-        print(f"DEBUG: Method: {method}, Params: {params}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Stardust request %s %s", method, url, extra={"params": params, "sample": True})
         
+        template = endpoint_template(endpoint)
+        upstream_requests_in_flight.inc()
+        start = time.perf_counter()
         try:
-            response = await self.client.request(
-                method=method,
-                url=url,
-                headers=headers,
-                json=data,
-                params=params
-            )
-            
-            print(f"DEBUG: Response status: {response.status_code}")
-            
-            if response.status_code == 401:
-                print(f"DEBUG: 401 Error response: {response.text}")
-                raise HTTPException(status_code=401, detail="Authentication failed")
-            elif response.status_code == 403:
-                print(f"DEBUG: 403 Error response: {response.text}")
-                raise HTTPException(status_code=403, detail="Access forbidden")
-            elif response.status_code >= 400:
-                print(f"DEBUG: Error response: {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=f"API error: {response.text}")
-            
-            result = response.json()
-            print(f"DEBUG: Response keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
-            return result
-            
+            with span(f"{method} {template}"):
+                response = await self.client.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    json=data,
+                    params=params
+                )
         except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Stardust API service unavailable: {str(e)}")
+            upstream_request_duration.observe(time.perf_counter() - start, method, template, "error")
+            if isinstance(e, (httpx.ReadTimeout, httpx.WriteTimeout)):
+                raise HTTPException(status_code=504, detail=f"Stardust API timed out: {str(e)}") from e
+            raise HTTPException(status_code=503, detail=f"Stardust API service unavailable: {str(e)}") from e
+        finally:
+            upstream_requests_in_flight.dec()
+        upstream_request_duration.observe(time.perf_counter() - start, method, template, response.status_code)
+        
+        self._raise_for_status(method, endpoint, response)
+        
+        with span(f"decode {template}"):
+            result = loads(response.content)
+        if debug:
+            logger.debug("Stardust response %s %s: %d", method, endpoint, response.status_code,
+                         extra={"keys": list(result) if isinstance(result, dict) else None, "sample": True})
+        return result
+
+    @staticmethod
+    def _raise_for_status(method: str, endpoint: str, response: httpx.Response):
+        if response.status_code >= 400:
+            logger.warning("Stardust %s %s returned %d: %.500s", method, endpoint, response.status_code, response.text)
+        if response.status_code == 401:
+            raise HTTPException(status_code=401, detail="Authentication failed")
+        elif response.status_code == 403:
+            raise HTTPException(status_code=403, detail="Access forbidden")
+        elif response.status_code >= 400:
+            raise HTTPException(status_code=response.status_code, detail=f"API error: {response.text}")
+
+    async def _stream_listing(self, endpoint: str, token: str, params: Optional[dict] = None,
+                              envelope: Optional[dict] = None) -> AsyncIterator[dict]:
+        """Records of a list response, decoded one at a time as the body arrives
+
+        Not coalesced or retried (records may already have been handed on). When the
+        body is done, `envelope` is filled with the fields around the records (e.g. total).
+        """
+        template = endpoint_template(endpoint)
+        breaker = self.breakers.get(endpoint)
+        probe = breaker.before_call()
+        headers = {"Authorization": f"Bearer {token}"}
+        decoder = ArrayStreamDecoder(self.envelopes.list_path(template))
+        try:
+            upstream_requests_in_flight.inc()
+            start = time.perf_counter()
+            status = "error"
+            # Only the fetch and decode steps are timed, never the consumer's work between yields
+            timer = busy_span(f"stream GET {template}")
+            try:
+                async with AsyncExitStack() as stack:
+                    with timer:
+                        response = await stack.enter_async_context(self.client.stream(
+                            "GET", f"{self.base_url}{endpoint}", headers=headers, params=params))
+                        status = response.status_code
+                        if status >= 400:
+                            await response.aread()
+                            self._raise_for_status("GET", endpoint, response)
+                    chunks = response.aiter_bytes()
+                    while True:
+                        with timer:
+                            chunk = await anext(chunks, None)
+                            records = list(decoder.feed(chunk)) if chunk is not None else None
+                        if records is None:
+                            break
+                        for record in records:
+                            yield record
+                with timer:
+                    listing = self.envelopes.listing(template, loads(decoder.envelope()))
+            except httpx.RequestError as e:
+                breaker.record_failure()
+                raise HTTPException(status_code=503, detail=f"Stardust API service unavailable: {str(e)}") from e
+            except HTTPException as e:
+                if e.status_code in BREAKER_FAILURE_STATUS:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+            finally:
+                upstream_requests_in_flight.dec()
+                upstream_request_duration.observe(time.perf_counter() - start, "GET", template, status)
+        finally:
+            if probe:
+                breaker.release_probe()  # the consumer stopped early or the task was cancelled
+
+        breaker.record_success()
+        if not decoder.found:
+            # Unexpected shape: the whole body was kept, and decoding it learns the shape
+            for record in listing.items:
+                yield record
+        if envelope is not None:
+            envelope.update({"total": listing.total, **listing.meta})
+
+    async def stream_master_data(self, token: str, data_type: str, skip: int = 0, limit: int = 100,
+                                 envelope: Optional[dict] = None, **filters) -> AsyncIterator[dict]:
+        """Master data records of one page, streamed (see _stream_listing)"""
+        endpoint, params = self._master_data_query(data_type, skip, limit, **filters)
+        async with aclosing(self._stream_listing(endpoint, token, params, envelope)) as records:
+            async for record in records:
+                yield record
+
+    async def iter_all_master_data(self, token: str, data_type: str, page_size: int = MASTER_DATA_PAGE_SIZE,
+                                   date_from: Optional[str] = None) -> AsyncIterator[dict]:
+        """Every record of a master data type as a stream: the streaming counterpart of
+        fetch_all_master_data, holding about one page of records in flight at a time"""
+        envelope: dict = {}
+        count = 0
+        async with aclosing(self.stream_master_data(token, data_type, 0, page_size, envelope,
+                                                    date_from=date_from)) as records:
+            async for record in records:
+                count += 1
+                yield record
+        if count < page_size:
+            return
+
+        total = envelope.get("total")
+        if total is None:
+            # Unknown total: stream the pages sequentially until a short page
+            skip = page_size
+            while count == page_size:
+                count = 0
+                async with aclosing(self.stream_master_data(token, data_type, skip, page_size,
+                                                            date_from=date_from)) as records:
+                    async for record in records:
+                        count += 1
+                        yield record
+                skip += page_size
+            return
+
+        # Remaining pages stream concurrently into a bounded queue
+        queue: asyncio.Queue = asyncio.Queue(maxsize=page_size)
+        semaphore = asyncio.Semaphore(MASTER_DATA_FETCH_CONCURRENCY)
+        done = object()
+
+        async def pump(skip: int):
+            async with semaphore:
+                async with aclosing(self.stream_master_data(token, data_type, skip, page_size,
+                                                            date_from=date_from)) as records:
+                    async for record in records:
+                        await queue.put(record)
+
+        pumps = [asyncio.ensure_future(pump(skip)) for skip in range(page_size, int(total), page_size)]
+
+        async def pump_all():
+            try:
+                await asyncio.gather(*pumps)
+            except Exception as e:
+                # One failed page stops the others instead of leaving them blocked on the queue
+                for task in pumps:
+                    task.cancel()
+                await queue.put(e)
+            else:
+                await queue.put(done)
+
+        producer = asyncio.ensure_future(pump_all())
+        try:
+            while True:
+                record = await queue.get()
+                if record is done:
+                    break
+                if isinstance(record, Exception):
+                    raise record
+                yield record
+        finally:
+            # Also stops the pages still streaming when the consumer leaves early
+            for task in (producer, *pumps):
+                task.cancel()
+            await asyncio.gather(producer, *pumps, return_exceptions=True)
 
     # Patient operations
     async def get_patients(self, token: str, skip: int = 0, limit: int = 100):
@@ -167,6 +462,19 @@ class StardustAPIService:
             
         return await self._make_request("GET", "/admin/hospitals-raw-documents", token, params=params)
 
+    async def get_hospital_raw_document(self, token: str, hospital_id: str) -> dict:
+        """Raw MongoDB document of one hospital with its field analysis and metadata; {} if none"""
+        listing = await self._get_listing("/admin/hospitals-raw-documents", token, {
+            "skip": 0, "limit": 1, "include_deleted": True, "hospital_id": hospital_id
+        })
+        if not listing.items:
+            return {}
+        return {
+            "raw_document": listing.items[0],
+            "field_analysis": listing.meta.get("field_analysis", {}),
+            "metadata": listing.meta.get("metadata", {})
+        }
+
     # Analytics operations
     async def get_patient_count(self, token: str):
         """Get total patient count"""
@@ -196,23 +504,13 @@ class StardustAPIService:
         return await self._make_request("GET", "/audit-logs", token, params={"skip": skip, "limit": limit})
 
     # Master Data operations
-    async def get_master_data(self, token: str, data_type: str, skip: int = 0, limit: int = 100, 
-                             search: Optional[str] = None, province_code: Optional[int] = None, 
-                             district_code: Optional[int] = None, sub_district_code: Optional[int] = None,
-                             is_active: Optional[bool] = None, date_from: Optional[str] = None, 
-                             date_to: Optional[str] = None):
-        """Get master data by type"""
-        # Map data types to actual Stardust endpoints (using working endpoints found)
-        endpoint_mapping = {
-            "provinces": "/admin/master-data/provinces",
-            "districts": "/admin/master-data/districts", 
-            "sub-districts": "/admin/master-data/sub_districts",  # Uses underscore
-            "hospital-types": "/admin/master-data/hospital_types",  # Uses underscore
-            "hospitals": "/admin/master-data/hospitals"
-        }
-        
-        endpoint = endpoint_mapping.get(data_type, f"/admin/master-data/{data_type}")
-        
+    @staticmethod
+    def _master_data_query(data_type: str, skip: int, limit: int, search: Optional[str] = None,
+                           province_code: Optional[int] = None, district_code: Optional[int] = None,
+                           sub_district_code: Optional[int] = None, is_active: Optional[bool] = None,
+                           date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[str, dict]:
+        """Stardust endpoint and query params for a master data list"""
+        endpoint = f"/admin/master-data/{MASTER_DATA_COLLECTIONS.get(data_type, data_type)}"
         params: dict = {
             "skip": skip, 
             "limit": limit,
@@ -229,25 +527,157 @@ class StardustAPIService:
             params["sub_district_code"] = sub_district_code
         if is_active is not None:
             params["is_active"] = is_active
-            print(f"DEBUG: Adding is_active parameter: {is_active} (type: {type(is_active)})")
         if date_from:
             params["date_from"] = date_from
         if date_to:
             params["date_to"] = date_to
+        return endpoint, params
+
+    async def get_master_data(self, token: str, data_type: str, skip: int = 0, limit: int = 100, 
+                             search: Optional[str] = None, province_code: Optional[int] = None, 
+                             district_code: Optional[int] = None, sub_district_code: Optional[int] = None,
+                             is_active: Optional[bool] = None, date_from: Optional[str] = None, 
+                             date_to: Optional[str] = None):
+        """Get master data by type (raw Stardust response)"""
+        endpoint, params = self._master_data_query(data_type, skip, limit, search, province_code, district_code,
+                                                   sub_district_code, is_active, date_from, date_to)
         return await self._make_request("GET", endpoint, token, params=params)
 
+    async def list_master_data(self, token: str, data_type: str, skip: int = 0, limit: int = 100,
+                               **filters) -> Listing:
+        """Master data records and total, decoded from the response envelope"""
+        endpoint, params = self._master_data_query(data_type, skip, limit, **filters)
+        return await self._get_listing(endpoint, token, params)
+
+    async def _get_listing(self, endpoint: str, token: str, params: Optional[dict] = None) -> Listing:
+        response = await self._make_request("GET", endpoint, token, params=params)
+        return self.envelopes.listing(endpoint_template(endpoint), response)
+
+    async def fetch_all_master_data(self, token: str, data_type: str, page_size: int = MASTER_DATA_PAGE_SIZE,
+                                    date_from: Optional[str] = None) -> List[dict]:
+        """Fetch every record of a master data type (changed since date_from, if given),
+        paging with bounded concurrency"""
+        first_page = await self.list_master_data(token, data_type, 0, page_size, date_from=date_from)
+        records = list(first_page.items)
+        if len(first_page.items) < page_size:
+            return records
+
+        if first_page.total is None:
+            # Unknown total: walk the pages sequentially until a short page
+            skip = page_size
+            while True:
+                page = (await self.list_master_data(token, data_type, skip, page_size, date_from=date_from)).items
+                records.extend(page)
+                if len(page) < page_size:
+                    return records
+                skip += page_size
+
+        semaphore = asyncio.Semaphore(MASTER_DATA_FETCH_CONCURRENCY)
+
+        async def fetch_page(skip: int):
+            async with semaphore:
+                return (await self.list_master_data(token, data_type, skip, page_size, date_from=date_from)).items
+
+        pages = await asyncio.gather(*(fetch_page(skip) for skip in range(page_size, int(first_page.total), page_size)))
+        for page in pages:
+            records.extend(page)
+        return records
+
+    async def suggest_master_data(self, token: str, data_type: str, query: str, limit: int = 10,
+                                  province_code: Optional[int] = None,
+                                  district_code: Optional[int] = None) -> List[dict]:
+        """Typeahead matches for a master data type from an in-memory prefix index"""
+        keyset = await self.master_data_keyset(token, data_type)
+        records = keyset.records
+        cached = self._prefix_indexes.get(data_type)
+        if cached is None or cached[0] is not records:
+            # Rebuilt only when the underlying snapshot changes
+            cached = self._prefix_indexes[data_type] = (records, PrefixIndex(records))
+        location = record_filter(province_code=province_code, district_code=district_code)
+
+        def selectable(record: dict) -> bool:
+            if record.get('is_deleted') or record.get('is_active') is False:
+                return False
+            return location is None or location(record)
+
+        return cached[1].suggest(query, limit, selectable)
+
+    async def nearest_hospitals(self, token: str, lat: float, lng: float, k: int = 10,
+                                max_distance_km: Optional[float] = None, is_active: Optional[bool] = None,
+                                hospital_type_code=None) -> List[Tuple[float, dict]]:
+        """k nearest hospitals to a point as (distance_km, record), from the in-memory grid"""
+        hospitals = await self.hospitals.get(token)
+        return hospitals.spatial_index.nearest(lat, lng, k, max_distance_km,
+                                               hospital_filter(is_active, hospital_type_code))
+
+    async def hospitals_within(self, token: str, min_lat: float, min_lng: float, max_lat: float,
+                               max_lng: float, limit: Optional[int] = None, is_active: Optional[bool] = None,
+                               hospital_type_code=None) -> List[dict]:
+        """Hospitals inside a bounding box, from the in-memory grid"""
+        hospitals = await self.hospitals.get(token)
+        return hospitals.spatial_index.within(min_lat, min_lng, max_lat, max_lng,
+                                              hospital_filter(is_active, hospital_type_code), limit)
+
+    def _invalidate_snapshots(self, data_type: str):
+        """Refresh in-memory snapshots after a write to their data type"""
+        data_type = data_type.replace("_", "-")  # Stardust collection names use underscores
+        if data_type in GEOGRAPHY_TYPES:
+            self.geography.invalidate()
+        elif data_type == "hospitals":
+            self.hospitals.invalidate()
+        elif data_type in self._master_data_snapshots:
+            self._master_data_snapshots[data_type].invalidate()
+
+    async def master_data_keyset(self, token: str, data_type: str, province_code=None,
+                                 district_code=None, sub_district_code=None) -> KeysetIndex:
+        """In-memory keyset for a master data type: hospitals and other types newest first
+        by (updated_at, id), geography by code"""
+        if data_type == "hospitals":
+            hospitals = await self.hospitals.get(token)
+            return hospitals.keyset_for(province_code, district_code, sub_district_code)
+        if data_type in GEOGRAPHY_TYPES:
+            geography = await self.geography.get(token)
+            if self._geography_keysets[0] is not geography:
+                self._geography_keysets = (geography, {
+                    "provinces": KeysetIndex(geography.provinces, code_order_key),
+                    "districts": KeysetIndex(geography.districts, code_order_key),
+                    "sub-districts": KeysetIndex(geography.sub_districts, code_order_key)
+                })
+            return self._geography_keysets[1][data_type]
+        snapshot = self._master_data_snapshots.get(data_type)
+        if snapshot is None:
+            snapshot = self._master_data_snapshots[data_type] = MasterDataSnapshot(self, data_type)
+        return await snapshot.get(token)
+
+    async def get_master_data_page(self, token: str, data_type: str, cursor: Optional[str] = None,
+                                   skip: int = 0, limit: int = 25, search: Optional[str] = None,
+                                   province_code: Optional[int] = None, district_code: Optional[int] = None,
+                                   sub_district_code: Optional[int] = None, is_active: Optional[bool] = None,
+                                   date_from: Optional[str] = None, date_to: Optional[str] = None) -> Page:
+        """One page of master data from memory: the records after `cursor`, or after `skip` without one"""
+        if data_type == "hospitals" and search and search.strip():
+            # Ranked bilingual full-text search over the hospital snapshot
+            hospitals = await self.hospitals.get(token)
+            predicate = record_filter(None, province_code, district_code, sub_district_code,
+                                      is_active, date_from, date_to)
+            return hospitals.search(search, predicate, cursor or None, skip, limit)
+        keyset = await self.master_data_keyset(token, data_type, province_code, district_code, sub_district_code)
+        predicate = record_filter(search, province_code, district_code, sub_district_code,
+                                  is_active, date_from, date_to)
+        return keyset.page(cursor or None, limit, predicate, skip=0 if cursor else skip)
+
     async def get_master_data_record(self, token: str, data_type: str, record_id: str):
-        """Get specific master data record"""
-        endpoint_mapping = {
-            "provinces": f"/admin/master-data/provinces/{record_id}",
-            "districts": f"/admin/master-data/districts/{record_id}", 
-            "sub-districts": f"/admin/master-data/sub_districts/{record_id}",  # Uses underscore
-            "hospital-types": f"/admin/master-data/hospital_types/{record_id}",  # Uses underscore
-            "hospitals": f"/admin/master-data/hospitals/{record_id}"
-        }
-        endpoint = endpoint_mapping.get(data_type, f"/admin/master-data/{data_type}/{record_id}")
+        """Get specific master data record (raw Stardust response)"""
+        endpoint = f"/admin/master-data/{MASTER_DATA_COLLECTIONS.get(data_type, data_type)}/{record_id}"
         return await self._make_request("GET", endpoint, token)
 
+    async def get_master_data_item(self, token: str, data_type: str, record_id: str) -> Optional[dict]:
+        """One master data record, decoded from its envelope; None if Stardust reports no success"""
+        collection = MASTER_DATA_COLLECTIONS.get(data_type, data_type)
+        endpoint = f"/admin/master-data/{collection}/{record_id}"
+        response = await self._make_request("GET", endpoint, token)
+        return self.envelopes.record(endpoint_template(endpoint), response, RECORD_KEYS.get(collection))
+
     async def create_master_data(self, token: str, data: dict):
         """Create new master data record"""
         data_type = data.get("data_type", "")
@@ -259,7 +689,9 @@ class StardustAPIService:
             "hospitals": "/admin/master-data/hospitals"
         }
         endpoint = endpoint_mapping.get(data_type, "/admin/master-data")
-        return await self._make_request("POST", endpoint, token, data=data)
+        result = await self._make_request("POST", endpoint, token, data=data)
+        self._invalidate_snapshots(data_type)
+        return result
 
     async def update_master_data(self, token: str, data_type: str, record_id: str, data: dict):
         """Update master data record"""
@@ -271,7 +703,9 @@ class StardustAPIService:
             "hospitals": f"/admin/master-data/hospitals/{record_id}"
         }
         endpoint = endpoint_mapping.get(data_type, f"/admin/master-data/{data_type}/{record_id}")
-        return await self._make_request("PUT", endpoint, token, data=data)
+        result = await self._make_request("PUT", endpoint, token, data=data)
+        self._invalidate_snapshots(data_type)
+        return result
 
     async def delete_master_data(self, token: str, data_type: str, record_id: str):
         """Soft delete master data record"""
@@ -283,7 +717,9 @@ class StardustAPIService:
             "hospitals": f"/admin/master-data/hospitals/{record_id}"
         }
         endpoint = endpoint_mapping.get(data_type, f"/admin/master-data/{data_type}/{record_id}")
-        return await self._make_request("DELETE", endpoint, token)
+        result = await self._make_request("DELETE", endpoint, token)
+        self._invalidate_snapshots(data_type)
+        return result
 
     # Province operations
     async def get_provinces(self, token: str, skip: int = 0, limit: int = 100, search: Optional[str] = None):
@@ -321,33 +757,24 @@ class StardustAPIService:
         return await self.get_master_data_record(token, "districts", district_id)
 
     async def find_district_by_code(self, token: str, district_code: str):
-        """Find a district by its code across all provinces"""
+        """Find a district by its code across all provinces (indexed lookup)"""
         try:
-            # First get all provinces
-            provinces_response = await self.get_provinces(token, 0, 1000)
-            provinces = provinces_response.get("data", [])
-            
-            # Search through each province's districts
-            for province in provinces:
-                province_code = province.get("code")
-                if province_code:
-                    try:
-                        districts_response = await self.get_districts(token, 0, 1000, None, province_code)
-                        districts = districts_response.get("data", [])
-                        
-                        # Look for the district with the matching code
-                        for district in districts:
-                            if str(district.get("code")) == str(district_code):
-                                return district
-                    except Exception as e:
-                        print(f"Error fetching districts for province {province_code}: {e}")
-                        continue
-            
-            return None
+            geography = await self.geography.get(token)
+            return geography.get_district(district_code)
         except Exception as e:
-            print(f"Error finding district by code {district_code}: {e}")
+            logger.error("Error finding district by code %s: %s", district_code, e)
             return None
 
+    async def resolve_location_chain(self, token: str, sub_district_code=None, district_code=None,
+                                     province_code=None) -> dict:
+        """Resolve sub-district -> district -> province from the geography index"""
+        try:
+            geography = await self.geography.get(token)
+            return geography.resolve_chain(sub_district_code, district_code, province_code)
+        except Exception as e:
+            logger.error("Error resolving location chain: %s", e)
+            return {}
+
     async def create_district(self, token: str, district_data: dict):
         """Create new district"""
         district_data["data_type"] = "districts"
@@ -394,6 +821,10 @@ class StardustAPIService:
         """Get list of hospital types"""
         return await self.get_master_data(token, "hospital-types", skip, limit, search)
 
+    async def list_hospital_types(self, token: str, limit: int = 1000) -> List[dict]:
+        """Hospital type records for dropdowns and lookups"""
+        return (await self.list_master_data(token, "hospital-types", 0, limit)).items
+
     async def get_hospital_type(self, token: str, hospital_type_id: str):
         """Get hospital type by ID"""
         return await self.get_master_data_record(token, "hospital-types", hospital_type_id)
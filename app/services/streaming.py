@@ -0,0 +1,138 @@
+"""
+Incremental parsing of large Stardust list responses
+Decodes the records array of a JSON body as bytes arrive, so bulk loads
+hand over one record at a time instead of holding the raw body and the whole parsed tree
+"""
+import codecs
+import json
+import re
+from typing import Any, Iterator, List
+
+from app.services.codec import loads
+from app.services.envelopes import Path
+
+_TOKEN = re.compile(r'["{}\[\],]')
+# Rest of a string after its opening quote, through the closing quote
+_STRING_END = re.compile(r'(?:[^"\\]|\\.)*"', re.S)
+_NON_WHITESPACE = re.compile(r'[^ \t\r\n]')
+_SEPARATORS = re.compile(r'[ \t\r\n,]*')
+# What can follow a complete number or literal inside an array
+_SCALAR_END = frozenset(', \t\r\n]')
+_decoder = json.JSONDecoder()
+
+
+class ArrayStreamDecoder:
+    """Feeds JSON bytes in; yields each decoded element of the array at `path`
+
+    Only the envelope around the array is scanned token by token; elements are decoded
+    in bulk per chunk, falling back to the stdlib scanner one element at a time.
+    Everything outside the array is kept (with the array emptied) as the envelope,
+    e.g. to read "total" once the body is done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = tuple(path)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        # One entry per open container: [is_object, current key, expecting a key]
+        self._stack: List[list] = []
+        self._in_array = False
+        self._skeleton: List[str] = []
+        self._skeleton_from = 0
+        self.found = False
+        self.items = 0
+
+    def _at_path(self) -> bool:
+        if len(self._stack) != len(self.path):
+            return False
+        return all(frame[0] and frame[1] == key for frame, key in zip(self._stack, self.path))
+
+    def _elements(self, buffer: str, i: int):
+        """Decode complete elements from i; returns where to resume"""
+        # Fast path: the elements up to the last object boundary in one decode with the
+        # active codec. It only parses as an array if that "}," really ends an element
+        i = _SEPARATORS.match(buffer, i).end()
+        boundary = buffer.rfind("},", i)
+        if boundary > i:
+            try:
+                items = loads("[" + buffer[i:boundary + 1] + "]")
+            except ValueError:
+                items = None  # "}," inside a string: go element by element
+            if items is not None:
+                self.items += len(items)
+                yield from items
+                i = boundary + 2
+        while True:
+            match = _NON_WHITESPACE.search(buffer, i)
+            if match is None:
+                return len(buffer)
+            j = match.start()
+            char = buffer[j]
+            if char == ",":
+                i = j + 1
+                continue
+            if char == "]":
+                self._in_array = False
+                self._skeleton_from = j
+                return j
+            try:
+                item, end = _decoder.raw_decode(buffer, j)
+            except ValueError:
+                return j  # element continues in the next chunk
+            if char not in '{["' and (end == len(buffer) or buffer[end] not in _SCALAR_END):
+                return j  # a number may continue in the next chunk ("-2." + "5")
+            self.items += 1
+            yield item
+            i = end
+
+    def feed(self, chunk: bytes) -> Iterator[Any]:
+        """Elements completed by this chunk; consume fully before the next feed"""
+        text = self._utf8.decode(chunk)
+        buffer = self._buffer = self._buffer + text if self._buffer else text
+        i = self._pos
+        while True:
+            if self._in_array:
+                i = yield from self._elements(buffer, i)
+                if self._in_array:
+                    break
+            match = _TOKEN.search(buffer, i)
+            if match is None:
+                i = len(buffer)
+                break
+            j = match.start()
+            char = buffer[j]
+            frame = self._stack[-1] if self._stack else None
+            if char == '"':
+                end = _STRING_END.match(buffer, j + 1)
+                if end is None:
+                    i = j  # string continues in the next chunk
+                    break
+                if frame is not None and frame[0] and frame[2]:
+                    key = buffer[j + 1:end.end() - 1]
+                    frame[1] = json.loads(buffer[j:end.end()]) if "\\" in key else key
+                    frame[2] = False
+                i = end.end()
+                continue
+            i = j + 1
+            if char == "{" or char == "[":
+                if char == "[" and not self.found and self._at_path():
+                    self.found = self._in_array = True
+                    self._skeleton.append(buffer[self._skeleton_from:i])
+                self._stack.append([char == "{", None, char == "{"])
+            elif char == "}" or char == "]":
+                self._stack.pop()
+            elif frame is not None and frame[0]:
+                frame[2] = True
+
+        # Drop what has been consumed, keeping a partial element or token
+        if not self._in_array:
+            self._skeleton.append(buffer[self._skeleton_from:i])
+            self._skeleton_from = i
+        self._buffer = buffer[i:]
+        self._pos = 0
+        self._skeleton_from -= i
+
+    def envelope(self) -> str:
+        """The body without the array's elements (the whole body if the path was never found)"""
+        return "".join(self._skeleton) + self._buffer[max(self._skeleton_from, 0):] + self._utf8.decode(b"", final=True)
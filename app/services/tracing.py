@@ -0,0 +1,221 @@
+"""
+Per-request span tracing for Opera Panel
+Records a tree of timed spans (auth, Stardust calls, template rendering) for each HTTP
+request and reports it to admins in a Server-Timing header, plus an optional JSON footer
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import time
+from typing import List, Optional
+
+from fastapi.templating import Jinja2Templates
+from starlette.datastructures import QueryParams
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+# The header names upstream endpoints, so it only goes to admin sessions unless debug
+# timing is switched on for every client (development, benchmarks)
+SERVER_TIMING_DEBUG = os.getenv("SERVER_TIMING_DEBUG", "false").lower() == "true"
+# Entries beyond this are summarised so the header stays small
+SERVER_TIMING_MAX_ENTRIES = int(os.getenv("SERVER_TIMING_MAX_ENTRIES", "40"))
+# Query parameter that asks for the JSON span tree footer on HTML pages (admins only)
+SERVER_TIMING_FOOTER_PARAM = "debug_timing"
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        entry = {"name": self.name, "ms": round(self.duration_ms, 2)}
+        if self.children:
+            entry["children"] = [child.to_dict() for child in self.children]
+        return entry
+
+    def walk(self, depth: int = 0):
+        """(depth, span) pairs in start order, this span first"""
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+
+class span:
+    """Time a block as a child of the current span; a no-op outside a traced request"""
+    __slots__ = ("name", "_span", "_token")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._span = None
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is not None:
+            self._span = Span(self.name)
+            parent.children.append(self._span)
+            self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, *exc):
+        if self._span is not None:
+            self._span.end = time.perf_counter()
+            _current.reset(self._token)
+        return False
+
+
+class busy_span:
+    """One child span of the current span counting only the time spent inside `with` blocks
+
+    For generators: wrap each step between yields, so the consumer's time is left out and
+    the spans it opens are not nested under the generator's.
+    """
+    __slots__ = ("_span", "_entered")
+
+    def __init__(self, name: str):
+        parent = _current.get()
+        self._span = None
+        if parent is not None:
+            self._span = Span(name)
+            self._span.end = self._span.start
+            parent.children.append(self._span)
+
+    def __enter__(self):
+        self._entered = time.perf_counter()
+        return self._span
+
+    def __exit__(self, *exc):
+        if self._span is not None:
+            self._span.end += time.perf_counter() - self._entered
+        return False
+
+
+def traced(name: str):
+    """Decorator running an async function inside span(name)"""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_methods(prefix: str):
+    """Class decorator tracing every public async method as "<prefix>.<method>" """
+    def decorate(cls):
+        for attr, value in list(vars(cls).items()):
+            if not attr.startswith("_") and inspect.iscoroutinefunction(value):
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+    return decorate
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+class TracedTemplates(Jinja2Templates):
+    """Jinja2Templates that times each render as a "render <template>" span"""
+
+    def TemplateResponse(self, name, *args, **kwargs):
+        with span(f"render {name}"):
+            return super().TemplateResponse(name, *args, **kwargs)
+
+
+_TOKEN_CHARS = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]+")
+
+
+def server_timing(root: Span, limit: int = SERVER_TIMING_MAX_ENTRIES) -> str:
+    """Server-Timing header value: total, then every span with its tree path as description"""
+    entries = [f'total;dur={root.duration_ms:.1f}']
+    path: List[str] = []
+    spans = list(root.walk())[1:]
+    for index, (depth, node) in enumerate(spans[:limit]):
+        del path[depth - 1:]
+        path.append(node.name)
+        metric = _TOKEN_CHARS.sub("-", node.name).strip("-")[:40] or "span"
+        description = " > ".join(path).replace("\\", "\\\\").replace('"', '\\"')
+        entries.append(f'{index + 1}-{metric};desc="{description}";dur={node.duration_ms:.1f}')
+    if len(spans) > limit:
+        entries.append(f'truncated;desc="{len(spans) - limit} more spans"')
+    return ", ".join(entries)
+
+
+def _is_admin(scope) -> bool:
+    auth = scope.get("state", {}).get("auth")
+    return bool(getattr(auth, "is_admin", False))
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware opening a root span per request and reporting it as Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        root = Span(f'{scope["method"]} {scope["path"]}')
+        token = _current.set(root)
+        wants_footer = QueryParams(scope.get("query_string", b"")).get(SERVER_TIMING_FOOTER_PARAM) == "1"
+        held: List[dict] = []
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                root.end = time.perf_counter()
+                admin = _is_admin(scope)
+                if not (admin or SERVER_TIMING_DEBUG):
+                    await send(message)
+                    return
+                headers = list(message.get("headers", ()))
+                headers.append((b"server-timing", server_timing(root).encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+                if wants_footer and admin and _is_html(headers):
+                    held.append(message)
+                    return
+            elif held and message["type"] == "http.response.body":
+                # Buffer the page so the footer can be appended before </body>
+                held.append(message)
+                if message.get("more_body"):
+                    return
+                await _send_with_footer(send, held, root)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+
+
+def _is_html(headers) -> bool:
+    return any(name.lower() == b"content-type" and value.startswith(b"text/html") for name, value in headers)
+
+
+async def _send_with_footer(send, held: List[dict], root: Span):
+    start, chunks = held[0], held[1:]
+    body = b"".join(chunk.get("body", b"") for chunk in chunks)
+    tree = json.dumps(root.to_dict(), ensure_ascii=False).replace("</", "<\\/")
+    footer = f'<script type="application/json" id="server-timing">{tree}</script>'.encode("utf-8")
+    position = body.rfind(b"</body>")
+    body = body + footer if position < 0 else body[:position] + footer + body[position:]
+    headers = [(name, value) for name, value in start["headers"] if name.lower() != b"content-length"]
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({**start, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Opera Panel Benchmark Regression Comparator
+Compares a benchmark run (benchmark_suite.py) against a stored baseline: Mann-Whitney U
+and bootstrap confidence intervals decide which routes really got slower, and per-route
+budgets (benchmark_budgets.json) gate latency and upstream call counts
+"""
+import argparse
+import json
+import math
+import random
+import statistics
+import sys
+from typing import List, Optional, Tuple
+
+DEFAULT_BUDGETS = {
+    # Largest tolerated median slowdown (percent) when the change is statistically significant
+    "max_regression_pct": 10.0,
+    # Changes smaller than this many milliseconds are treated as noise
+    "min_effect_ms": 0.5,
+}
+
+
+def mann_whitney_u(baseline: List[float], candidate: List[float]) -> Tuple[float, float]:
+    """Two-sided Mann-Whitney U test (normal approximation with tie correction)
+
+    Returns (P(candidate > baseline) effect size, p-value).
+    """
+    n1, n2 = len(candidate), len(baseline)
+    if not n1 or not n2:
+        return 0.5, 1.0
+    combined = sorted([(value, 0) for value in candidate] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return u / (n1 * n2), 1.0
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return u / (n1 * n2), min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def bootstrap_ci(baseline: List[float], candidate: List[float], iterations: int = 2000,
+                 confidence: float = 0.95, seed: int = 0) -> Tuple[float, float]:
+    """Percentile bootstrap CI for the relative change in median latency (percent)"""
+    rng = random.Random(seed)
+    changes = []
+    for _ in range(iterations):
+        base = statistics.median(rng.choices(baseline, k=len(baseline)))
+        cand = statistics.median(rng.choices(candidate, k=len(candidate)))
+        changes.append((cand / base - 1) * 100 if base else 0.0)
+    changes.sort()
+    tail = (1 - confidence) / 2
+    return changes[int(tail * (iterations - 1))], changes[int(math.ceil((1 - tail) * (iterations - 1)))]
+
+
+def route_budgets(budgets: dict, route: str) -> dict:
+    """Defaults, then file-wide defaults, then the route's own entry (longest matching prefix wins)"""
+    merged = {**DEFAULT_BUDGETS, **budgets.get("default", {})}
+    routes = budgets.get("routes", {})
+    for prefix in sorted((p for p in routes if route.startswith(p)), key=len):
+        merged.update(routes[prefix])
+    return merged
+
+
+def compare_route(name: str, baseline: dict, candidate: dict, budgets: dict, alpha: float,
+                  bootstrap_iterations: int) -> dict:
+    limits = route_budgets(budgets, name)
+    base_samples, cand_samples = baseline.get("samples_ms") or [], candidate.get("samples_ms") or []
+    base_median = statistics.median(base_samples) if base_samples else baseline.get("p50_ms", 0.0)
+    cand_median = statistics.median(cand_samples) if cand_samples else candidate.get("p50_ms", 0.0)
+    change_pct = (cand_median / base_median - 1) * 100 if base_median else 0.0
+
+    effect, p_value = mann_whitney_u(base_samples, cand_samples)
+    ci = bootstrap_ci(base_samples, cand_samples, bootstrap_iterations) if base_samples and cand_samples else (change_pct, change_pct)
+    significant = p_value < alpha and abs(cand_median - base_median) >= limits["min_effect_ms"]
+
+    failures = []
+    if significant and ci[0] > limits["max_regression_pct"]:
+        failures.append(f"median +{change_pct:.1f}% (95% CI {ci[0]:+.1f}%..{ci[1]:+.1f}%) "
+                        f"exceeds +{limits['max_regression_pct']:.0f}%")
+    for metric in ("p50_ms", "p95_ms", "p99_ms"):
+        if limits.get(metric) is not None and candidate.get(metric, 0) > limits[metric]:
+            failures.append(f"{metric} {candidate[metric]:.2f} > budget {limits[metric]}")
+
+    base_calls = baseline.get("upstream_calls_per_request", 0.0)
+    cand_calls = candidate.get("upstream_calls_per_request", 0.0)
+    # The offline suite is deterministic, so any extra upstream call per request is real
+    if cand_calls > base_calls + 1e-9 and not limits.get("allow_more_upstream_calls"):
+        failures.append(f"upstream calls/request {base_calls:g} -> {cand_calls:g}")
+    if limits.get("upstream_calls_per_request") is not None and cand_calls > limits["upstream_calls_per_request"]:
+        failures.append(f"upstream calls/request {cand_calls:g} > budget {limits['upstream_calls_per_request']:g}")
+
+    if failures:
+        verdict = "FAIL"
+    elif significant and change_pct > 0:
+        verdict = "slower"
+    elif significant:
+        verdict = "faster"
+    else:
+        verdict = "unchanged"
+    return {
+        "route": name,
+        "verdict": verdict,
+        "baseline_median_ms": round(base_median, 3),
+        "candidate_median_ms": round(cand_median, 3),
+        "change_pct": round(change_pct, 2),
+        "ci_pct": [round(ci[0], 2), round(ci[1], 2)],
+        "p_value": round(p_value, 5),
+        "prob_slower": round(effect, 3),
+        "baseline_p95_ms": baseline.get("p95_ms"),
+        "candidate_p95_ms": candidate.get("p95_ms"),
+        "upstream_calls": [base_calls, cand_calls],
+        "failures": failures
+    }
+
+
+def compare_reports(baseline: dict, candidate: dict, budgets: Optional[dict] = None, alpha: float = 0.01,
+                    bootstrap_iterations: int = 2000) -> dict:
+    budgets = budgets or {}
+    base_routes, cand_routes = baseline.get("routes", {}), candidate.get("routes", {})
+    results = [compare_route(name, base_routes[name], cand_routes[name], budgets, alpha, bootstrap_iterations)
+               for name in cand_routes if name in base_routes]
+    results.sort(key=lambda r: (r["verdict"] != "FAIL", -r["change_pct"]))
+    warnings = []
+    if baseline.get("meta", {}).get("dataset") != candidate.get("meta", {}).get("dataset"):
+        warnings.append("baseline and candidate used different datasets")
+    if baseline.get("meta", {}).get("latency_ms") != candidate.get("meta", {}).get("latency_ms"):
+        warnings.append("baseline and candidate used different injected latency")
+    return {
+        "passed": not any(r["verdict"] == "FAIL" for r in results),
+        "routes": results,
+        "new_routes": sorted(set(cand_routes) - set(base_routes)),
+        "missing_routes": sorted(set(base_routes) - set(cand_routes)),
+        "warnings": warnings
+    }
+
+
+def print_comparison(comparison: dict):
+    icons = {"FAIL": "❌", "slower": "🐢", "faster": "🚀", "unchanged": "✅"}
+    print(f"{'':2} {'route':<40} {'base ms':>9} {'new ms':>9} {'change':>8} {'95% CI':>17} {'p':>8} {'calls':>9}")
+    for r in comparison["routes"]:
+        calls = f"{r['upstream_calls'][0]:g}->{r['upstream_calls'][1]:g}"
+        ci = f"{r['ci_pct'][0]:+.1f}..{r['ci_pct'][1]:+.1f}%"
+        print(f"{icons[r['verdict']]} {r['route']:<40} {r['baseline_median_ms']:>9.2f} {r['candidate_median_ms']:>9.2f} "
+              f"{r['change_pct']:>+7.1f}% {ci:>17} {r['p_value']:>8.4f} {calls:>9}")
+        for failure in r["failures"]:
+            print(f"     ↳ {failure}")
+    for name in comparison["new_routes"]:
+        print(f"🆕 {name} (no baseline)")
+    for name in comparison["missing_routes"]:
+        print(f"⚠️ {name} missing from the new run")
+    for warning in comparison["warnings"]:
+        print(f"⚠️ {warning}")
+    print("🎉 No performance regressions" if comparison["passed"] else "💥 Performance regressions found")
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a benchmark run against a baseline")
+    parser.add_argument("baseline", help="Stored baseline report (benchmark_suite.py output)")
+    parser.add_argument("candidate", help="New benchmark report")
+    parser.add_argument("--budgets", default=None, help="Per-route budgets JSON (e.g. benchmark_budgets.json)")
+    parser.add_argument("--alpha", type=float, default=0.01, help="Significance level for Mann-Whitney U")
+    parser.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap resamples for confidence intervals")
+    parser.add_argument("--json", dest="json_output", help="Also write the comparison as JSON")
+    args = parser.parse_args()
+
+    comparison = compare_reports(load(args.baseline), load(args.candidate),
+                                 load(args.budgets) if args.budgets else None, args.alpha, args.bootstrap)
+    print_comparison(comparison)
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(comparison, f, indent=2)
+    sys.exit(0 if comparison["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Opera Panel JSON Codec Benchmark
+Times decoding of Stardust-sized responses and encoding of the panel's JSON API responses
+with the standard library (as before) and with orjson, on the synthetic reference data
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.services import codec
+from app.services.codec import FastJSONResponse, _orjson_dumps, _orjson_loads, _std_dumps, _std_loads
+from app.services.geography import filter_locations
+from fake_stardust import SyntheticData
+
+
+def payloads(data: SyntheticData) -> Dict[str, dict]:
+    """Responses as Stardust sends them, and the panel's dropdown responses"""
+    def envelope(records: List[dict]) -> dict:
+        return {"success": True, "data": {"data": records, "total": len(records), "skip": 0, "limit": len(records)}}
+
+    return {
+        "stardust:hospitals (1000)": envelope(data.hospitals[:1000]),
+        "stardust:sub_districts (page of 1000)": envelope(data.sub_districts[:1000]),
+        "stardust:sub_districts (all)": envelope(data.sub_districts),
+        "panel:/api/master-data/provinces": {"data": filter_locations(data.provinces)},
+        "panel:/admin/dropdown/sub-districts (all)": {"success": True,
+                                                       "data": {"sub_districts": filter_locations(data.sub_districts)}},
+    }
+
+
+def timed(func: Callable, iterations: int) -> float:
+    """Median milliseconds per call"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(iterations: int = 20) -> dict:
+    data = SyntheticData()
+    results = {}
+    for name, payload in payloads(data).items():
+        raw = _std_dumps(payload)
+        row = {"bytes": len(raw),
+               "json_loads_ms": timed(lambda: _std_loads(raw), iterations),
+               "json_dumps_ms": timed(lambda: _std_dumps(payload), iterations)}
+        if name.startswith("panel:"):
+            # What FastAPI did for a returned dict: jsonable_encoder, then JSONResponse
+            row["fastapi_dict_ms"] = timed(lambda: JSONResponse(jsonable_encoder(payload)), iterations)
+            row["fast_response_ms"] = timed(lambda: FastJSONResponse(payload), iterations)
+        if codec.orjson is not None:
+            row["orjson_loads_ms"] = timed(lambda: _orjson_loads(raw), iterations)
+            row["orjson_dumps_ms"] = timed(lambda: _orjson_dumps(payload), iterations)
+            assert _orjson_loads(raw) == payload
+        results[name] = {key: round(value, 3) if isinstance(value, float) else value for key, value in row.items()}
+    return {"codec": codec.CODEC, "iterations": iterations, "payloads": results}
+
+
+def print_report(report: dict):
+    print(f"📦 JSON codec benchmark (active codec: {report['codec']}, median of {report['iterations']})")
+    print(f"{'payload':<44} {'KiB':>7} {'loads json':>10} {'orjson':>8} {'x':>5} {'dumps json':>10} {'orjson':>8} {'x':>5}")
+    for name, row in report["payloads"].items():
+        loads_x = row["json_loads_ms"] / row["orjson_loads_ms"] if row.get("orjson_loads_ms") else 0
+        dumps_x = row["json_dumps_ms"] / row["orjson_dumps_ms"] if row.get("orjson_dumps_ms") else 0
+        print(f"{name:<44} {row['bytes'] / 1024:>7.0f} {row['json_loads_ms']:>10.2f} {row.get('orjson_loads_ms', 0):>8.2f} "
+              f"{loads_x:>5.1f} {row['json_dumps_ms']:>10.2f} {row.get('orjson_dumps_ms', 0):>8.2f} {dumps_x:>5.1f}")
+    print("\nResponse rendering (ms): FastAPI dict path vs FastJSONResponse")
+    for name, row in report["payloads"].items():
+        if "fastapi_dict_ms" in row:
+            print(f"{name:<44} {row['fastapi_dict_ms']:>8.2f} -> {row['fast_response_ms']:>7.2f} "
+                  f"({row['fastapi_dict_ms'] / row['fast_response_ms']:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoding/encoding on real payload sizes")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Also save the results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.iterations)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
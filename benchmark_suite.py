@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Opera Panel Offline Benchmark Suite
+Runs the panel in-process against the fake Stardust app (fake_stardust.py) and reports
+per-route latency percentiles, upstream calls per request and allocations
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+# Keep the panel's own logging out of the measurements unless asked for
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import httpx
+
+from fake_stardust import SyntheticData, create_fake_stardust
+
+
+class Scenario(NamedTuple):
+    name: str
+    path: str
+    params: Optional[dict] = None
+
+
+def default_scenarios(data: SyntheticData) -> List[Scenario]:
+    """Key panel routes, with IDs and codes taken from the synthetic data"""
+    hospital = data.hospitals[0] if data.hospitals else {"_id": "missing", "province_code": 10}
+    province = data.provinces[0]["code"]
+    district = next(d for d in data.districts if d["province_code"] == province)
+    return [
+        Scenario("dashboard", "/"),
+        Scenario("master_data_list:hospitals", "/admin/master-data/hospitals"),
+        Scenario("master_data_list:hospitals?province", "/admin/master-data/hospitals",
+                 {"province_code": hospital["province_code"], "status": "active"}),
+        Scenario("master_data_list:hospitals?search", "/admin/master-data/hospitals", {"search": "hospital ka"}),
+        Scenario("master_data_list:provinces", "/admin/master-data/provinces"),
+        Scenario("master_data_list:districts?province", "/admin/master-data/districts", {"province_code": province}),
+        Scenario("master_data_list:sub-districts", "/admin/master-data/sub-districts"),
+        Scenario("master_data_detail:hospitals", f"/admin/master-data/hospitals/{hospital['_id']}"),
+        Scenario("master_data_detail:districts", f"/admin/master-data/districts/{district['_id']}"),
+        Scenario("dropdown:provinces", "/api/master-data/provinces"),
+        Scenario("dropdown:districts", f"/api/master-data/districts/{province}"),
+        Scenario("dropdown:sub-districts", f"/api/master-data/sub-districts/{district['code']}",
+                 {"province_code": province}),
+        Scenario("suggest:hospitals", "/api/master-data/hospitals/suggest", {"q": "hos"}),
+    ]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0-100) of unsorted samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class BenchmarkHarness:
+    """Panel and fake Stardust wired together in one event loop, with a logged-in session"""
+
+    def __init__(self, data: SyntheticData, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.data = data
+        self.fake = create_fake_stardust(data, latency_ms, jitter_ms)
+        self.client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def upstream_calls(self) -> Counter:
+        return self.fake.state.calls
+
+    # Service state that holds upstream data, saved on enter and restored on exit
+    SNAPSHOT_ATTRIBUTES = ("geography", "hospitals", "_master_data_snapshots", "_geography_keysets",
+                           "_prefix_indexes")
+
+    async def __aenter__(self):
+        from app.services.auth import auth_service
+        from app.services.cache import CACHE_REGISTRY, TTLCache
+        from app.services.http_client import upstream
+        from app.services.stardust_api import stardust_api
+        from main import app
+
+        # Start from empty snapshots and profiles so no earlier dataset is served
+        self._saved = ({name: getattr(stardust_api, name) for name in self.SNAPSHOT_ATTRIBUTES},
+                       dict(CACHE_REGISTRY), auth_service.profile_cache)
+        stardust_api.reset_snapshots()
+        auth_service.profile_cache = TTLCache(auth_service.profile_cache.name, auth_service.profile_cache.ttl,
+                                              auth_service.profile_cache.maxsize)
+        await upstream.use_transport(httpx.ASGITransport(app=self.fake))
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://panel")
+        response = await self.client.post("/auth/login", json={"username": "bench", "password": "bench"})
+        if response.status_code != 200:
+            raise RuntimeError(f"Benchmark login failed: {response.status_code} {response.text}")
+        return self
+
+    async def __aexit__(self, *exc):
+        from app.services.auth import auth_service
+        from app.services.cache import CACHE_REGISTRY
+        from app.services.http_client import upstream
+        from app.services.stardust_api import stardust_api
+
+        await self.client.aclose()
+        await upstream.use_transport(None)
+        snapshots, registry, profile_cache = self._saved
+        for name, value in snapshots.items():
+            setattr(stardust_api, name, value)
+        CACHE_REGISTRY.clear()
+        CACHE_REGISTRY.update(registry)
+        auth_service.profile_cache = profile_cache
+
+    async def request(self, scenario: Scenario) -> tuple:
+        """(latency ms, status, upstream calls made) for one request"""
+        before = sum(self.upstream_calls.values())
+        start = time.perf_counter()
+        response = await self.client.get(scenario.path, params=scenario.params)
+        elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, response.status_code, sum(self.upstream_calls.values()) - before
+
+
+async def measure(harness: BenchmarkHarness, scenario: Scenario, iterations: int, warmup: int,
+                  alloc_iterations: int) -> dict:
+    first_ms, first_status, first_calls = await harness.request(scenario)
+    for _ in range(warmup):
+        await harness.request(scenario)
+
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    calls_before = Counter(harness.upstream_calls)
+    total_calls = 0
+    for _ in range(iterations):
+        elapsed, status, calls = await harness.request(scenario)
+        samples.append(elapsed)
+        statuses[status] += 1
+        total_calls += calls
+    by_endpoint = {f"{method} {path}": count for (method, path), count
+                   in (harness.upstream_calls - calls_before).items()}
+
+    # Allocations are measured in a separate pass: tracing would distort the timings.
+    # Figures are process-wide, so they include the fake Stardust's share of the work
+    peaks, retained = [], []
+    if alloc_iterations:
+        tracemalloc.start()
+        for _ in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await harness.request(scenario)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - baseline) / 1024)
+            retained.append((current - baseline) / 1024)
+        tracemalloc.stop()
+
+    return {
+        "path": scenario.path,
+        "params": scenario.params or {},
+        "iterations": iterations,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "first_request": {"ms": round(first_ms, 3), "status": first_status, "upstream_calls": first_calls},
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+        "upstream_calls_per_request": round(total_calls / iterations, 3) if iterations else 0.0,
+        "upstream_by_endpoint": by_endpoint,
+        "alloc_peak_kib": round(statistics.median(peaks), 1) if peaks else None,
+        "alloc_retained_kib": round(statistics.median(retained), 1) if retained else None,
+        "samples_ms": [round(sample, 3) for sample in samples]
+    }
+
+
+async def run_benchmarks(hospitals: int = 1000, patients: int = 2000, devices: int = 500,
+                         latency_ms: float = 0.0, jitter_ms: float = 0.0, iterations: int = 50,
+                         warmup: int = 5, alloc_iterations: int = 3, only: Optional[List[str]] = None) -> dict:
+    data = SyntheticData(hospitals=hospitals, patients=patients, devices=devices)
+    scenarios = [s for s in default_scenarios(data) if not only or any(s.name.startswith(o) for o in only)]
+    routes: Dict[str, dict] = {}
+    started = time.perf_counter()
+    async with BenchmarkHarness(data, latency_ms, jitter_ms) as harness:
+        for scenario in scenarios:
+            routes[scenario.name] = await measure(harness, scenario, iterations, warmup, alloc_iterations)
+        total_upstream = sum(harness.upstream_calls.values())
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dataset": data.counts(),
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "iterations": iterations,
+            "warmup": warmup,
+            "duration_s": round(time.perf_counter() - started, 2),
+            "total_upstream_calls": total_upstream
+        },
+        "routes": routes
+    }
+
+
+def print_report(report: dict):
+    meta = report["meta"]
+    print(f"📊 Offline benchmark: {meta['dataset']} | upstream latency {meta['latency_ms']}±{meta['jitter_ms']} ms")
+    print(f"{'route':<40} {'p50':>8} {'p95':>8} {'p99':>8} {'calls/req':>9} {'cold ms':>8} {'alloc KiB':>9}")
+    for name, route in report["routes"].items():
+        alloc = route["alloc_peak_kib"] if route["alloc_peak_kib"] is not None else "-"
+        print(f"{name:<40} {route['p50_ms']:>8.2f} {route['p95_ms']:>8.2f} {route['p99_ms']:>8.2f} "
+              f"{route['upstream_calls_per_request']:>9.2f} {route['first_request']['ms']:>8.1f} {alloc:>9}")
+    print(f"⏱️ {meta['duration_s']} s, {meta['total_upstream_calls']} upstream calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the panel against an in-process fake Stardust")
+    parser.add_argument("--hospitals", type=int, default=1000)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--devices", type=int, default=500, help="Devices per device type")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform extra upstream latency")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--alloc-iterations", type=int, default=3, help="0 disables allocation tracing")
+    parser.add_argument("--only", nargs="*", help="Route name prefixes to run (e.g. dropdown master_data_list)")
+    parser.add_argument("--output", default="benchmark_report.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(args.hospitals, args.patients, args.devices, args.latency_ms,
+                                        args.jitter_ms, args.iterations, args.warmup, args.alloc_iterations,
+                                        args.only))
+    print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Fake Stardust API for offline benchmarks and tests
+An in-process ASGI app serving deterministic synthetic master data (77 provinces,
+~900 districts, ~7,000 sub-districts, configurable hospitals/patients/devices) in the
+response shapes the panel parses, with configurable latency and per-endpoint call counts
+"""
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+
+from app.services.resilience import endpoint_template
+
+HOSPITAL_TYPES = [("1", "Regional Hospital", "โรงพยาบาลศูนย์"), ("2", "General Hospital", "โรงพยาบาลทั่วไป"),
+                  ("3", "Community Hospital", "โรงพยาบาลชุมชน"), ("4", "Health Promoting Hospital", "โรงพยาบาลส่งเสริมสุขภาพตำบล"),
+                  ("5", "Private Hospital", "โรงพยาบาลเอกชน")]
+THAI_SYLLABLES = ["กา", "นคร", "บุรี", "ราช", "สมุทร", "ศรี", "ชัย", "พระ", "นาง", "ทอง", "แก้ว", "สุข", "เชียง", "ลำ", "ภู", "วัง"]
+EN_SYLLABLES = ["ka", "nakhon", "buri", "rat", "samut", "si", "chai", "phra", "nang", "thong", "kaeo", "suk", "chiang", "lam", "phu", "wang"]
+
+# Collection name in the URL -> key used by the record endpoints
+_RECORD_KEYS = {"provinces": "province", "districts": "district", "sub_districts": "sub_district",
+                "hospital_types": "hospital_type", "hospitals": "hospital"}
+
+
+def _name(rng: random.Random, prefix_en: str = "", prefix_th: str = "") -> list:
+    picks = [rng.randrange(len(THAI_SYLLABLES)) for _ in range(rng.randint(2, 3))]
+    english = "".join(EN_SYLLABLES[i] for i in picks).title()
+    thai = "".join(THAI_SYLLABLES[i] for i in picks)
+    return [{"code": "en", "name": f"{prefix_en}{english}".strip()}, {"code": "th", "name": f"{prefix_th}{thai}"}]
+
+
+class SyntheticData:
+    """Deterministic Thai-shaped reference data; counts follow the real administrative tree"""
+
+    def __init__(self, provinces: int = 77, districts: int = 928, sub_districts: int = 7255,
+                 hospitals: int = 1000, patients: int = 2000, devices: int = 500, seed: int = 42):
+        rng = random.Random(seed)
+        epoch = datetime(2024, 1, 1)
+
+        def stamps():
+            created = epoch + timedelta(minutes=rng.randrange(500_000))
+            updated = created + timedelta(minutes=rng.randrange(100_000))
+            return {"created_at": created.isoformat(), "updated_at": updated.isoformat()}
+
+        def spread(total: int, buckets: int) -> List[int]:
+            """Split total over buckets, each getting at least one"""
+            counts = [1] * buckets
+            for _ in range(total - buckets):
+                counts[rng.randrange(buckets)] += 1
+            return counts
+
+        self.provinces = [{"_id": f"prov{code:04d}", "code": code, "name": _name(rng, "", "จังหวัด"),
+                           "is_active": True, **stamps()} for code in range(10, 10 + provinces)]
+        self.districts: List[dict] = []
+        for province, count in zip(self.provinces, spread(districts, provinces)):
+            for n in range(count):
+                code = province["code"] * 100 + n + 1
+                self.districts.append({"_id": f"dist{code:06d}", "code": code, "province_code": province["code"],
+                                       "name": _name(rng, "", "อำเภอ"), "is_active": True, **stamps()})
+        self.sub_districts: List[dict] = []
+        for district, count in zip(self.districts, spread(sub_districts, len(self.districts))):
+            for n in range(count):
+                code = district["code"] * 100 + n + 1
+                self.sub_districts.append({"_id": f"sub{code:08d}", "code": code, "province_code": district["province_code"],
+                                           "district_code": district["code"], "name": _name(rng, "", "ตำบล"),
+                                           "is_active": rng.random() > 0.02, **stamps()})
+        self.hospital_types = [{"_id": f"ht{code}", "code": code, "name": [{"code": "en", "name": en}, {"code": "th", "name": th}],
+                                "is_active": True, **stamps()} for code, en, th in HOSPITAL_TYPES]
+        self.hospitals: List[dict] = []
+        for i in range(hospitals):
+            sub_district = rng.choice(self.sub_districts)
+            self.hospitals.append({
+                "_id": f"hosp{i:06d}", "code": 10000 + i, "name": _name(rng, "Hospital ", "โรงพยาบาล"),
+                "hospital_type_code": rng.choice(HOSPITAL_TYPES)[0],
+                "province_code": sub_district["province_code"], "district_code": sub_district["district_code"],
+                "sub_district_code": sub_district["code"],
+                "address": f"{rng.randint(1, 999)} Moo {rng.randint(1, 15)}", "postal_code": str(rng.randint(10000, 96000)),
+                "phone": f"0{rng.randint(20000000, 99999999)}",
+                "location": [round(rng.uniform(5.6, 20.5), 6), round(rng.uniform(97.3, 105.6), 6)],
+                "is_active": rng.random() > 0.1, "is_deleted": False, **stamps()
+            })
+        self.patients = [{"_id": f"pat{i:07d}", "first_name": _name(rng)[0]["name"], "last_name": _name(rng)[0]["name"],
+                          "hospital_id": rng.choice(self.hospitals)["_id"] if self.hospitals else None,
+                          "is_active": True, **stamps()} for i in range(patients)]
+        self.devices: Dict[str, List[dict]] = {
+            kind: [{"_id": f"{kind}{i:06d}", "mac_address": ":".join(f"{rng.randrange(256):02x}" for _ in range(6)),
+                    "patient_id": rng.choice(self.patients)["_id"] if self.patients else None,
+                    "is_active": True, **stamps()} for i in range(devices)]
+            for kind in ("ava4", "kati", "qube-vital")
+        }
+
+    def collection(self, name: str) -> Optional[List[dict]]:
+        return {"provinces": self.provinces, "districts": self.districts, "sub_districts": self.sub_districts,
+                "hospital_types": self.hospital_types, "hospitals": self.hospitals}.get(name)
+
+    def counts(self) -> dict:
+        return {"provinces": len(self.provinces), "districts": len(self.districts),
+                "sub_districts": len(self.sub_districts), "hospitals": len(self.hospitals),
+                "patients": len(self.patients), "devices": sum(len(d) for d in self.devices.values())}
+
+
+def _matches(record: dict, params) -> bool:
+    for field in ("province_code", "district_code", "sub_district_code"):
+        if params.get(field) and str(record.get(field)) != params[field]:
+            return False
+    if params.get("is_active") is not None and str(record.get("is_active")).lower() != params["is_active"].lower():
+        return False
+    if params.get("date_from") and record["updated_at"][:10] < params["date_from"]:
+        return False
+    if params.get("date_to") and record["updated_at"][:10] > params["date_to"]:
+        return False
+    if params.get("search"):
+        needle = params["search"].lower()
+        if not any(needle in n["name"].lower() for n in record.get("name", [])) and needle not in str(record.get("code")):
+            return False
+    return True
+
+
+def create_fake_stardust(data: Optional[SyntheticData] = None, latency_ms: float = 0.0,
+                         jitter_ms: float = 0.0, seed: int = 7) -> FastAPI:
+    """Fake Stardust app; `app.state.calls` counts requests per (method, endpoint template)"""
+    data = data or SyntheticData()
+    app = FastAPI()
+    app.state.data = data
+    app.state.calls = Counter()
+    app.state.latency_ms = latency_ms
+    app.state.jitter_ms = jitter_ms
+    rng = random.Random(seed)
+
+    @app.middleware("http")
+    async def latency_and_counting(request: Request, call_next):
+        app.state.calls[(request.method, endpoint_template(request.url.path))] += 1
+        delay = app.state.latency_ms + (rng.uniform(0, app.state.jitter_ms) if app.state.jitter_ms else 0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        return await call_next(request)
+
+    def token_response():
+        return {"access_token": "fake-access-token", "refresh_token": "fake-refresh-token",
+                "token_type": "bearer", "expires_in": 3600}
+
+    @app.post("/auth/login")
+    async def login():
+        return token_response()
+
+    @app.post("/auth/refresh")
+    async def refresh():
+        return token_response()
+
+    @app.get("/auth/me")
+    async def me():
+        return {"data": {"id": "u1", "username": "bench", "email": "bench@example.com", "full_name": "Bench Admin",
+                         "role": "superadmin", "permissions": ["*"],
+                         "system_access": {"can_access_admin": True, "can_modify_data": True,
+                                           "can_view_data": True, "is_superadmin": True}}}
+
+    @app.get("/admin/master-data/{collection}")
+    async def master_data_list(collection: str, request: Request):
+        records = data.collection(collection)
+        if records is None:
+            records = []
+        params = request.query_params
+        skip, limit = int(params.get("skip", 0)), int(params.get("limit", 100))
+        matched = [r for r in records if _matches(r, params)]
+        matched.sort(key=lambda r: (r["updated_at"], r["_id"]), reverse=params.get("order") == "desc")
+        return {"success": True, "data": {"data": matched[skip:skip + limit], "total": len(matched),
+                                          "skip": skip, "limit": limit}}
+
+    @app.get("/admin/master-data/{collection}/{record_id}")
+    async def master_data_record(collection: str, record_id: str):
+        for record in data.collection(collection) or []:
+            if record["_id"] == record_id or str(record["code"]) == record_id:
+                return {"success": True, "data": {_RECORD_KEYS.get(collection, "record"): record}}
+        raise HTTPException(status_code=404, detail="Record not found")
+
+    @app.get("/admin/hospitals-raw-documents")
+    async def raw_documents(hospital_id: Optional[str] = None, limit: int = 10):
+        docs = [h for h in data.hospitals if hospital_id is None or h["_id"] == hospital_id][:limit]
+        return {"success": True, "data": {"raw_documents": docs, "field_analysis": {"fields": len(docs[0]) if docs else 0},
+                                          "metadata": {"total": len(docs)}}}
+
+    @app.get("/admin/dropdown/{collection}")
+    async def dropdown(collection: str, request: Request):
+        name = collection.replace("-", "_")
+        records = [r for r in data.collection(name) or [] if _matches(r, request.query_params)]
+        return {"success": True, "data": {name: records, "total": len(records)}}
+
+    @app.get("/patients")
+    async def patients(skip: int = 0, limit: int = 100):
+        return {"items": data.patients[skip:skip + limit], "total": len(data.patients)}
+
+    @app.get("/devices/{kind}")
+    async def devices(kind: str, skip: int = 0, limit: int = 100):
+        items = data.devices.get(kind, [])
+        return {"items": items[skip:skip + limit], "total": len(items)}
+
+    @app.get("/stats/{name}")
+    async def stats(name: str):
+        return {"data": {"patients": len(data.patients), "devices": data.counts()["devices"]}}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # Run standalone (e.g. STARDUST_API_BASE_URL=http://localhost:5056 for the panel)
+    uvicorn.run(create_fake_stardust(latency_ms=20, jitter_ms=10), host="127.0.0.1", port=5056)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Opera Panel Open-Loop Load Generator
+Fires requests at fixed Poisson arrival rates regardless of how fast the panel answers,
+so queueing shows up as latency instead of a slower request rate. Steps through a list of
+rates and reports throughput, tail latency, errors and where latency knees
+"""
+import asyncio
+import math
+import random
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+# A step is past the knee when p99 grows beyond this multiple of the first step's p99...
+KNEE_LATENCY_FACTOR = 3.0
+# ...or throughput falls below this share of the offered rate, or errors exceed this rate
+KNEE_THROUGHPUT_RATIO = 0.9
+KNEE_ERROR_RATE = 0.01
+
+
+class LoadScenario(NamedTuple):
+    label: str
+    path: str
+    params: Optional[dict] = None
+    weight: float = 1.0
+
+
+class Sample(NamedTuple):
+    label: str
+    latency_ms: float
+    status: int
+    error: Optional[str] = None
+
+
+Send = Callable[[LoadScenario], Awaitable[int]]
+
+
+def default_mix(hospital_ids: Sequence[str] = (), province_code: int = 10,
+                district_code: int = 1001) -> List[LoadScenario]:
+    """Admin browsing mix: list pages, filters, hospital detail pages and dropdown APIs"""
+    mix = [
+        LoadScenario("list:hospitals", "/admin/master-data/hospitals", {"limit": 25}, 3),
+        LoadScenario("list:provinces", "/admin/master-data/provinces", None, 1),
+        LoadScenario("filter:hospitals?active", "/admin/master-data/hospitals", {"status": "active", "limit": 25}, 2),
+        LoadScenario("filter:hospitals?province", "/admin/master-data/hospitals",
+                     {"province_code": province_code, "limit": 25}, 2),
+        LoadScenario("filter:hospitals?search", "/admin/master-data/hospitals", {"search": "hospital", "limit": 25}, 1),
+        LoadScenario("dropdown:provinces", "/api/master-data/provinces", None, 3),
+        LoadScenario("dropdown:districts", f"/api/master-data/districts/{province_code}", None, 3),
+        LoadScenario("dropdown:sub-districts", f"/api/master-data/sub-districts/{district_code}",
+                     {"province_code": province_code}, 2),
+        LoadScenario("suggest:hospitals", "/api/master-data/hospitals/suggest", {"q": "hos"}, 2),
+    ]
+    # Detail pages rotate over the given IDs but report under one label
+    for hospital_id in hospital_ids:
+        mix.append(LoadScenario("detail:hospital", f"/admin/master-data/hospitals/{hospital_id}", None,
+                                2 / len(hospital_ids)))
+    return mix
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100); exact enough for p99.9 on large runs"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(round(q / 100 * len(ordered), 9)) - 1)]
+
+
+class ConcurrencyTracker:
+    """Time-weighted in-flight request count"""
+
+    def __init__(self, clock: Callable[[], float]):
+        self.clock = clock
+        self.in_flight = 0
+        self.peak = 0
+        self.area = 0.0
+        self.started = self.last = clock()
+
+    def _advance(self):
+        now = self.clock()
+        self.area += self.in_flight * (now - self.last)
+        self.last = now
+
+    def enter(self):
+        self._advance()
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+
+    def leave(self):
+        self._advance()
+        self.in_flight -= 1
+
+    @property
+    def mean(self) -> float:
+        self._advance()
+        elapsed = self.last - self.started
+        return self.area / elapsed if elapsed > 0 else 0.0
+
+
+def summarize(samples: List[Sample], offered_rps: float, elapsed_s: float) -> dict:
+    ok = [s.latency_ms for s in samples if 200 <= s.status < 300]
+    errors = Counter(s.error or str(s.status) for s in samples if not 200 <= s.status < 300)
+    latencies = [s.latency_ms for s in samples]
+    return {
+        "requests": len(samples),
+        "offered_rps": round(offered_rps, 2),
+        "throughput_rps": round(len(ok) / elapsed_s, 2) if elapsed_s else 0.0,
+        "error_rate": round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+        "errors": dict(errors),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "p999_ms": round(percentile(latencies, 99.9), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0
+    }
+
+
+async def run_open_loop(send: Send, mix: Sequence[LoadScenario], rate: float, duration_s: float,
+                        seed: int = 0, drain_timeout_s: float = 30.0) -> dict:
+    """One load step: Poisson arrivals at `rate` per second for `duration_s`
+
+    Latency is measured from each request's scheduled arrival, so a backed-up client
+    loop counts against the panel instead of hiding it (coordinated omission).
+    """
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    weights = [scenario.weight for scenario in mix]
+    tracker = ConcurrencyTracker(loop.time)
+    samples: List[Sample] = []
+    tasks = set()
+
+    async def fire(scenario: LoadScenario, scheduled: float):
+        tracker.enter()
+        status, error = 0, None
+        try:
+            status = await send(scenario)
+        except asyncio.CancelledError:
+            error = "timeout"
+        except Exception as e:
+            error = type(e).__name__
+        finally:
+            tracker.leave()
+            samples.append(Sample(scenario.label, (loop.time() - scheduled) * 1000, status, error))
+
+    start = arrival = loop.time()
+    while True:
+        arrival += rng.expovariate(rate)
+        if arrival - start >= duration_s:
+            break
+        delay = arrival - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(fire(rng.choices(mix, weights)[0], arrival))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        _, pending = await asyncio.wait(set(tasks), timeout=drain_timeout_s)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    elapsed = max(loop.time() - start, duration_s)
+
+    step = {"rate": rate, "duration_s": duration_s, **summarize(samples, rate, elapsed),
+            "mean_concurrency": round(tracker.mean, 2), "peak_concurrency": tracker.peak}
+    by_label: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_label[sample.label].append(sample)
+    step["scenarios"] = {label: summarize(group, rate * _share(mix, label), elapsed)
+                         for label, group in sorted(by_label.items())}
+    return step
+
+
+def _share(mix: Sequence[LoadScenario], label: str) -> float:
+    total = sum(scenario.weight for scenario in mix)
+    return sum(scenario.weight for scenario in mix if scenario.label == label) / total if total else 0.0
+
+
+def find_knee(steps: List[dict], latency_factor: float = KNEE_LATENCY_FACTOR,
+              throughput_ratio: float = KNEE_THROUGHPUT_RATIO, error_rate: float = KNEE_ERROR_RATE) -> Optional[dict]:
+    """First step where latency, throughput or errors degrade; None if the panel kept up"""
+    if not steps:
+        return None
+    base_p99 = steps[0]["p99_ms"]
+    for index, step in enumerate(steps):
+        reasons = []
+        if index and base_p99 and step["p99_ms"] > latency_factor * base_p99:
+            reasons.append(f"p99 {step['p99_ms']:.0f}ms > {latency_factor:g}x {base_p99:.0f}ms")
+        if step["throughput_rps"] < throughput_ratio * step["offered_rps"]:
+            reasons.append(f"throughput {step['throughput_rps']:.1f}/{step['offered_rps']:.1f} rps")
+        if step["error_rate"] > error_rate:
+            reasons.append(f"error rate {step['error_rate']:.1%}")
+        if reasons:
+            healthy = steps[index - 1] if index else None
+            return {
+                "rate": step["rate"],
+                "concurrency": step["mean_concurrency"],
+                "reasons": reasons,
+                "last_healthy_rate": healthy["rate"] if healthy else None,
+                "last_healthy_concurrency": healthy["mean_concurrency"] if healthy else None
+            }
+    return None
+
+
+async def run_load_test(send: Send, mix: Sequence[LoadScenario], rates: Sequence[float], duration_s: float,
+                        stop_after_knee: bool = True, seed: int = 0, drain_timeout_s: float = 30.0) -> dict:
+    """Step through increasing arrival rates; stops once the knee is reached unless told otherwise"""
+    steps: List[dict] = []
+    for index, rate in enumerate(sorted(rates)):
+        print(f"🚦 {rate:g} req/s for {duration_s:g}s...")
+        steps.append(await run_open_loop(send, mix, rate, duration_s, seed + index, drain_timeout_s))
+        if stop_after_knee and find_knee(steps):
+            break
+    return {"steps": steps, "knee": find_knee(steps),
+            "mix": [{"label": s.label, "path": s.path, "params": s.params or {}, "weight": round(s.weight, 3)}
+                    for s in mix]}
+
+
+def print_load_report(report: dict):
+    print(f"\n🚦 Load Test (open loop)")
+    print(f"{'rate':>7} {'req':>6} {'tput/s':>8} {'p50':>8} {'p99':>8} {'p99.9':>8} {'errors':>7} {'conc':>6} {'peak':>5}")
+    for step in report["steps"]:
+        print(f"{step['rate']:>7g} {step['requests']:>6} {step['throughput_rps']:>8.1f} {step['p50_ms']:>8.0f} "
+              f"{step['p99_ms']:>8.0f} {step['p999_ms']:>8.0f} {step['error_rate']:>7.1%} "
+              f"{step['mean_concurrency']:>6.1f} {step['peak_concurrency']:>5}")
+    knee = report["knee"]
+    if knee:
+        print(f"📈 Latency knee at {knee['rate']:g} req/s (~{knee['concurrency']:.1f} concurrent): "
+              f"{'; '.join(knee['reasons'])}")
+        if knee["last_healthy_rate"] is not None:
+            print(f"   ✅ Last healthy step: {knee['last_healthy_rate']:g} req/s "
+                  f"(~{knee['last_healthy_concurrency']:.1f} concurrent)")
+    else:
+        print("✅ No knee within the tested rates")
+    last = report["steps"][-1] if report["steps"] else None
+    if last:
+        print(f"\n{'scenario':<28} {'req':>5} {'p50':>8} {'p99':>8} {'errors':>7}")
+        for label, stats in last["scenarios"].items():
+            print(f"{label:<28} {stats['requests']:>5} {stats['p50_ms']:>8.0f} {stats['p99_ms']:>8.0f} "
+                  f"{stats['error_rate']:>7.1%}")
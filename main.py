@@ -3,24 +3,42 @@ My FirstCare Opera Panel - FastAPI + Stardust API Integration
 Main application entry point
 """
 from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from contextlib import asynccontextmanager
+import logging
 import uvicorn
 import os
 
 from app.routes import auth, admin, ava4, kati, qube_vital, api
-from app.services.auth import get_current_user
+from app.services.auth import get_auth_context
+from app.services.http_client import upstream
+from app.services.logs import RequestIdMiddleware, configure_logging, shutdown_logging
+from app.services.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from app.services.tracing import ServerTimingMiddleware, TracedTemplates
 from app.models.auth import User
 
+configure_logging()
+logger = logging.getLogger("main")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the log writer and open the shared Stardust connection pool; drain both on shutdown"""
+    configure_logging()
+    await upstream.start()
+    yield
+    await upstream.close()
+    shutdown_logging()
+
 app = FastAPI(
     title="My FirstCare Opera Panel",
     description="Healthcare Admin Panel with Stardust API Integration",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Middleware
@@ -32,10 +50,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost: tags every log record of a request with its X-Request-ID
+app.add_middleware(RequestIdMiddleware)
 
 # Static files and templates
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
+templates = TracedTemplates(directory="app/templates")
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -55,47 +77,30 @@ app.include_router(master_data.router, tags=["Master Data API"])
 async def dashboard(request: Request):
     """Main dashboard page"""
     # Check if user is authenticated via session
-    print(f"DEBUG: Session contents: {dict(request.session)}")
-    print(f"DEBUG: Session cookies: {request.cookies}")
     token = request.session.get("access_token")
-    print(f"DEBUG: Session token exists: {token is not None}")
     if not token:
-        print("DEBUG: No token in session, redirecting to login")
+        logger.debug("No token in session, redirecting to login")
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
     
-    try:
-        from app.services.auth import auth_service
-        print(f"DEBUG: Attempting to get user profile with token: {token[:20]}...")
-        profile = await auth_service.get_user_profile(token)
-        print(f"DEBUG: Successfully got user profile: {profile.username}")
-        user = User(
-            id=profile.id or profile.username,  # Use username as fallback ID
-            username=profile.username,
-            email=profile.email,
-            full_name=profile.full_name,
-            role=profile.role,
-            profile_photo=profile.profile_photo,
-            phone=profile.phone,
-            permissions=profile.permissions or [],
-            system_access=profile.system_access
-        )
-        
-        # Language detection and localization
-        from app.utils import get_user_language, get_copyright_text, get_mfc_logo
-        language = get_user_language(request)
-        
-        return templates.TemplateResponse("dashboard.html", {
-            "request": request,
-            "user": user,
-            "page_title": "Dashboard",
-            "language": language,
-            "copyright_text": get_copyright_text(language),
-            "mfc_logo": get_mfc_logo(language)
-        })
-    except Exception as e:
-        print(f"DEBUG: Error getting user profile: {str(e)}")
+    auth = await get_auth_context(request)
+    if not auth.user:
+        logger.info("Could not resolve user from session, redirecting to login")
         request.session.clear()
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
+    user = auth.user
+    
+    # Language detection and localization
+    from app.utils import get_user_language, get_copyright_text, get_mfc_logo
+    language = get_user_language(request)
+    
+    return templates.TemplateResponse("dashboard.html", {
+        "request": request,
+        "user": user,
+        "page_title": "Dashboard",
+        "language": language,
+        "copyright_text": get_copyright_text(language),
+        "mfc_logo": get_mfc_logo(language)
+    })
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -106,9 +111,30 @@ async def login_page(request: Request):
     })
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "opera-panel"}
+async def health_check(request: Request):
+    """Health check endpoint; cache and upstream detail only for admin sessions"""
+    health = {"status": "healthy", "service": "opera-panel"}
+    if not (await get_auth_context(request)).is_admin:
+        return health
+    from app.services.cache import get_cache_stats
+    from app.services.stardust_api import stardust_api
+    return {
+        **health,
+        "caches": get_cache_stats(),
+        "upstream": {
+            "pool": upstream.stats(),
+            "single_flight": stardust_api.single_flight_stats(),
+            "envelopes": stardust_api.envelopes.stats(),
+            **stardust_api.resilience_stats()
+        }
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run(
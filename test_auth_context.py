@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Offline test for the request-scoped auth context (one /auth/me per request)
+"""
+import asyncio
+import time
+
+from fastapi import HTTPException
+from jose import jwt
+from starlette.requests import Request
+
+from app.models.auth import AuthContext, Token, UserProfile
+from app.services import auth as auth_module
+from app.services.auth import AuthService, get_auth_context, get_session_token, get_current_user_with_refresh, get_valid_token
+
+
+def make_request(session: dict) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "session": session})
+
+
+def test_single_resolution_per_request():
+    """User and token lookups in one request share a single profile fetch"""
+    calls = []
+
+    async def fake_profile(token):
+        calls.append(token)
+        return UserProfile(username="admin", role="superadmin")
+
+    original = auth_module.auth_service.get_user_profile
+    auth_module.auth_service.get_user_profile = fake_profile
+    try:
+        request = make_request({"access_token": "token-a"})
+
+        async def run():
+            user = await get_current_user_with_refresh(request)
+            token = await get_valid_token(request)
+            context = await get_auth_context(request)
+            return user, token, context
+
+        user, token, context = asyncio.run(run())
+    finally:
+        auth_module.auth_service.get_user_profile = original
+
+    assert user.username == "admin" and token == "token-a"
+    assert context.user is user
+    assert calls == ["token-a"], calls
+    print("✅ One profile lookup per request")
+
+
+def test_refresh_updates_session():
+    """An expired access token is refreshed once and stored in the session"""
+    calls = []
+
+    async def fake_profile(token):
+        calls.append(token)
+        if token == "expired":
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return UserProfile(username="admin", role="superadmin")
+
+    async def fake_refresh(refresh_token):
+        return Token(access_token="fresh", token_type="bearer", refresh_token="refresh-2")
+
+    service = auth_module.auth_service
+    original_profile, original_refresh = service.get_user_profile, service.refresh_token
+    service.get_user_profile, service.refresh_token = fake_profile, fake_refresh
+    try:
+        session = {"access_token": "expired", "refresh_token": "refresh-1"}
+        request = make_request(session)
+        token = asyncio.run(get_valid_token(request))
+    finally:
+        service.get_user_profile, service.refresh_token = original_profile, original_refresh
+
+    assert token == "fresh"
+    assert session == {"access_token": "fresh", "refresh_token": "refresh-2"}
+    assert calls == ["expired", "fresh"], calls
+    print("✅ Token refreshed once and session updated")
+
+
+def test_refresh_keeps_claims_profile():
+    """In local mode a refreshed token for the same user reuses the cached profile"""
+    def make_token(exp_offset):
+        claims = {"sub": "admin", "role": "admin", "exp": int(time.time()) + exp_offset}
+        return jwt.encode(claims, "test-secret", algorithm="HS256")
+
+    service = AuthService()
+    service.verification_key = "test-secret"
+    service.local_validation = True
+    fetches = []
+    current, expired, fresh = make_token(60), make_token(-60), make_token(120)
+
+    async def fake_fetch(token):
+        fetches.append(token)
+        return UserProfile(username="admin", role="admin")
+
+    async def fake_refresh(refresh_token):
+        return Token(access_token=fresh, token_type="bearer")
+
+    service._fetch_user_profile, service.refresh_token = fake_fetch, fake_refresh
+    original = auth_module.auth_service
+    auth_module.auth_service = service
+    try:
+        async def run():
+            await service.get_user_profile(current)
+            request = make_request({"access_token": expired, "refresh_token": "refresh-1"})
+            token = await get_valid_token(request)
+            service.invalidate_profile(token)  # logout still drops it
+            await service.get_user_profile(token)
+            return token
+
+        token = asyncio.run(run())
+    finally:
+        auth_module.auth_service = original
+
+    assert token == fresh
+    assert fetches == [current, fresh], fetches
+    print("✅ Refresh reuses the claims-keyed profile, logout drops it")
+
+
+def test_write_token_skips_profile_lookup():
+    """Write routes send the session token without resolving the profile"""
+    async def fail_profile(token):
+        raise AssertionError("profile looked up")
+
+    original = auth_module.auth_service.get_user_profile
+    auth_module.auth_service.get_user_profile = fail_profile
+    try:
+        assert get_session_token(make_request({"access_token": "token-a"})) == "token-a"
+        assert get_session_token(make_request({})) is None
+    finally:
+        auth_module.auth_service.get_user_profile = original
+
+    request = make_request({"access_token": "stale"})
+    request.state.auth = AuthContext(token="refreshed")
+    assert get_session_token(request) == "refreshed"
+    print("✅ Write routes reuse a resolved context or the raw session token")
+
+
+if __name__ == "__main__":
+    print("🔍 Testing request-scoped auth context")
+    print("=" * 60)
+    test_single_resolution_per_request()
+    test_refresh_updates_session()
+    test_refresh_keeps_claims_profile()
+    test_write_token_skips_profile_lookup()
+    print("=" * 60)
+    print("🎉 All auth context tests passed!")
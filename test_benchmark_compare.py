@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Offline test for the benchmark regression comparator
+"""
+import random
+
+from benchmark_compare import bootstrap_ci, compare_reports, mann_whitney_u, route_budgets
+
+
+def make_route(median_ms, calls=1.0, seed=1, n=50):
+    rng = random.Random(seed)
+    samples = [round(median_ms * rng.uniform(0.9, 1.1), 3) for _ in range(n)]
+    ordered = sorted(samples)
+    return {"samples_ms": samples, "p50_ms": ordered[n // 2], "p95_ms": ordered[int(n * 0.95)],
+            "p99_ms": ordered[-1], "upstream_calls_per_request": calls}
+
+
+def make_report(**routes):
+    return {"meta": {"dataset": {"hospitals": 1000}, "latency_ms": 0.0}, "routes": routes}
+
+
+def test_mann_whitney():
+    same = [1.0, 2.0, 3.0, 4.0, 5.0] * 10
+    effect, p = mann_whitney_u(same, list(same))
+    assert effect == 0.5 and p > 0.9
+    effect, p = mann_whitney_u(same, [v + 10 for v in same])
+    assert effect == 1.0 and p < 1e-6
+    print(f"✅ Mann-Whitney U separates shifted samples (p={p:.2e})")
+
+
+def test_bootstrap_ci_covers_shift():
+    base = make_route(10, seed=1)["samples_ms"]
+    slower = make_route(15, seed=2)["samples_ms"]
+    low, high = bootstrap_ci(base, slower, iterations=500)
+    assert 30 < low < 50 < high < 70
+    print(f"✅ Bootstrap CI for +50%: {low:+.1f}%..{high:+.1f}%")
+
+
+def test_regressions_and_budgets():
+    baseline = make_report(fast=make_route(10), steady=make_route(10), chatty=make_route(10, calls=1), old=make_route(1))
+    candidate = make_report(fast=make_route(20, seed=3), steady=make_route(10, seed=4),
+                            chatty=make_route(10, calls=2, seed=5), added=make_route(1))
+    result = compare_reports(baseline, candidate, {"routes": {"steady": {"p95_ms": 5}}}, bootstrap_iterations=500)
+    by_route = {r["route"]: r for r in result["routes"]}
+
+    assert not result["passed"]
+    assert by_route["fast"]["verdict"] == "FAIL" and by_route["fast"]["change_pct"] > 80
+    assert "p95_ms" in by_route["steady"]["failures"][0]
+    assert "upstream calls/request 1 -> 2" in by_route["chatty"]["failures"][0]
+    assert result["new_routes"] == ["added"] and result["missing_routes"] == ["old"]
+
+    unchanged = compare_reports(baseline, make_report(steady=make_route(10, seed=4)), bootstrap_iterations=200)
+    assert unchanged["passed"] and unchanged["routes"][0]["verdict"] == "unchanged"
+    print("✅ Slower routes, budget breaches and extra upstream calls fail the comparison")
+
+
+def test_budget_prefixes():
+    budgets = {"default": {"max_regression_pct": 20}, "routes": {"dropdown": {"p95_ms": 50},
+                                                                 "dropdown:provinces": {"p95_ms": 5}}}
+    assert route_budgets(budgets, "dropdown:provinces")["p95_ms"] == 5
+    assert route_budgets(budgets, "dropdown:districts")["p95_ms"] == 50
+    assert route_budgets(budgets, "dashboard")["max_regression_pct"] == 20
+    print("✅ Longest route prefix wins")
+
+
+if __name__ == "__main__":
+    print("📈 Testing benchmark comparator")
+    test_mann_whitney()
+    test_bootstrap_ci_covers_shift()
+    test_regressions_and_budgets()
+    test_budget_prefixes()
+    print("🎉 All comparator tests passed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Offline smoke test for the benchmark suite and the fake Stardust app
+"""
+import asyncio
+
+from benchmark_suite import BenchmarkHarness, percentile, run_benchmarks
+from fake_stardust import SyntheticData
+
+
+def test_synthetic_geography_shape():
+    data = SyntheticData(hospitals=50, patients=10, devices=5)
+    counts = data.counts()
+    assert (counts["provinces"], counts["districts"], counts["sub_districts"]) == (77, 928, 7255)
+    province_codes = {p["code"] for p in data.provinces}
+    assert all(d["province_code"] in province_codes for d in data.districts)
+    district_codes = {d["code"] for d in data.districts}
+    assert all(s["district_code"] in district_codes for s in data.sub_districts)
+    print(f"✅ Synthetic data: {counts}")
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50.5 and percentile(samples, 99) == 99.01 and percentile([], 50) == 0.0
+    print("✅ Percentiles interpolated")
+
+
+def test_run_reports_routes():
+    report = asyncio.run(run_benchmarks(hospitals=100, patients=10, devices=5, iterations=5, warmup=1,
+                                        alloc_iterations=1, only=["dropdown", "master_data_detail:districts"]))
+    routes = report["routes"]
+    assert set(routes) == {"dropdown:provinces", "dropdown:districts", "dropdown:sub-districts",
+                           "master_data_detail:districts"}
+    for name, route in routes.items():
+        assert route["statuses"] == {"200": 5}, (name, route["statuses"])
+        assert 0 < route["p50_ms"] <= route["p95_ms"] <= route["p99_ms"]
+        assert len(route["samples_ms"]) == 5 and route["alloc_peak_kib"] is not None
+    # Dropdowns are answered from the geography cache once warm
+    assert routes["dropdown:districts"]["upstream_calls_per_request"] == 0
+    assert routes["master_data_detail:districts"]["upstream_by_endpoint"] == {
+        "GET /admin/master-data/districts/{id}": 5}
+    print(f"✅ Benchmark run: {report['meta']['total_upstream_calls']} upstream calls")
+
+
+def test_harnesses_do_not_share_data():
+    """Each harness serves its own dataset, and the service is left as it was"""
+    from app.services.stardust_api import stardust_api
+
+    first = SyntheticData(hospitals=20, patients=0, devices=0, provinces=5)
+    second = SyntheticData(hospitals=40, patients=0, devices=0, provinces=7)
+    geography = stardust_api.geography
+
+    async def provinces(data):
+        async with BenchmarkHarness(data) as harness:
+            response = await harness.client.get("/api/master-data/provinces")
+            hospitals = await harness.client.get("/admin/master-data/hospitals")
+            return len(response.json()["data"]), hospitals.status_code, len(harness.upstream_calls)
+
+    one, two = asyncio.run(provinces(first)), asyncio.run(provinces(second))
+    assert one[0] == 5 and two[0] == 7, (one, two)
+    assert one[2] and two[2], "both harnesses loaded from their own fake Stardust"
+    assert stardust_api.geography is geography
+    print("✅ Back-to-back harnesses serve their own datasets")
+
+
+if __name__ == "__main__":
+    print("📊 Testing benchmark suite")
+    test_synthetic_geography_shape()
+    test_percentile()
+    test_run_reports_routes()
+    test_harnesses_do_not_share_data()
+    print("🎉 All benchmark suite tests passed")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Offline test for incremental (updated_at) master data sync
+"""
+import asyncio
+
+from fastapi import HTTPException
+
+from app.services.envelopes import Listing
+from app.services.hospitals import HospitalSnapshot
+from app.services.sync import DeltaSync
+
+
+class FakeAPI:
+    """Upstream collection that answers date_from queries like Stardust (by day)"""
+
+    def __init__(self, count=200):
+        self.records = {f"h{i}": {"_id": f"h{i}", "code": i, "name": {"en": f"Hospital {i}"},
+                                  "updated_at": "2025-01-01T00:00:00"} for i in range(count)}
+        self.requests = []
+
+    async def fetch_all_master_data(self, token, data_type, date_from=None):
+        self.requests.append(date_from)
+        return [dict(r) for r in self.records.values()
+                if date_from is None or r["updated_at"][:10] >= date_from]
+
+    def touch(self, record_id, day, **changes):
+        self.records[record_id] = {**self.records.get(record_id, {"_id": record_id}),
+                                   **changes, "updated_at": f"2025-01-{day:02d}T12:00:00"}
+
+
+def test_delta_fetches_only_changes():
+    """After the first full sync, refreshes download only changed records"""
+    api = FakeAPI()
+    sync = DeltaSync(api, "hospitals")
+
+    async def run():
+        assert await sync.sync("token")
+        api.touch("h5", 2, code=5005)
+        api.touch("h999", 2, code=999)
+        assert await sync.sync("token")
+        assert not await sync.sync("token")  # same-day re-read, nothing new
+
+    asyncio.run(run())
+    assert api.requests == [None, "2025-01-01", "2025-01-02"], api.requests
+    records = {r["_id"]: r for r in sync.values()}
+    assert len(records) == 201 and records["h5"]["code"] == 5005
+    assert sync.high_water_mark == "2025-01-02T12:00:00"
+    # Day-granular date_from re-reads day 1 once; afterwards only the 2 changed records
+    assert sync.stats()["records_fetched"] == 200 + 201 + 2
+    print(f"✅ Delta sync: {sync.stats()}")
+
+
+def test_full_reconciliation_drops_hard_deletes():
+    """The periodic full sync removes records deleted upstream"""
+    api = FakeAPI(10)
+    sync = DeltaSync(api, "hospitals", full_sync_interval=0)
+
+    async def run():
+        await sync.sync("token")
+        del api.records["h3"]
+        assert await sync.sync("token")
+
+    asyncio.run(run())
+    assert "h3" not in {r["_id"] for r in sync.values()}
+    assert sync.full_syncs == 2 and sync.delta_syncs == 0
+    print("✅ Full reconciliation removes hard deletes")
+
+
+def test_snapshot_kept_when_nothing_changed():
+    """An empty delta keeps the existing snapshot object (no index rebuild)"""
+    api = FakeAPI()
+    snapshot = HospitalSnapshot(api)
+
+    async def run():
+        first = await snapshot.get("token")
+        snapshot.invalidate()
+        assert (await snapshot.get("token")) is first and snapshot.refreshes == 2
+
+        # A write through the panel is visible on the very next read
+        api.touch("h1", 3, code=1001)
+        snapshot.invalidate()
+        updated = await snapshot.get("token")
+        assert updated is not first and updated.get("h1")["code"] == 1001
+        assert updated.records[0]["_id"] == "h1"  # newest first
+        assert snapshot._refresh_task is None
+
+    asyncio.run(run())
+    print(f"✅ Snapshot rebuilt only on change: {snapshot.stats()['sync']}")
+
+
+def test_write_during_refresh_waits_for_newer_load():
+    """A write that lands while a refresh is loading is not hidden by that refresh"""
+    api = FakeAPI(10)
+    snapshot = HospitalSnapshot(api)
+    loading = asyncio.Event()
+    release = asyncio.Event()
+    fetch = api.fetch_all_master_data
+
+    async def slow_fetch(token, data_type, date_from=None):
+        records = await fetch(token, data_type, date_from)
+        if not release.is_set():
+            loading.set()
+            await release.wait()
+        return records
+
+    api.fetch_all_master_data = slow_fetch
+
+    async def run():
+        release.set()
+        await snapshot.get("token")
+        release.clear()
+        snapshot._expires_at = 0.0
+        await snapshot.get("token")  # stale: a background refresh starts reading
+        await loading.wait()
+
+        api.touch("h2", 2, code=2002)
+        snapshot.invalidate()
+        reader = asyncio.ensure_future(snapshot.get("token"))
+        await asyncio.sleep(0)
+        release.set()
+        return await reader
+
+    fresh = asyncio.run(run())
+    assert fresh.get("h2")["code"] == 2002
+    print("✅ Reads after a write wait for a load that started after it")
+
+
+def test_other_users_checked_against_shared_snapshot():
+    """The shared snapshot is only served to users who see the same collection"""
+    api = FakeAPI(20)
+    views = {"admin": 20, "operator": 20, "scoped": 5}
+    fetched_with = []
+    fetch = api.fetch_all_master_data
+
+    async def fetch_as(token, data_type, date_from=None):
+        fetched_with.append(token)
+        return (await fetch(token, data_type, date_from))[:views[token]]
+
+    async def list_master_data(token, data_type, skip, limit):
+        if token not in views:
+            raise HTTPException(status_code=403, detail="Access forbidden")
+        return Listing([], views[token], {})
+
+    api.fetch_all_master_data = fetch_as
+    api.list_master_data = list_master_data
+    snapshot = HospitalSnapshot(api)
+
+    async def run():
+        first = await snapshot.get("admin")
+        assert (await snapshot.get("operator")) is first and (await snapshot.get("admin")) is first
+        try:
+            await snapshot.get("stranger")
+            assert False, "a user Stardust refuses must not be served from memory"
+        except HTTPException as e:
+            assert e.status_code == 403
+        scoped = await snapshot.get("scoped")
+        assert len(scoped.records) == 5
+        return first
+
+    first = asyncio.run(run())
+    assert len(first.records) == 20 and fetched_with == ["admin", "scoped"], fetched_with
+    assert snapshot.stats()["scope_mismatches"] == 1
+    print("✅ Users are checked against the shared snapshot before it is served to them")
+
+
+if __name__ == "__main__":
+    print("🔄 Testing master data delta sync")
+    test_delta_fetches_only_changes()
+    test_full_reconciliation_drops_hard_deletes()
+    test_snapshot_kept_when_nothing_changed()
+    test_write_during_refresh_waits_for_newer_load()
+    test_other_users_checked_against_shared_snapshot()
+    print("🎉 All delta sync tests passed")
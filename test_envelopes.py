@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Offline test for Stardust response envelope decoding
+"""
+import asyncio
+
+from app.services.envelopes import EnvelopeDecoder
+from app.services.stardust_api import StardustAPIService
+
+
+def test_declared_list_and_record_shapes():
+    decoder = EnvelopeDecoder()
+    page = decoder.listing("/admin/master-data/hospitals",
+                           {"success": True, "data": {"data": [{"code": 1}], "total": 40, "skip": 0, "limit": 1}})
+    assert page.items == [{"code": 1}] and page.total == 40 and page.meta == {"skip": 0, "limit": 1}
+
+    raw = decoder.listing("/admin/hospitals-raw-documents",
+                          {"data": {"raw_documents": [{"_id": "h1"}], "field_analysis": {"fields": 3}}})
+    assert raw.items[0]["_id"] == "h1" and raw.meta["field_analysis"] == {"fields": 3}
+
+    record = {"_id": "d1", "code": 1001}
+    assert decoder.record("/admin/master-data/districts/{id}", {"success": True, "data": {"district": record}}) is record
+    assert decoder.record("/admin/master-data/districts/{id}", {"success": False, "data": {}}) is None
+    assert decoder.learned == 0
+    print("✅ Declared shapes decode with direct lookups")
+
+
+def test_shapes_are_learned_once():
+    decoder = EnvelopeDecoder()
+    nested = {"data": {"hospital_types": [{"code": "1"}], "total": 1}}
+    assert decoder.listing("/admin/master-data/hospital_types", nested).items == [{"code": "1"}]
+    assert decoder.listing("/admin/master-data/hospital_types", nested).total == 1
+    assert decoder.learned == 1
+    assert decoder.stats()["list_shapes"]["/admin/master-data/hospital_types"] == "data/hospital_types"
+
+    assert decoder.listing("/stats/unknown", {"results": [{"a": 1}], "total": 5}).total == 5
+    assert decoder.listing("/stats/unknown", [{"a": 1}]).items == [{"a": 1}]  # shape changed: relearned
+    assert decoder.listing("/stats/empty", {"message": "nothing"}) == ([], 0, {})
+
+    single = {"data": {"record": {"_id": "x"}}}
+    assert decoder.record("/admin/master-data/widgets/{id}", single, "widget") == {"_id": "x"}
+    flat = {"data": {"_id": "y", "code": 2}}
+    assert decoder.record("/admin/master-data/gadgets/{id}", flat, "gadget") is flat["data"]
+    assert decoder.stats()["decoded"] == 7
+    print(f"✅ Unknown shapes learned ({decoder.learned} learned)")
+
+
+def test_service_uses_decoder():
+    service = StardustAPIService()
+    calls = []
+
+    async def fake_request(method, endpoint, token, data=None, params=None):
+        calls.append(endpoint)
+        if endpoint.startswith("/admin/master-data/hospital_types"):
+            return {"success": True, "data": {"data": [{"code": "1"}, {"code": "2"}], "total": 2}}
+        if endpoint == "/admin/hospitals-raw-documents":
+            return {"success": True, "data": {"raw_documents": [{"_id": params["hospital_id"]}],
+                                              "metadata": {"total": 1}}}
+        return {"success": True, "data": {"hospital": {"_id": endpoint.rsplit("/", 1)[-1]}}}
+
+    service._make_request = fake_request
+
+    async def scenario():
+        types = await service.list_hospital_types("t")
+        record = await service.get_master_data_item("t", "hospitals", "h7")
+        raw = await service.get_hospital_raw_document("t", "h7")
+        return types, record, raw
+
+    types, record, raw = asyncio.run(scenario())
+    assert [t["code"] for t in types] == ["1", "2"]
+    assert record == {"_id": "h7"}
+    assert raw == {"raw_document": {"_id": "h7"}, "field_analysis": {}, "metadata": {"total": 1}}
+    assert calls[0] == "/admin/master-data/hospital_types"
+    print("✅ Service returns decoded items, records and raw documents")
+
+
+if __name__ == "__main__":
+    print("📦 Testing envelope decoding")
+    test_declared_list_and_record_shapes()
+    test_shapes_are_learned_once()
+    test_service_uses_decoder()
+    print("🎉 All envelope tests passed")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Offline test for the in-process geography cache (provinces/districts/sub-districts)
+"""
+import asyncio
+import re
+
+from app.services.geography import GeographyCache, GeographyIndex, filter_locations
+from app.services.stardust_api import StardustAPIService, stardust_api
+from benchmark_suite import BenchmarkHarness
+from fake_stardust import SyntheticData
+
+PROVINCES = [
+    {"code": 10, "en_name": "Bangkok", "th_name": "กรุงเทพมหานคร", "is_active": True},
+    {"code": 11, "en_name": "Samut Prakan", "th_name": "สมุทรปราการ", "is_active": True},
+]
+DISTRICTS = [
+    {"code": 1001, "province_code": 10, "en_name": "Phra Nakhon", "th_name": "พระนคร", "is_active": True},
+    {"code": 1002, "province_code": 10, "en_name": "Dusit", "th_name": "ดุสิต", "is_active": False},
+    {"code": 1101, "province_code": "11", "en_name": "Mueang Samut Prakan", "th_name": "เมืองสมุทรปราการ", "is_active": True},
+]
+SUB_DISTRICTS = [
+    {"code": 100101, "district_code": 1001, "province_code": 10, "en_name": "Phra Borom Maha Ratchawang", "th_name": "พระบรมมหาราชวัง"},
+    {"code": 110101, "district_code": "1101", "province_code": 11, "en_name": "Pak Nam", "th_name": "ปากน้ำ"},
+]
+
+
+class FakeAPI:
+    """Stands in for StardustAPIService.fetch_all_master_data"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def fetch_all_master_data(self, token, data_type):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("Stardust unavailable")
+        return {"provinces": PROVINCES, "districts": DISTRICTS, "sub-districts": SUB_DISTRICTS}[data_type]
+
+
+def test_index_lookups():
+    """Codes resolve regardless of int/str representation"""
+    index = GeographyIndex(PROVINCES, DISTRICTS, SUB_DISTRICTS)
+    assert index.get_province("10")["name"] == {"en": "Bangkok", "th": "กรุงเทพมหานคร"}
+    assert index.get_district(1101)["en_name"] == "Mueang Samut Prakan"
+    assert [d["code"] for d in index.districts_in("11")] == [1101]
+    assert [s["code"] for s in index.sub_districts_in(1101, 11)] == [110101]
+    assert index.sub_districts_in(1101, 10) == []
+    print("✅ Geography index lookups")
+
+
+def test_location_chain():
+    """Sub-district resolves its district and province; direct codes are the fallback"""
+    index = GeographyIndex(PROVINCES, DISTRICTS, SUB_DISTRICTS)
+    chain = index.resolve_chain(sub_district_code="110101")
+    assert chain["district"]["code"] == 1101 and chain["province"]["code"] == 11
+    chain = index.resolve_chain(sub_district_code=999999, district_code=1001)
+    assert "sub_district" not in chain and chain["province"]["code"] == 10
+    assert index.resolve_chain(province_code=11) == {"province": index.get_province(11)}
+    print("✅ Location chain lookups")
+
+
+def test_dropdown_filters():
+    """Inactive records are hidden by default, search matches Thai and English"""
+    index = GeographyIndex(PROVINCES, DISTRICTS, SUB_DISTRICTS)
+    assert [d["code"] for d in filter_locations(index.districts_in(10))] == [1001]
+    assert len(filter_locations(index.districts_in(10), include_inactive=True)) == 2
+    assert [p["code"] for p in filter_locations(index.provinces, search="สมุทร")] == [11]
+    assert [p["code"] for p in filter_locations(index.provinces, search="bang")] == [10]
+    print("✅ Dropdown filters")
+
+
+def test_cache_serves_stale_on_error():
+    """A failed background refresh keeps serving the previous snapshot"""
+    api = FakeAPI()
+    cache = GeographyCache(api, ttl=3600)
+
+    async def run():
+        first = await cache.get("token")
+        second = await cache.get("token")
+        assert first is second and api.calls == 3
+
+        api.fail = True
+        cache._expires_at = 0.0  # past its TTL
+        stale = await cache.get("token")
+        await cache._refresh_task
+        assert stale is first
+        assert (await cache.get("token")) is first
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert stats["refresh_errors"] == 1 and stats["stale_served"] >= 1, stats
+    print(f"✅ Stale data served on refresh error: {stats}")
+
+
+def test_write_visible_on_next_read():
+    """After a geography write through the service, the next read includes it"""
+    service = StardustAPIService()
+    districts = [dict(d, _id=f"d{d['code']}", updated_at="2025-01-01T00:00:00") for d in DISTRICTS]
+    collections = {"provinces": PROVINCES, "districts": districts, "sub-districts": SUB_DISTRICTS}
+
+    async def fake_iter_all(token, data_type, date_from=None):
+        for record in collections[data_type]:
+            if date_from is None or record.get("updated_at", "")[:10] >= date_from:
+                yield record
+
+    async def fake_make_request(method, endpoint, token, data=None, params=None):
+        districts[1] = dict(districts[1], is_active=True, updated_at="2025-01-02T00:00:00")
+        return {"success": True}
+
+    service.iter_all_master_data = fake_iter_all
+    service._make_request = fake_make_request
+
+    async def run():
+        before = filter_locations((await service.geography.get("token")).districts_in(10))
+        await service.update_master_data("token", "districts", "d1002", {"is_active": True})
+        after = filter_locations((await service.geography.get("token")).districts_in(10))
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert [d["code"] for d in before] == [1001] and [d["code"] for d in after] == [1001, 1002]
+    generation = service.geography._generation
+    service._invalidate_snapshots("sub_districts")  # Stardust's collection name
+    assert service.geography._generation == generation + 1
+    print("✅ Geography writes are visible on the next read")
+
+
+def test_list_page_dropdowns_hide_inactive():
+    """The province filter on list pages offers the same provinces as the dropdown API"""
+    data = SyntheticData(hospitals=0, patients=0, devices=0)
+    data.provinces[0]["is_active"] = False
+    data.provinces[1]["is_deleted"] = True
+    # Earlier tests may have filled the panel's geography cache with another dataset
+    stardust_api.reset_snapshots()
+
+    async def run():
+        async with BenchmarkHarness(data) as harness:
+            page = await harness.client.get("/admin/master-data/districts")
+            api = await harness.client.get("/api/master-data/provinces")
+            return page.text, api.json()["data"]
+
+    html, api_provinces = asyncio.run(run())
+    select = html.split('id="province_select"', 1)[1].split("</select>", 1)[0]
+    offered = [int(code) for code in re.findall(r'<option value="(\d+)"', select)]
+    assert sorted(offered) == sorted(p["code"] for p in api_provinces) == [p["code"] for p in data.provinces[2:]]
+    print(f"✅ Province filter offers {len(offered)} active provinces")
+
+
+if __name__ == "__main__":
+    print("🔍 Testing geography cache")
+    print("=" * 60)
+    test_index_lookups()
+    test_location_chain()
+    test_dropdown_filters()
+    test_cache_serves_stale_on_error()
+    test_write_visible_on_next_read()
+    test_list_page_dropdowns_hide_inactive()
+    print("=" * 60)
+    print("🎉 All geography cache tests passed!")
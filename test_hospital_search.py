@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Offline test for the bilingual n-gram hospital search index
+"""
+import time
+
+from app.services.hospitals import HospitalIndex
+from app.services.pagination import record_filter
+
+HOSPITALS = [
+    {"_id": "h1", "code": 11001, "name": [{"code": "th", "name": "โรงพยาบาลศิริราช"}, {"code": "en", "name": "Siriraj Hospital"}],
+     "address": "2 ถนนวังหลัง แขวงศิริราช เขตบางกอกน้อย", "province_code": 10, "is_active": True,
+     "updated_at": "2025-01-01T00:00:00"},
+    {"_id": "h2", "code": 11002, "name": {"th": "โรงพยาบาลรามาธิบดี", "en": "Ramathibodi Hospital"},
+     "address": "270 ถนนพระรามที่ 6", "province_code": 10, "is_active": True,
+     "updated_at": "2025-01-02T00:00:00"},
+    {"_id": "h3", "code": 12001, "en_name": "Nonthaburi Hospital", "th_name": "โรงพยาบาลพระนั่งเกล้า",
+     "address_details": {"road": "ถนนติวานนท์", "sub_district": "บางกระสอ"}, "province_code": 12,
+     "is_active": False, "updated_at": "2025-01-03T00:00:00"},
+    {"_id": "h4", "code": 10999, "name": {"th": "คลินิกศิริราชปิยมหาราชการุณย์", "en": "Siriraj Piyamaharajkarun"},
+     "province_code": 10, "is_active": True, "updated_at": "2025-01-04T00:00:00"},
+]
+
+
+def ids(records):
+    return [r["_id"] for r in records]
+
+
+def test_thai_search_without_spaces():
+    """Thai substrings match inside unsegmented words"""
+    index = HospitalIndex(HOSPITALS)
+    assert ids(index.search("ศิริราช").records) == ["h4", "h1"]  # equal scores -> newest first
+    assert ids(index.search("รามาธิบดี").records) == ["h2"]
+    assert ids(index.search("ติวานนท์").records) == ["h3"]  # structured address
+    print("✅ Thai search")
+
+
+def test_english_search_and_ranking():
+    """Name matches outrank address matches; prefixes outrank substrings"""
+    index = HospitalIndex(HOSPITALS)
+    assert ids(index.search("siriraj hospital").records) == ["h1"]
+    assert ids(index.search("SIRIRAJ").records) == ["h4", "h1"]
+    assert ids(index.search("hospital rama").records) == ["h2"]
+    # Address-only matches tie and fall back to newest first
+    assert ids(index.search("ถนน").records) == ["h3", "h2", "h1"]
+    # A name match beats a newer record that only mentions the term in its address
+    ranked = HospitalIndex([
+        {"_id": "old", "name": {"en": "Bangkok Hospital"}, "updated_at": "2024-01-01"},
+        {"_id": "new", "name": {"en": "Chonburi Clinic"}, "address": "near Bangkok", "updated_at": "2025-01-01"},
+    ]).search("bangkok")
+    assert ids(ranked.records) == ["old", "new"]
+    assert ids(index.search("เกล้า").records) == ["h3"]
+    assert ids(index.search("11002").records) == ["h2"]
+    assert index.search("xyz").records == []
+    print("✅ English search and ranking")
+
+
+def test_search_with_filters_and_paging():
+    index = HospitalIndex(HOSPITALS)
+    page = index.search("โรงพยาบาล", record_filter(is_active=True), limit=1)
+    assert page.total == 2 and len(page.records) == 1 and page.next_cursor
+    second = index.search("โรงพยาบาล", record_filter(is_active=True), cursor=page.next_cursor, limit=1)
+    assert second.next_cursor is None and set(ids(page.records + second.records)) == {"h1", "h2"}
+    print("✅ Search honours filters and pages by cursor")
+
+
+def test_search_latency():
+    """Searching thousands of hospitals stays in the low milliseconds"""
+    hospitals = [{"_id": f"g{i}", "code": i,
+                  "name": {"th": f"โรงพยาบาลส่งเสริมสุขภาพตำบลบ้าน{i}", "en": f"Health Promoting Hospital {i}"},
+                  "address": f"{i} หมู่ {i % 12} ถนนสุขุมวิท", "updated_at": "2025-01-01"} for i in range(10000)]
+    index = HospitalIndex(hospitals)
+    index.text_index
+    start = time.perf_counter()
+    page = index.search("บ้าน9999")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert ids(page.records)[0] == "g9999"
+    assert elapsed_ms < 200, elapsed_ms
+    print(f"✅ Thai search over 10000 hospitals in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    print("🔎 Testing hospital search index")
+    test_thai_search_without_spaces()
+    test_english_search_and_ranking()
+    test_search_with_filters_and_paging()
+    test_search_latency()
+    print("🎉 All hospital search tests passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Offline test for the in-memory hospital snapshot (sort, filter, paginate)
+"""
+import asyncio
+
+from app.services.hospitals import HospitalIndex, HospitalSnapshot
+from app.services.pagination import record_filter
+
+HOSPITALS = [
+    {"_id": f"h{i}", "code": 1000 + i,
+     "name": [{"code": "th", "name": f"โรงพยาบาล {i}"}, {"code": "en", "name": f"Hospital {i}"}],
+     "province_code": 10 if i % 2 else 11, "district_code": 1001 if i % 4 == 1 else 1002,
+     "sub_district_code": 100101, "is_active": i % 3 != 0,
+     "updated_at": f"2025-01-{(i % 28) + 1:02d}T00:00:00", "created_at": "2024-01-01T00:00:00"}
+    for i in range(1500)
+]
+
+
+def query(index, skip=0, limit=25, **filters):
+    """Filter and page a snapshot the way the list route does"""
+    keyset = index.keyset_for(filters.get("province_code"), filters.get("district_code"),
+                              filters.get("sub_district_code"))
+    return keyset.page(None, limit, record_filter(**filters), skip=skip)
+
+
+class FakeAPI:
+    def __init__(self):
+        self.calls = 0
+
+    async def fetch_all_master_data(self, token, data_type):
+        self.calls += 1
+        assert data_type == "hospitals"
+        return HOSPITALS
+
+
+def test_no_record_cap_and_newest_first():
+    """Every hospital is pageable and pages come back newest first"""
+    index = HospitalIndex(HOSPITALS)
+    page, total, _ = query(index, skip=1490, limit=25)
+    assert total == 1500 and len(page) == 10
+    first_page, _, _ = query(index, limit=25)
+    dates = [r["updated_at"] for r in first_page]
+    assert dates == sorted(dates, reverse=True)
+    print(f"✅ {total} hospitals pageable, newest first")
+
+
+def test_filters():
+    """Location, status, date and search filters match the list page semantics"""
+    index = HospitalIndex(HOSPITALS)
+    page, total, _ = query(index, province_code="10", is_active=True, limit=2000)
+    assert total == len([h for h in HOSPITALS if h["province_code"] == 10 and h["is_active"]])
+    assert all(r["province_code"] == 10 and r["is_active"] for r in page)
+
+    _, total, _ = query(index, district_code=1001, limit=2000)
+    assert total == len([h for h in HOSPITALS if h["district_code"] == 1001])
+
+    _, total, _ = query(index, date_from="2025-01-28", limit=2000)
+    assert total == len([h for h in HOSPITALS if h["updated_at"] >= "2025-01-28"])
+
+    page, total, _ = query(index, search="hospital 1499")
+    assert total == 1 and page[0]["_id"] == "h1499"
+    _, total, _ = query(index, search="โรงพยาบาล 149")
+    assert total == 11
+    assert index.get("h42")["code"] == 1042
+    print("✅ Snapshot filters")
+
+
+def test_snapshot_loads_once():
+    """Repeated page requests are served from memory"""
+    api = FakeAPI()
+    snapshot = HospitalSnapshot(api)
+
+    async def run():
+        for page in range(5):
+            index = await snapshot.get("token")
+            query(index, skip=page * 25, limit=25)
+
+    asyncio.run(run())
+    assert api.calls == 1
+    print(f"✅ 5 page views -> 1 upstream sweep: {snapshot.stats()}")
+
+
+if __name__ == "__main__":
+    print("🏥 Testing hospital snapshot")
+    test_no_record_cap_and_newest_first()
+    test_filters()
+    test_snapshot_loads_once()
+    print("🎉 All hospital snapshot tests passed")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Offline test for the shared Stardust connection pool (reuse and lifecycle)
+"""
+import asyncio
+
+from app.services.http_client import UpstreamClient
+
+
+async def handle(reader, writer):
+    """Minimal keep-alive HTTP/1.1 server answering every request with a small JSON body"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 12\r\n\r\n{\"ok\": true}")
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+def test_sequential_requests_reuse_connection():
+    """Back-to-back requests go over one pooled keep-alive connection"""
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        upstream = UpstreamClient()
+        try:
+            await upstream.start()
+            for _ in range(5):
+                response = await upstream.get(f"http://127.0.0.1:{port}/health")
+                assert response.json() == {"ok": True}
+            return upstream.stats()
+        finally:
+            await upstream.close()
+            server.close()
+            await server.wait_closed()
+
+    stats = asyncio.run(run())
+    assert stats["requests"] == 5 and stats["new_connections"] == 1, stats
+    assert stats["reuse_rate"] == 0.8, stats
+    print(f"✅ 5 requests over 1 connection: {stats}")
+
+
+def test_close_and_reopen():
+    """close() drains the pool; the next request lazily opens a new one"""
+
+    async def run():
+        upstream = UpstreamClient()
+        first = upstream.client
+        await upstream.close()
+        assert first.is_closed
+        second = upstream.client
+        assert second is not first and not second.is_closed
+        await upstream.close()
+
+    asyncio.run(run())
+    print("✅ Pool closes on shutdown and reopens lazily")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing shared Stardust connection pool")
+    test_sequential_requests_reuse_connection()
+    test_close_and_reopen()
+    print("🎉 All connection pool tests passed")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Offline test for the pluggable JSON codec
+"""
+import json
+
+from app.services import codec
+from app.services.codec import FastJSONResponse, _orjson_dumps, _orjson_loads, _std_dumps, _std_loads
+
+PAYLOAD = {"success": True, "data": {"data": [{"_id": "h1", "code": 10001, "is_active": True, "location": [13.75, 100.5],
+                                               "name": [{"code": "th", "name": "โรงพยาบาลศูนย์"}]}], "total": 1}}
+
+
+def test_codecs_agree():
+    raw = _std_dumps(PAYLOAD)
+    assert "โรงพยาบาล".encode("utf-8") in raw  # not \u-escaped
+    assert _std_loads(raw) == PAYLOAD
+    if codec.orjson is not None:
+        assert _orjson_dumps(PAYLOAD) == raw
+        assert _orjson_loads(raw) == PAYLOAD
+    print(f"✅ json and orjson agree (active: {codec.CODEC})")
+
+
+def test_fallbacks():
+    huge = {"id": 2 ** 70}
+    assert codec.loads(json.dumps(huge)) == huge
+    assert codec.loads(codec.dumps(huge)) == huge
+    try:
+        codec.loads(b"{not json")
+    except json.JSONDecodeError:
+        pass
+    else:
+        raise AssertionError("malformed JSON must raise JSONDecodeError")
+
+    original = codec.JSON_CODEC
+    try:
+        codec.JSON_CODEC = "json"
+        assert codec._select() == "json"
+    finally:
+        codec.JSON_CODEC = original
+    print("✅ Oversized integers and JSON_CODEC=json fall back to the standard library")
+
+
+def test_fast_response():
+    response = FastJSONResponse(PAYLOAD)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == PAYLOAD
+    assert int(response.headers["content-length"]) == len(response.body)
+    print("✅ FastJSONResponse renders with the active codec")
+
+
+if __name__ == "__main__":
+    print("📦 Testing JSON codec")
+    test_codecs_agree()
+    test_fallbacks()
+    test_fast_response()
+    print("🎉 All JSON codec tests passed")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Offline test for keyset (cursor) pagination over master data snapshots
+"""
+import asyncio
+
+from fastapi import HTTPException
+
+from app.services.pagination import KeysetIndex, code_order_key, record_filter, updated_key
+from app.services.stardust_api import StardustAPIService
+from benchmark_suite import BenchmarkHarness
+from fake_stardust import SyntheticData
+
+
+def make_records(count, day=1):
+    return [{"_id": f"r{i:05d}", "code": i, "name": {"en": f"Record {i}", "th": f"รายการ {i}"},
+             "is_active": i % 2 == 0, "updated_at": f"2025-01-{day:02d}T00:{i // 60 % 60:02d}:{i % 60:02d}"}
+            for i in range(count)]
+
+
+def walk(keyset, limit, predicate=None):
+    """Follow next_cursor from the first page to the last"""
+    seen, cursor = [], None
+    while True:
+        page = keyset.page(cursor, limit, predicate)
+        seen.extend(page.records)
+        if not page.next_cursor:
+            return seen
+        cursor = page.next_cursor
+
+
+def test_walk_covers_every_record_once():
+    """Following cursors visits each record exactly once, in order"""
+    records = make_records(1000)
+    keyset = KeysetIndex(records, updated_key, descending=True)
+    seen = walk(keyset, 37)
+    assert [r["_id"] for r in seen] == [r["_id"] for r in keyset.records]
+
+    active = walk(keyset, 37, record_filter(is_active=True))
+    assert len(active) == 500 and all(r["is_active"] for r in active)
+    print(f"✅ Walked {len(seen)} records by cursor ({len(active)} with a filter)")
+
+
+def test_paging_stable_while_records_change():
+    """New records inserted ahead of the cursor don't shift or repeat later pages"""
+    records = make_records(100)
+    first = KeysetIndex(records, updated_key, descending=True).page(None, 10)
+
+    # A refresh brings in newer records and drops one already seen
+    changed = make_records(20, day=2) + [r for r in records if r["_id"] != first.records[0]["_id"]]
+    second = KeysetIndex(changed, updated_key, descending=True).page(first.next_cursor, 10)
+
+    expected = KeysetIndex(records, updated_key, descending=True).records[10:20]
+    assert [r["_id"] for r in second.records] == [r["_id"] for r in expected]
+    print("✅ Cursor pages stay stable across snapshot refreshes")
+
+
+def test_code_order():
+    """Geography lists page by numeric code"""
+    records = [{"code": c} for c in (100, 9, "10", 11, 2)]
+    keyset = KeysetIndex(records, code_order_key)
+    page = keyset.page(None, 2)
+    assert [r["code"] for r in page.records] == [2, 9]
+    assert [r["code"] for r in keyset.page(page.next_cursor, 10).records] == ["10", 11, 100]
+    print("✅ Code-ordered keyset")
+
+
+def test_invalid_cursor_rejected():
+    keyset = KeysetIndex(make_records(5), updated_key, descending=True)
+    # Garbage, a JSON object, and a code-ordered cursor used on an updated_at list
+    for cursor in ("not-a-cursor!", "e30", "WzAsMSwiIl0"):
+        try:
+            keyset.page(cursor, 10)
+            assert False, f"expected 400 for {cursor}"
+        except HTTPException as e:
+            assert e.status_code == 400
+    print("✅ Invalid cursors rejected with 400")
+
+
+def test_service_serves_pages_from_snapshot():
+    """Deep pages of any master data type cost no extra upstream calls"""
+    service = StardustAPIService()
+    calls = []
+
+    async def fake_fetch_all(token, data_type):
+        calls.append(data_type)
+        return make_records(500)
+
+    service.fetch_all_master_data = fake_fetch_all
+
+    async def fake_iter_all(token, data_type):
+        for record in await fake_fetch_all(token, data_type):
+            yield record
+
+    service.iter_all_master_data = fake_iter_all
+
+    async def run():
+        cursor = None
+        for _ in range(10):
+            page = await service.get_master_data_page("token", "departments", cursor=cursor, limit=25)
+            cursor = page.next_cursor
+        return page
+
+    page = asyncio.run(run())
+    assert calls == ["departments"], calls
+    assert page.total == 500 and len(page.records) == 25
+    print("✅ 10 cursor pages -> 1 upstream sweep")
+
+
+def test_write_visible_on_next_page():
+    """Master data snapshots reload before the read that follows a write"""
+    service = StardustAPIService()
+    records = make_records(50)
+
+    async def fake_iter_all(token, data_type, date_from=None):
+        for record in records:
+            if date_from is None or record["updated_at"][:10] >= date_from:
+                yield record
+
+    async def fake_make_request(method, endpoint, token, data=None, params=None):
+        records[7] = dict(records[7], is_deleted=True, updated_at="2025-01-02T00:00:00")
+        return {"success": True}
+
+    service.iter_all_master_data = fake_iter_all
+    service._make_request = fake_make_request
+
+    async def run():
+        await service.get_master_data_page("token", "departments", limit=10)
+        await service.delete_master_data("token", "departments", "r00007")
+        return await service.get_master_data_page("token", "departments", limit=10)
+
+    page = asyncio.run(run())
+    assert page.records[0]["_id"] == "r00007" and page.records[0]["is_deleted"]
+    print("✅ A delete is visible on the next page")
+
+
+def test_cursor_route_through_the_app():
+    """The JSON cursor route is reachable in the full app and walks every record"""
+    data = SyntheticData(hospitals=0, patients=0, devices=0)
+
+    async def run():
+        async with BenchmarkHarness(data) as harness:
+            html = await harness.client.get("/admin/master-data/districts")
+            assert html.headers["content-type"].startswith("text/html")
+            seen, params = [], {"limit": 100}
+            while True:
+                response = await harness.client.get("/api/master-data/districts/pages", params=params)
+                assert response.status_code == 200, response.text
+                body = response.json()
+                seen.extend(record["code"] for record in body["data"])
+                if not body["next_cursor"]:
+                    return seen, body["total"]
+                params["cursor"] = body["next_cursor"]
+
+    seen, total = asyncio.run(run())
+    assert len(seen) == total == len(set(seen)) and seen == sorted(seen) and total > 100
+    print(f"✅ {total} districts walked by next_cursor through the app")
+
+
+if __name__ == "__main__":
+    print("📄 Testing keyset pagination")
+    test_walk_covers_every_record_once()
+    test_paging_stable_while_records_change()
+    test_code_order()
+    test_invalid_cursor_rejected()
+    test_service_serves_pages_from_snapshot()
+    test_write_visible_on_next_page()
+    test_cursor_route_through_the_app()
+    print("🎉 All keyset pagination tests passed")
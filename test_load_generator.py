@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Offline test for the open-loop load generator against the fake Stardust app
+"""
+import asyncio
+
+from benchmark_suite import BenchmarkHarness
+from fake_stardust import SyntheticData
+from load_generator import LoadScenario, default_mix, find_knee, percentile, run_load_test, run_open_loop
+
+
+def test_load_steps_against_fake_stardust():
+    data = SyntheticData(hospitals=200, patients=10, devices=5)
+
+    async def scenario():
+        async with BenchmarkHarness(data) as harness:
+            async def send(load_scenario):
+                response = await harness.client.get(load_scenario.path, params=load_scenario.params)
+                return response.status_code
+
+            mix = default_mix([h["_id"] for h in data.hospitals[:3]], data.provinces[0]["code"],
+                              data.districts[0]["code"])
+            return await run_load_test(send, mix, [20, 40], duration_s=0.5, stop_after_knee=False)
+
+    report = asyncio.run(scenario())
+    assert [step["rate"] for step in report["steps"]] == [20, 40]
+    for step in report["steps"]:
+        assert step["requests"] > 0 and step["error_rate"] == 0, step["errors"]
+        assert step["p50_ms"] <= step["p99_ms"] <= step["p999_ms"] <= step["max_ms"]
+        assert step["peak_concurrency"] >= 1
+        assert sum(s["requests"] for s in step["scenarios"].values()) == step["requests"]
+    assert any("detail:hospital" in step["scenarios"] for step in report["steps"])
+    print(f"✅ Open-loop steps: {[(s['rate'], s['requests'], s['p99_ms']) for s in report['steps']]}")
+
+
+def test_open_loop_keeps_arriving_while_slow():
+    """Arrivals do not wait for responses, so slow requests pile up as concurrency"""
+    async def slow_send(scenario):
+        await asyncio.sleep(0.2)
+        return 200
+
+    step = asyncio.run(run_open_loop(slow_send, [LoadScenario("slow", "/")], rate=100, duration_s=0.5))
+    assert step["requests"] > 25
+    assert step["peak_concurrency"] >= 10 and step["mean_concurrency"] > 5
+    assert step["p50_ms"] >= 200
+    print(f"✅ {step['requests']} arrivals, peak concurrency {step['peak_concurrency']}")
+
+
+def test_errors_and_timeouts_counted():
+    async def flaky_send(scenario):
+        if scenario.label == "broken":
+            raise ConnectionError("refused")
+        if scenario.label == "hung":
+            await asyncio.sleep(10)
+        return 503 if scenario.label == "busy" else 200
+
+    mix = [LoadScenario(label, "/") for label in ("ok", "broken", "hung", "busy")]
+    step = asyncio.run(run_open_loop(flaky_send, mix, rate=80, duration_s=0.3, drain_timeout_s=0.2))
+    assert set(step["errors"]) == {"ConnectionError", "timeout", "503"}
+    assert step["scenarios"]["ok"]["error_rate"] == 0
+    assert step["scenarios"]["hung"]["errors"] == {"timeout": step["scenarios"]["hung"]["requests"]}
+    print(f"✅ Errors by kind: {step['errors']}")
+
+
+def test_knee_detection():
+    def step(rate, p99, throughput=None, error_rate=0.0):
+        return {"rate": rate, "offered_rps": rate, "throughput_rps": rate if throughput is None else throughput,
+                "p99_ms": p99, "error_rate": error_rate, "mean_concurrency": rate * p99 / 1000}
+
+    assert find_knee([step(5, 100), step(10, 120), step(20, 150)]) is None
+    knee = find_knee([step(5, 100), step(10, 120), step(20, 400)])
+    assert knee["rate"] == 20 and knee["last_healthy_rate"] == 10 and "p99" in knee["reasons"][0]
+    assert find_knee([step(5, 100), step(10, 110, throughput=7)])["rate"] == 10
+    assert find_knee([step(5, 100, error_rate=0.05)])["last_healthy_rate"] is None
+    assert percentile(list(range(1, 1001)), 99.9) == 999 and percentile([], 50) == 0.0
+    print("✅ Knee found from latency, throughput or errors")
+
+
+if __name__ == "__main__":
+    print("🚦 Testing load generator")
+    test_load_steps_against_fake_stardust()
+    test_open_loop_keeps_arriving_while_slow()
+    test_errors_and_timeouts_counted()
+    test_knee_detection()
+    print("🎉 All load generator tests passed")
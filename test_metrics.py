@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Offline test for the Prometheus /metrics endpoint
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.services.http_client import upstream
+from app.services.metrics import Histogram, http_request_duration, render_metrics, upstream_request_duration
+from app.services.stardust_api import StardustAPIService, stardust_api
+from app.models.auth import AuthContext, User
+from main import app, health_check
+
+
+class FakeClient:
+    """Stands in for the upstream pool: 200 for patients, 503 for devices"""
+
+    async def request(self, method, url, **kwargs):
+        status = 503 if "/devices/" in url else 200
+        return httpx.Response(status, json={"data": []}, request=httpx.Request(method, url))
+
+
+def test_histogram_exposition():
+    histogram = Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/x")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/x",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/x"} 3' in lines
+    print("✅ Cumulative histogram buckets rendered")
+
+
+def test_route_latency_by_template():
+    """Requests are labelled by route template, not raw path"""
+    client = TestClient(app)
+    before = http_request_duration.count("GET", "/api/hospitals/nearest", 401)
+    for lat in (13.7, 13.8, 13.9):
+        client.get(f"/api/hospitals/nearest?lat={lat}&lng=100.5")
+    client.get("/no-such-page-123")
+    assert http_request_duration.count("GET", "/api/hospitals/nearest", 401) == before + 3
+    assert http_request_duration.count("GET", "unmatched", 404) >= 1
+
+    body = client.get("/metrics").text
+    assert 'opera_http_request_duration_seconds_count{method="GET",route="/api/hospitals/nearest",status="401"}' in body
+    assert "no-such-page-123" not in body
+    for name in ("opera_http_requests_in_flight", "opera_upstream_pool_connections",
+                 "opera_cache_hit_ratio", "opera_single_flight_total"):
+        assert f"# TYPE {name}" in body, name
+    print("✅ /metrics exposes route histograms, pool, cache and single-flight series")
+
+
+def test_upstream_latency_by_endpoint_template():
+    service = StardustAPIService()
+    service.client = FakeClient()
+
+    async def run():
+        for patient_id in ("p1", "p2", "p3"):
+            await service.get_patient("token", patient_id)
+        try:
+            await service._send_once("GET", "/devices/ava4/abc", "token")
+        except Exception:
+            pass
+
+    asyncio.run(run())
+    assert upstream_request_duration.count("GET", "/patients/{id}", 200) >= 3
+    assert upstream_request_duration.count("GET", "/devices/ava4/{id}", 503) >= 1
+    print("✅ Stardust latency recorded per endpoint template and status")
+
+
+def test_scrape_survives_unknown_values():
+    """Mixed label types and an unreachable pool never break the exposition"""
+    histogram = Histogram("mixed_seconds", "Mixed", ("status",))
+    histogram.observe(0.1, 200)
+    histogram.observe(0.1, "error")
+    assert 'mixed_seconds_count{status="error"} 1' in histogram.render()
+
+    async def run():
+        # A mock transport has no httpcore pool to count connections in
+        await upstream.use_transport(httpx.MockTransport(lambda request: httpx.Response(200)))
+        try:
+            await upstream.get("http://stardust.test/ping")
+            return render_metrics()
+        finally:
+            await upstream.use_transport(None)
+
+    body = asyncio.run(run())
+    assert " None" not in body and "opera_upstream_pool_connections{" not in body
+    assert "opera_upstream_pool_wait_seconds_count " in body
+    print("✅ Unknown pool values skipped, pool wait histogram exported")
+
+
+def test_breaker_and_retry_counters():
+    breaker = stardust_api.breakers.get("/metrics-test")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    for _ in range(2):
+        try:
+            breaker.before_call()
+        except Exception:
+            pass
+    budget = stardust_api.retry_budget
+    retries, exhausted = budget.retries, budget.exhausted
+
+    body = render_metrics()
+    assert 'opera_circuit_breaker_trips_total{endpoint="/metrics-test"} 1' in body
+    assert 'opera_circuit_breaker_rejected_total{endpoint="/metrics-test"} 2' in body
+    assert 'opera_circuit_breaker_state{endpoint="/metrics-test"} 2' in body
+    assert f"opera_retries_total {retries}" in body
+    assert f"opera_retry_budget_exhausted_total {exhausted}" in body
+    print("✅ Breaker trips/rejections and retry counters exported")
+
+
+def test_health_detail_for_admins_only():
+    """Probes see status only; cache and upstream detail needs an admin session"""
+    assert TestClient(app).get("/health").json() == {"status": "healthy", "service": "opera-panel"}
+
+    def health_for(role):
+        request = Request({"type": "http", "method": "GET", "path": "/health", "headers": [],
+                           "state": {"auth": AuthContext(user=User(username="u", role=role), token="t")}})
+        return asyncio.run(health_check(request))
+
+    assert set(health_for("viewer")) == {"status", "service"}
+    assert {"caches", "upstream"} <= set(health_for("superadmin"))
+    print("✅ /health detail gated behind admin sessions")
+
+
+def test_observe_is_cheap():
+    histogram = Histogram("bench_seconds", "Bench", ("route",))
+    start = time.perf_counter()
+    for i in range(100000):
+        histogram.observe(0.003 * (i % 50), "/admin/master-data/{data_type}")
+    per_observe_us = (time.perf_counter() - start) * 1e6 / 100000
+    assert per_observe_us < 10, per_observe_us
+    print(f"✅ observe() costs {per_observe_us:.2f} µs")
+
+
+if __name__ == "__main__":
+    print("📈 Testing metrics")
+    test_histogram_exposition()
+    test_route_latency_by_template()
+    test_upstream_latency_by_endpoint_template()
+    test_scrape_survives_unknown_values()
+    test_breaker_and_retry_counters()
+    test_health_detail_for_admins_only()
+    test_observe_is_cheap()
+    print("🎉 All metrics tests passed")
@@ -3,14 +3,20 @@
 Opera Panel Performance Monitor
 Monitors and optimizes query performance automatically
 """
+import argparse
 import asyncio
 import aiohttp
+import itertools
 import time
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 from collections import defaultdict
 
+from load_generator import LoadScenario, default_mix, print_load_report, run_load_test
+
+LOGIN_DATA = {"username": "operapanel", "password": "Sim!443355"}
+
 class PerformanceMonitor:
     """Monitors and analyzes Opera Panel performance"""
     
@@ -19,6 +25,7 @@ class PerformanceMonitor:
         self.performance_data = []
         self.slow_query_threshold = 1000  # 1 second
         self.optimization_suggestions = []
+        self.load_report = None
         
     async def monitor_endpoint(self, session: aiohttp.ClientSession, 
                              endpoint: str, params: dict = None, 
@@ -127,8 +134,7 @@ class PerformanceMonitor:
         
         try:
             # Login first
-            login_data = {"username": "operapanel", "password": "Sim!443355"}
-            async with session.post(f"{self.base_url}{LOGIN_URL}", json=login_data) as response:
+            async with session.post(f"{self.base_url}{LOGIN_URL}", json=LOGIN_DATA) as response:
                 if response.status != 200:
                     print("❌ Login failed")
                     return
@@ -183,6 +189,59 @@ class PerformanceMonitor:
         finally:
             await session.close()
     
+    async def _login(self, session: aiohttp.ClientSession) -> bool:
+        async with session.post(f"{self.base_url}/auth/login", json=LOGIN_DATA) as response:
+            return response.status == 200
+
+    async def _discover_hospital_ids(self, session: aiohttp.ClientSession, count: int = 20) -> List[str]:
+        """Hospital IDs for detail-page scenarios, taken from the map API"""
+        params = {"min_lat": 5, "min_lng": 97, "max_lat": 21, "max_lng": 106, "limit": count}
+        try:
+            async with session.get(f"{self.base_url}/api/hospitals/within", params=params) as response:
+                if response.status != 200:
+                    return []
+                return [item["id"] for item in (await response.json()).get("data", []) if item.get("id")]
+        except aiohttp.ClientError:
+            return []
+
+    async def run_load_test(self, rates: Sequence[float] = (1, 2, 5, 10, 20, 50), duration_s: float = 30,
+                            sessions: int = 10, mix: Optional[List[LoadScenario]] = None,
+                            stop_after_knee: bool = True) -> dict:
+        """Open-loop load test: `sessions` logged-in admins sharing Poisson arrivals at each rate"""
+        print(f"🚀 Starting load test with {sessions} admin sessions...")
+        timeout = aiohttp.ClientTimeout(total=60)
+        clients = [aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False, limit=0), timeout=timeout)
+                   for _ in range(sessions)]
+        try:
+            logins = await asyncio.gather(*(self._login(client) for client in clients))
+            if not all(logins):
+                print(f"❌ Login failed for {logins.count(False)} of {sessions} sessions")
+                return {}
+            if mix is None:
+                mix = default_mix(await self._discover_hospital_ids(clients[0]))
+            print(f"✅ {sessions} sessions logged in, {len(mix)} scenarios in the mix")
+
+            rotation = itertools.cycle(clients)
+
+            async def send(scenario: LoadScenario) -> int:
+                # Redirects are not followed: a bounce to /login is an error, not a fast page
+                async with next(rotation).get(f"{self.base_url}{scenario.path}", params=scenario.params,
+                                              allow_redirects=False) as response:
+                    await response.read()
+                    return response.status
+
+            self.load_report = await run_load_test(send, mix, rates, duration_s, stop_after_knee)
+            self.load_report["sessions"] = sessions
+            self.load_report["generated_at"] = datetime.utcnow().isoformat()
+        finally:
+            await asyncio.gather(*(client.close() for client in clients))
+
+        print_load_report(self.load_report)
+        with open("load_test_report.json", "w", encoding="utf-8") as f:
+            json.dump(self.load_report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Load test report saved to: load_test_report.json")
+        return self.load_report
+    
     def generate_performance_report(self) -> dict:
         """Generate comprehensive performance report"""
         if not self.performance_data:
@@ -290,10 +349,24 @@ class PerformanceMonitor:
 
 async def main():
     """Main performance monitoring function"""
+    parser = argparse.ArgumentParser(description="Opera Panel performance monitor and load generator")
+    parser.add_argument("--base-url", default="http://localhost:5055")
+    parser.add_argument("--load", action="store_true", help="Run the open-loop load test instead of the suite")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 2, 5, 10, 20, 50],
+                        help="Arrival rates (requests/second) to step through")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per rate")
+    parser.add_argument("--sessions", type=int, default=10, help="Logged-in admin sessions sharing the load")
+    parser.add_argument("--keep-going", action="store_true", help="Run every rate even past the latency knee")
+    args = parser.parse_args()
+
     print("⚡ Opera Panel Performance Monitor")
     print("=" * 40)
     
-    monitor = PerformanceMonitor()
+    monitor = PerformanceMonitor(args.base_url)
+    
+    if args.load:
+        await monitor.run_load_test(args.rates, args.duration, args.sessions, stop_after_knee=not args.keep_going)
+        return
     
     # Run performance test suite
     await monitor.run_performance_test_suite()
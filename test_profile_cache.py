@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Offline test for the token-keyed user profile cache and local JWT validation in AuthService
+"""
+import asyncio
+import time
+
+from fastapi import HTTPException
+from jose import jwt
+
+from app.models.auth import UserProfile
+from app.services.auth import AuthService
+from app.services.cache import TTLCache
+
+
+def make_token(exp_offset: int) -> str:
+    return jwt.encode({"sub": "admin", "exp": int(time.time()) + exp_offset}, "test-secret", algorithm="HS256")
+
+
+def test_ttl_cache_expiry():
+    """Entries expire with the shorter of TTL and expires_at"""
+    cache = TTLCache("test_ttl_cache", ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, expires_at=time.time() - 1)  # already expired, never stored
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    print("✅ TTLCache honours expires_at")
+
+
+def test_profile_cache_hits_and_invalidation():
+    """Repeated lookups with the same token hit the cache until invalidated"""
+    service = AuthService()
+    calls = []
+
+    async def fake_fetch(token):
+        calls.append(token)
+        return UserProfile(username="admin", role="superadmin")
+
+    service._fetch_user_profile = fake_fetch
+    token = make_token(3600)
+
+    async def run():
+        for _ in range(3):
+            await service.get_user_profile(token)
+        service.invalidate_profile(token)
+        await service.get_user_profile(token)
+
+    asyncio.run(run())
+    assert len(calls) == 2, calls
+    stats = service.profile_cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2, stats
+    print(f"✅ Profile cache stats: {stats}")
+
+
+def test_expired_token_not_cached():
+    """Profiles for tokens past their exp claim are never cached"""
+    service = AuthService()
+    calls = []
+
+    async def fake_fetch(token):
+        calls.append(token)
+        return UserProfile(username="admin", role="superadmin")
+
+    service._fetch_user_profile = fake_fetch
+    token = make_token(-10)
+
+    async def run():
+        await service.get_user_profile(token)
+        await service.get_user_profile(token)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    print("✅ Expired tokens bypass the cache")
+
+
+def test_local_validation_reuses_profile_across_tokens():
+    """Local mode verifies tokens in-process and keys profiles by user claims"""
+    service = AuthService()
+    service.verification_key = "test-secret"
+    service.local_validation = True
+    calls = []
+
+    async def fake_fetch(token):
+        calls.append(token)
+        return UserProfile(username="admin", role="superadmin")
+
+    service._fetch_user_profile = fake_fetch
+    first = jwt.encode({"sub": "admin", "role": "admin", "exp": int(time.time()) + 60}, "test-secret", algorithm="HS256")
+    refreshed = jwt.encode({"sub": "admin", "role": "admin", "exp": int(time.time()) + 120}, "test-secret", algorithm="HS256")
+    promoted = jwt.encode({"sub": "admin", "role": "superadmin", "exp": int(time.time()) + 120}, "test-secret", algorithm="HS256")
+
+    async def run():
+        await service.get_user_profile(first)
+        await service.get_user_profile(refreshed)
+        await service.get_user_profile(promoted)
+
+    asyncio.run(run())
+    assert calls == [first, promoted], calls
+    print("✅ Local validation only calls /auth/me when claims change")
+
+
+def test_local_validation_rejects_bad_signature():
+    """Tokens signed with another key are rejected without a network call"""
+    service = AuthService()
+    service.verification_key = "test-secret"
+    service.local_validation = True
+    forged = jwt.encode({"sub": "admin", "role": "admin", "exp": int(time.time()) + 60}, "other-secret", algorithm="HS256")
+
+    try:
+        asyncio.run(service.get_user_profile(forged))
+    except HTTPException as e:
+        assert e.status_code == 401
+        print("✅ Forged token rejected locally")
+    else:
+        raise AssertionError("forged token accepted")
+
+
+if __name__ == "__main__":
+    print("🔍 Testing profile cache")
+    print("=" * 60)
+    test_ttl_cache_expiry()
+    test_profile_cache_hits_and_invalidation()
+    test_expired_token_not_cached()
+    test_local_validation_reuses_profile_across_tokens()
+    test_local_validation_rejects_bad_signature()
+    print("=" * 60)
+    print("🎉 All profile cache tests passed!")
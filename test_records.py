@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Offline test for compact cached reference records
+"""
+import asyncio
+import json
+import tracemalloc
+
+from app.routes.master_data import get_localized_name
+from app.services.codec import FastJSONResponse
+from app.services.records import LocalizedName, ReferenceRecord, reference_record
+from app.services.sync import DeltaSync
+from fake_stardust import SyntheticData
+
+NAME_SHAPES = [
+    {"_id": "p1", "code": 10, "name": [{"code": "en", "name": "Bangkok"}, {"code": "th", "name": "กรุงเทพมหานคร"}]},
+    {"_id": "p2", "code": 11, "name": [{"code": "th", "name": "สมุทรปราการ"}, {"code": "en", "name": "Samut Prakan"}]},
+    {"_id": "p3", "code": 12, "name": {"en": "Nonthaburi", "th": "นนทบุรี"}, "is_active": False},
+    {"_id": "p4", "code": 13, "name": "Pathum Thani", "__v": 0},
+    {"_id": "p5", "code": 14, "name": [{"code": "en", "name": "Ayutthaya", "alias": "Krung Kao"}]},
+    {"_id": "p6", "code": 15},
+]
+
+
+def test_mapping_view_keeps_stardust_shape():
+    for raw in NAME_SHAPES:
+        record = reference_record(raw)
+        assert record == raw and record.to_dict() == raw and dict(record) == raw, raw
+        assert json.loads(FastJSONResponse({"data": [record]}).body) == {"data": [raw]}
+    assert not hasattr(reference_record(NAME_SHAPES[0]), "__dict__")
+
+    fields = reference_record({"code": 10, "en_name": "Bangkok", "th_name": "กรุงเทพมหานคร", "name": "old"})
+    assert fields["name"] == {"en": "Bangkok", "th": "กรุงเทพมหานคร"} and fields["en_name"] == "Bangkok"
+    assert fields.get("district_code") is None and "district_code" not in fields
+    print("✅ Mapping view and JSON match what Stardust sent")
+
+
+def test_attribute_access_and_shared_names():
+    bangkok, samut_prakan, nonthaburi, text, raw, unnamed = (reference_record(r) for r in NAME_SHAPES)
+    assert bangkok.code == 10 and nonthaburi.is_active is False
+    assert isinstance(bangkok.name, LocalizedName) and bangkok.name.th == "กรุงเทพมหานคร"
+    assert get_localized_name(samut_prakan.name, "th") == "สมุทรปราการ"
+    assert get_localized_name(samut_prakan.name, "en") == "Samut Prakan"
+    assert get_localized_name(text.name, "th") == "Pathum Thani"
+    assert get_localized_name(raw.name, "en") == "Ayutthaya" and unnamed.name is None
+
+    again = reference_record({"code": 99, "name": {"en": "Bangkok", "th": "กรุงเทพมหานคร"}})
+    assert again.name is bangkok.name
+    assert reference_record(bangkok) is bangkok
+    print("✅ Attribute access for templates, one LocalizedName per distinct name")
+
+
+def test_delta_sync_compares_compact_records():
+    records = {r["_id"]: r for r in NAME_SHAPES}
+
+    class FakeAPI:
+        async def fetch_all_master_data(self, token, data_type, date_from=None):
+            return [dict(r, updated_at="2025-01-01T00:00:00") for r in records.values()]
+
+    sync = DeltaSync(FakeAPI(), "provinces", compact=reference_record)
+
+    async def run():
+        assert await sync.sync("token")
+        assert all(isinstance(r, ReferenceRecord) for r in sync.values())
+        assert not await sync.delta_sync("token")
+        records["p4"] = dict(records["p4"], name="Pathum")
+        assert await sync.delta_sync("token") and sync.last_changes == 1
+
+    asyncio.run(run())
+    print("✅ Delta sync merges compact records by value")
+
+
+def test_compact_records_use_less_memory():
+    data = SyntheticData(hospitals=0, patients=0, devices=0)
+    raw = json.dumps(data.districts + data.sub_districts, ensure_ascii=False)
+
+    def retained(build):
+        tracemalloc.start()
+        records = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size, records
+
+    dict_size, _ = retained(lambda: json.loads(raw))
+    compact_size, _ = retained(lambda: [reference_record(r) for r in json.loads(raw)])
+    assert compact_size < 0.7 * dict_size, (compact_size, dict_size)
+    print(f"✅ {len(data.sub_districts) + len(data.districts)} geography records: "
+          f"{dict_size / 1e6:.1f} MB as dicts, {compact_size / 1e6:.1f} MB compact")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing compact reference records...")
+    test_mapping_view_keeps_stardust_shape()
+    test_attribute_access_and_shared_names()
+    test_delta_sync_compares_compact_records()
+    test_compact_records_use_less_memory()
+    print("🎉 All compact record tests passed!")
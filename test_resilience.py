@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Offline test for Stardust retries, retry budget and circuit breakers
+"""
+import asyncio
+
+import httpx
+from fastapi import HTTPException
+
+import app.services.stardust_api as stardust_module
+from app.services.resilience import BreakerRegistry, CircuitBreaker, RetryBudget, endpoint_template
+from app.services.http_client import upstream
+from app.services.stardust_api import StardustAPIService
+
+# No real sleeping between retries in tests
+stardust_module.backoff_delay = lambda attempt: 0
+
+
+def make_service(failures, status_code=503):
+    """Service whose first `failures` upstream calls fail with status_code"""
+    service = StardustAPIService()
+    calls = []
+
+    async def fake_send_once(method, endpoint, token, data=None, params=None):
+        calls.append((method, endpoint))
+        if len(calls) <= failures:
+            raise HTTPException(status_code=status_code, detail="upstream error")
+        return {"data": []}
+
+    service._send_once = fake_send_once
+    return service, calls
+
+
+def test_get_retried_until_success():
+    """Transient 503s on a GET are retried"""
+    service, calls = make_service(failures=2)
+    result = asyncio.run(service.get_patients("token-a"))
+    assert result == {"data": []}
+    assert len(calls) == 3, calls
+    assert service.retry_budget.retries == 2
+    print(f"✅ GET succeeded after {len(calls)} attempts")
+
+
+def test_post_not_retried():
+    """Non-idempotent requests fail on the first transient error"""
+    service, calls = make_service(failures=1)
+    try:
+        asyncio.run(service.create_patient("token-a", {"patient_id": "p1"}))
+        assert False, "expected HTTPException"
+    except HTTPException as e:
+        assert e.status_code == 503
+    assert len(calls) == 1, calls
+    print("✅ POST not retried")
+
+
+def test_read_timeouts_not_retried():
+    """A GET that timed out waiting for the response is not sent again; connect errors are"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == "/patients":
+            raise httpx.ReadTimeout("timed out", request=request)
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run(call):
+        await upstream.use_transport(httpx.MockTransport(handler))
+        try:
+            await call
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            await upstream.use_transport(None)
+
+    service = StardustAPIService()
+    assert asyncio.run(run(service.get_patients("token-a"))) == 504 and calls == ["/patients"]
+    calls.clear()
+    assert asyncio.run(run(service.get_patient("token-a", "p1"))) == 503 and len(calls) == 3
+    print("✅ Read timeouts fail at once, connect errors are retried")
+
+
+def test_retries_stop_at_deadline():
+    """No retry starts once the overall deadline has passed"""
+    service, calls = make_service(failures=2)
+    deadline = stardust_module.STARDUST_RETRY_DEADLINE
+    stardust_module.STARDUST_RETRY_DEADLINE = 0
+    try:
+        asyncio.run(service.get_patients("token-a"))
+        assert False, "expected HTTPException"
+    except HTTPException as e:
+        assert e.status_code == 503
+    finally:
+        stardust_module.STARDUST_RETRY_DEADLINE = deadline
+    assert len(calls) == 1, calls
+    print("✅ Retries stop at the deadline")
+
+
+def test_client_errors_not_retried():
+    """4xx responses are returned immediately and don't count against the breaker"""
+    service, calls = make_service(failures=10, status_code=404)
+    try:
+        asyncio.run(service.get_patient("token-a", "p1"))
+        assert False, "expected HTTPException"
+    except HTTPException as e:
+        assert e.status_code == 404
+    assert len(calls) == 1
+    assert service.breakers.get("/patients/p1").consecutive_failures == 0
+    print("✅ 404 not retried")
+
+
+def test_breaker_opens_and_fails_fast():
+    """After repeated failures the endpoint fails fast without calling upstream"""
+    service, calls = make_service(failures=100)
+    for _ in range(2):
+        try:
+            asyncio.run(service.get_patient("token-a", "p1"))
+        except HTTPException:
+            pass
+    upstream_calls = len(calls)
+    breaker = service.breakers.get("/patients/p2")
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 1, breaker.stats()
+
+    try:
+        asyncio.run(service.get_patient("token-a", "p3"))
+        assert False, "expected HTTPException"
+    except HTTPException as e:
+        assert e.status_code == 503
+    assert len(calls) == upstream_calls
+    assert service.resilience_stats()["breakers"]["/patients/{id}"]["rejected"] >= 1
+    print(f"✅ Breaker opened after {upstream_calls} failures: {breaker.stats()}")
+
+
+def test_breaker_half_open_probe():
+    """After the recovery timeout one probe is allowed; success closes the breaker"""
+    breaker = CircuitBreaker("/hospitals", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    try:
+        breaker.before_call()
+        assert False, "second concurrent probe should be rejected"
+    except HTTPException:
+        pass
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    print("✅ Half-open breaker allows a single probe")
+
+
+def test_probe_released_however_it_ends():
+    """A probe that fails to decode or is cancelled does not leave the breaker half-open for good"""
+    service = StardustAPIService()
+    service.breakers = BreakerRegistry(failure_threshold=1, recovery_timeout=0)
+    breaker = service.breakers.get("/hospitals")
+    outcomes = [ValueError("Expecting value: <html>"), "hang", {"data": []}]
+
+    async def fake_send_once(method, endpoint, token, data=None, params=None):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome == "hang":
+            await asyncio.sleep(3600)
+        return outcome
+
+    service._send_once = fake_send_once
+
+    async def run():
+        breaker.record_failure()
+        try:
+            await service._send_request("GET", "/hospitals", "token")
+            assert False, "undecodable body should raise"
+        except ValueError:
+            pass
+        assert breaker.trips == 2 and breaker.state == CircuitBreaker.HALF_OPEN
+
+        probe = asyncio.ensure_future(service._send_request("GET", "/hospitals", "token"))
+        await asyncio.sleep(0)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return await service._send_request("GET", "/hospitals", "token")
+
+    assert asyncio.run(run()) == {"data": []}
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    stuck = CircuitBreaker("/patients", failure_threshold=1, recovery_timeout=0, probe_timeout=0)
+    stuck.record_failure()
+    assert stuck.before_call() and stuck.before_call(), "a probe past its timeout should not block the next"
+    print("✅ Probes are released on decode errors, cancellation and timeout")
+
+
+def test_retry_budget_exhausts():
+    """Retries stop once the budget is spent"""
+    budget = RetryBudget(ratio=0.1, minimum=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    for _ in range(11):
+        budget.deposit()
+    assert budget.withdraw()
+    print(f"✅ Retry budget: {budget.stats()}")
+
+
+def test_endpoint_template():
+    assert endpoint_template("/patients/abc123") == "/patients/{id}"
+    assert endpoint_template("/devices/ava4") == "/devices/ava4"
+    assert endpoint_template("/devices/ava4/AVA4-001") == "/devices/ava4/{id}"
+    assert endpoint_template("/admin/master-data/hospitals/6650f") == "/admin/master-data/hospitals/{id}"
+    assert endpoint_template("/admin/master-data/provinces") == "/admin/master-data/provinces"
+    print("✅ Endpoint templates collapse record IDs")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Stardust resilience layer")
+    test_get_retried_until_success()
+    test_post_not_retried()
+    test_read_timeouts_not_retried()
+    test_retries_stop_at_deadline()
+    test_client_errors_not_retried()
+    test_breaker_opens_and_fails_fast()
+    test_breaker_half_open_probe()
+    test_probe_released_however_it_ends()
+    test_retry_budget_exhausts()
+    test_endpoint_template()
+    print("🎉 All resilience tests passed")
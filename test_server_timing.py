@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Offline test for per-request span trees reported as Server-Timing
+"""
+import asyncio
+import json
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse
+from fastapi.testclient import TestClient
+
+import app.services.tracing as tracing
+from app.models.auth import AuthContext, User
+from app.services.tracing import ServerTimingMiddleware, span, trace_methods
+from main import app as panel_app
+
+
+@trace_methods("fake")
+class FakeService:
+    async def get_provinces(self):
+        with span("GET /admin/master-data/provinces"):
+            await asyncio.sleep(0.01)
+
+    async def get_page(self):
+        await self.get_provinces()
+        await asyncio.sleep(0.005)
+
+
+def make_app(role="viewer"):
+    app = FastAPI()
+    service = FakeService()
+
+    @app.get("/page", response_class=HTMLResponse)
+    async def page(request: Request):
+        request.state.auth = AuthContext(user=User(username="u", role=role), token="t")
+        await service.get_page()
+        return HTMLResponse("<html><body><h1>Page</h1></body></html>")
+
+    app.add_middleware(ServerTimingMiddleware)
+    return TestClient(app)
+
+
+def timing_entries(header):
+    return {match.group(1): float(match.group(2)) for match in re.finditer(r'desc="([^"]+)";dur=([\d.]+)', header)}
+
+
+def test_span_tree_in_header():
+    assert "server-timing" not in make_app().get("/page").headers  # not for regular users
+    response = make_app(role="superadmin").get("/page")
+    header = response.headers["server-timing"]
+    entries = timing_entries(header)
+    assert header.startswith("total;dur=")
+    assert entries["fake.get_page"] >= entries["fake.get_page > fake.get_provinces"] >= 10
+    assert "fake.get_page > fake.get_provinces > GET /admin/master-data/provinces" in entries
+    assert "server-timing" not in response.text
+    print(f"✅ Server-Timing: {header}")
+
+
+def test_admin_footer():
+    footer_url = "/page?debug_timing=1"
+    assert 'id="server-timing"' not in make_app().get(footer_url).text  # viewers never get it
+    assert 'id="server-timing"' not in make_app(role="superadmin").get("/page?xdebug_timing=1").text
+
+    response = make_app(role="superadmin").get(footer_url)
+    body = response.text
+    assert body.index('id="server-timing"') < body.index("</body>")
+    assert int(response.headers["content-length"]) == len(response.content)
+    tree = json.loads(re.search(r'id="server-timing">(.*?)</script>', body).group(1))
+    assert tree["children"][0]["name"] == "fake.get_page"
+    print("✅ Admin JSON footer with the span tree")
+
+
+def test_template_render_span():
+    assert "server-timing" not in TestClient(panel_app).get("/login").headers
+    tracing.SERVER_TIMING_DEBUG = True
+    try:
+        response = TestClient(panel_app).get("/login")
+    finally:
+        tracing.SERVER_TIMING_DEBUG = False
+    assert "render auth/login.html" in response.headers["server-timing"]
+    print("✅ Template rendering timed")
+
+
+def test_untraced_calls_are_noops():
+    """Outside a request nothing is recorded"""
+    asyncio.run(FakeService().get_page())
+    with span("orphan") as orphan:
+        assert orphan is None
+    print("✅ No spans outside traced requests")
+
+
+if __name__ == "__main__":
+    print("⏱️ Testing Server-Timing spans")
+    test_span_tree_in_header()
+    test_admin_footer()
+    test_template_render_span()
+    test_untraced_calls_are_noops()
+    print("🎉 All Server-Timing tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Offline test for single-flight coalescing of identical Stardust GETs
+"""
+import asyncio
+
+from app.services.stardust_api import StardustAPIService
+
+
+def make_service():
+    service = StardustAPIService()
+    calls = []
+
+    async def fake_send(method, endpoint, token, data=None, params=None):
+        calls.append((method, endpoint, token, params))
+        await asyncio.sleep(0.01)
+        return {"data": {"provinces": [{"code": 10}]}}
+
+    service._send_request = fake_send
+    return service, calls
+
+
+def test_identical_gets_share_one_call():
+    """Concurrent identical GETs hit upstream once and share the result"""
+    service, calls = make_service()
+
+    async def run():
+        return await asyncio.gather(*[
+            service.get_provinces("token-a", 0, 1000) for _ in range(5)
+        ])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1, calls
+    assert all(r is results[0] for r in results)
+    stats = service.single_flight_stats()
+    assert stats["leaders"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0, stats
+    print(f"✅ 5 concurrent GETs -> 1 upstream call: {stats}")
+
+
+def test_different_scope_not_coalesced():
+    """Different tokens, params or methods never share a call"""
+    service, calls = make_service()
+
+    async def run():
+        await asyncio.gather(
+            service.get_provinces("token-a", 0, 1000),
+            service.get_provinces("token-b", 0, 1000),
+            service.get_provinces("token-a", 0, 10),
+        )
+
+    asyncio.run(run())
+    assert len(calls) == 3, calls
+    print("✅ Distinct tokens/params are sent separately")
+
+
+def test_errors_propagate_to_all_waiters():
+    """A failed shared call raises in every coalesced caller"""
+    service = StardustAPIService()
+
+    async def failing_send(method, endpoint, token, data=None, params=None):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    service._send_request = failing_send
+
+    async def run():
+        return await asyncio.gather(
+            service.get_provinces("token-a"), service.get_provinces("token-a"), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results), results
+    print("✅ Errors reach every waiter")
+
+
+if __name__ == "__main__":
+    print("🔍 Testing single-flight request coalescing")
+    print("=" * 60)
+    test_identical_gets_share_one_call()
+    test_different_scope_not_coalesced()
+    test_errors_propagate_to_all_waiters()
+    print("=" * 60)
+    print("🎉 All single-flight tests passed!")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Offline test for the in-memory hospital spatial index (k-nearest and bounding box)
+"""
+import asyncio
+import random
+import time
+
+from app.services.hospitals import HospitalIndex, hospital_filter
+from app.services.spatial import SpatialGrid, haversine_km, record_point
+from app.services.stardust_api import StardustAPIService
+
+
+def make_hospitals(count, seed=7):
+    """Hospitals scattered over Thailand's extent in the location formats seen upstream"""
+    rng = random.Random(seed)
+    hospitals = []
+    for i in range(count):
+        lat, lng = rng.uniform(5.6, 20.5), rng.uniform(97.3, 105.6)
+        record = {"_id": f"h{i}", "code": i, "name": {"en": f"Hospital {i}"},
+                  "hospital_type_code": str(i % 5), "is_active": i % 3 != 0,
+                  "updated_at": "2025-01-01T00:00:00"}
+        if i % 3 == 0:
+            record["location"] = [lat, lng]
+        elif i % 3 == 1:
+            record["location"] = {"type": "Point", "coordinates": [lng, lat]}
+        else:
+            record["latitude"], record["longitude"] = lat, lng
+        hospitals.append(record)
+    return hospitals
+
+
+def test_record_point_formats():
+    assert record_point({"location": [13.75, 100.5]}) == (13.75, 100.5)
+    assert record_point({"location": [100.5, 13.75]}) == (13.75, 100.5)
+    assert record_point({"location": {"type": "Point", "coordinates": [100.5, 13.75]}}) == (13.75, 100.5)
+    assert record_point({"latitude": "13.75", "longitude": "100.5"}) == (13.75, 100.5)
+    for record in ({}, {"location": [0, 0]}, {"location": ["x", 1]}, {"location": [200, 200]}):
+        assert record_point(record) is None
+    print("✅ Coordinates read from list, GeoJSON and latitude/longitude fields")
+
+
+def test_nearest_matches_brute_force():
+    """Grid k-nearest equals a full scan, with and without filters"""
+    hospitals = make_hospitals(2000)
+    grid = SpatialGrid(hospitals)
+    rng = random.Random(1)
+    for _ in range(50):
+        lat, lng = rng.uniform(5, 21), rng.uniform(97, 106)
+        for predicate in (None, hospital_filter(is_active=True, hospital_type_code=2)):
+            candidates = [h for h in hospitals if predicate is None or predicate(h)]
+            expected = sorted(candidates, key=lambda h: haversine_km(lat, lng, *record_point(h)))[:10]
+            got = [record for _, record in grid.nearest(lat, lng, 10, predicate=predicate)]
+            assert [h["_id"] for h in got] == [h["_id"] for h in expected]
+    print("✅ k-nearest matches a brute-force scan")
+
+
+def test_within_and_max_distance():
+    hospitals = make_hospitals(2000)
+    grid = SpatialGrid(hospitals)
+    box = (13.0, 100.0, 14.5, 101.0)
+    expected = {h["_id"] for h in hospitals
+                if box[0] <= record_point(h)[0] <= box[2] and box[1] <= record_point(h)[1] <= box[3]}
+    assert {h["_id"] for h in grid.within(*box)} == expected and expected
+    assert len(grid.within(*box, limit=3)) == 3
+
+    nearby = grid.nearest(13.75, 100.5, 1000, max_distance_km=50)
+    assert nearby and all(distance <= 50 for distance, _ in nearby)
+    assert len(nearby) == sum(1 for h in hospitals if haversine_km(13.75, 100.5, *record_point(h)) <= 50)
+    print(f"✅ Bounding box ({len(expected)} hospitals) and radius queries")
+
+
+def test_queries_are_sub_millisecond():
+    grid = HospitalIndex(make_hospitals(20000)).spatial_index
+    rng = random.Random(2)
+    points = [(rng.uniform(6, 20), rng.uniform(98, 105)) for _ in range(500)]
+    start = time.perf_counter()
+    for lat, lng in points:
+        grid.nearest(lat, lng, 10)
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(points)
+    assert per_query_ms < 1.0, per_query_ms
+    print(f"✅ k=10 nearest over 20k hospitals: {per_query_ms:.3f} ms/query ({grid.stats()})")
+
+
+def test_service_answers_from_snapshot():
+    service = StardustAPIService()
+    calls = []
+
+    async def fake_fetch_all(token, data_type, date_from=None):
+        calls.append(data_type)
+        return make_hospitals(500)
+
+    service.fetch_all_master_data = fake_fetch_all
+
+    async def fake_iter_all(token, data_type, date_from=None):
+        for record in await fake_fetch_all(token, data_type, date_from):
+            yield record
+
+    service.iter_all_master_data = fake_iter_all
+
+    async def run():
+        nearest = await service.nearest_hospitals("token", 13.75, 100.5, k=5, is_active=True)
+        inside = await service.hospitals_within("token", 5, 97, 21, 106, hospital_type_code="1")
+        return nearest, inside
+
+    nearest, inside = asyncio.run(run())
+    assert calls == ["hospitals"], calls
+    assert len(nearest) == 5 and all(record["is_active"] for _, record in nearest)
+    assert len(inside) == 100 and all(record["hospital_type_code"] == "1" for record in inside)
+    print("✅ Geo queries served from the hospital snapshot (1 upstream sweep)")
+
+
+if __name__ == "__main__":
+    print("🗺️ Testing hospital spatial index")
+    test_record_point_formats()
+    test_nearest_matches_brute_force()
+    test_within_and_max_distance()
+    test_queries_are_sub_millisecond()
+    test_service_answers_from_snapshot()
+    print("🎉 All spatial index tests passed")
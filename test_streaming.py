@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Offline test for streaming decoding of Stardust list responses
+"""
+import asyncio
+import json
+from contextlib import aclosing
+
+import httpx
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from app.services.http_client import upstream
+from app.services.metrics import upstream_requests_in_flight
+from app.services.resilience import BreakerRegistry, CircuitBreaker
+from app.services.streaming import ArrayStreamDecoder
+from app.services.stardust_api import StardustAPIService
+from app.services.tracing import Span, _current, span
+from fake_stardust import SyntheticData, create_fake_stardust
+
+
+def split(body: bytes, path, chunk_size: int):
+    decoder = ArrayStreamDecoder(path)
+    items = []
+    for start in range(0, len(body), chunk_size):
+        items.extend(decoder.feed(body[start:start + chunk_size]))
+    return decoder, items
+
+
+def test_decoder_any_chunking():
+    records = [{"code": i, "name": ["บ้าน \"ใหม่\" [x]", "a,b}{"], "tags": [[1, 2], {"data": []}]} for i in range(5)]
+    body = json.dumps({"success": True, "data": {"total": 5, "data": records, "skip": 0},
+                       "note": "data: [1, 2]"}, ensure_ascii=False).encode("utf-8")
+    for chunk_size in (1, 2, 7, 64, len(body)):
+        decoder, items = split(body, ("data", "data"), chunk_size)
+        assert items == records, chunk_size
+        envelope = json.loads(decoder.envelope())
+        assert envelope["data"] == {"total": 5, "data": [], "skip": 0} and envelope["note"] == "data: [1, 2]"
+        assert decoder.found and decoder.items == 5
+    print("✅ Records decoded at every chunk size (strings, escapes, nesting, UTF-8)")
+
+
+def test_decoder_root_and_missing_paths():
+    _, items = split(b' [1, "two", {"three": 3}, [4], 12345, true, null] ', (), 3)
+    assert items == [1, "two", {"three": 3}, [4], 12345, True, None]
+
+    body = b'{"items": [], "data": {"data": {"not": "a list"}}}'
+    decoder, items = split(body, ("data", "data"), 5)
+    assert items == [] and not decoder.found and decoder.envelope() == body.decode()
+
+    decoder, items = split(b'{"d\\u0061ta": {"data": [{"a": 1}]}}', ("data", "data"), 4)
+    assert items == [{"a": 1}]
+    print("✅ Root arrays, escaped keys and missing paths handled")
+
+
+def test_decoder_split_at_every_byte():
+    arrays = [
+        [-2.5, 0, 12345, 1e-07, -0.0, 6.02e+23, 3, 10],
+        ["", "a", "ไทย", "quote \" and \\", "[1, 2]", "}, {"],
+        [True, False, None, True, 1, None],
+        [{"n": -2.5}, [1.25, 2], "x", 7, {"a": [True]}, 100],
+    ]
+    for records in arrays:
+        for body in (json.dumps(records, ensure_ascii=False), json.dumps({"data": records}, indent=1)):
+            body = body.encode("utf-8")
+            path = ("data",) if body.startswith(b"{") else ()
+            for cut in range(1, len(body)):
+                decoder = ArrayStreamDecoder(path)
+                items = list(decoder.feed(body[:cut])) + list(decoder.feed(body[cut:]))
+                assert items == records, (body[:cut], body[cut:], items)
+    print("✅ Numbers, strings and literals decoded whole at every split point")
+
+
+def test_streamed_sync_matches_buffered():
+    data = SyntheticData(hospitals=2500)
+    fake = create_fake_stardust(data)
+    service = StardustAPIService()
+
+    async def run():
+        await upstream.use_transport(httpx.ASGITransport(app=fake))
+        try:
+            buffered = await service.fetch_all_master_data("token", "hospitals", page_size=1000)
+            streamed = [record async for record in service.iter_all_master_data("token", "hospitals", page_size=1000)]
+
+            envelope = {}
+            page = [record async for record in service.stream_master_data("token", "provinces", 0, 10, envelope)]
+
+            # Leaving early cancels the pages still streaming
+            partial = []
+            async for record in service.iter_all_master_data("token", "sub_districts", page_size=500):
+                partial.append(record)
+                if len(partial) == 600:
+                    break
+            return buffered, streamed, page, envelope, partial
+        finally:
+            await upstream.use_transport(None)
+
+    buffered, streamed, page, envelope, partial = asyncio.run(run())
+    key = lambda record: record["_id"]
+    assert len(streamed) == 2500 and sorted(streamed, key=key) == sorted(buffered, key=key)
+    assert len(page) == 10 and envelope["total"] == len(data.provinces) and envelope["limit"] == 10
+    assert len(partial) == 600
+    print(f"✅ Streamed sweep matches the buffered one ({len(streamed)} hospitals)")
+
+
+def test_failed_page_stops_the_sweep():
+    fake = create_fake_stardust(SyntheticData(hospitals=0, patients=0, devices=0))
+
+    @fake.middleware("http")
+    async def fail_one_page(request, call_next):
+        if request.query_params.get("skip") == "2000":
+            return JSONResponse({"detail": "boom"}, status_code=500)
+        return await call_next(request)
+
+    service = StardustAPIService()
+
+    async def run():
+        await upstream.use_transport(httpx.ASGITransport(app=fake))
+        try:
+            received = 0
+            try:
+                async for _ in service.iter_all_master_data("token", "sub_districts", page_size=1000):
+                    received += 1
+                    await asyncio.sleep(0)  # slow consumer: the other pages wait on the full queue
+            except HTTPException as e:
+                assert e.status_code == 500
+            else:
+                assert False, "the failed page should end the sweep"
+            return received, asyncio.all_tasks() - {asyncio.current_task()}
+        finally:
+            await upstream.use_transport(None)
+
+    in_flight = upstream_requests_in_flight.value()
+    received, leftover = asyncio.run(run())
+    assert not leftover, leftover
+    assert upstream_requests_in_flight.value() == in_flight
+    print(f"✅ A failed page cancels the other pages ({received} records before the error)")
+
+
+def test_abandoned_stream_releases_probe():
+    fake = create_fake_stardust(SyntheticData(hospitals=0, patients=0, devices=0))
+    service = StardustAPIService()
+    service.breakers = BreakerRegistry(failure_threshold=1, recovery_timeout=0)
+    breaker = service.breakers.get("/admin/master-data/provinces")
+    breaker.record_failure()
+
+    async def run():
+        await upstream.use_transport(httpx.ASGITransport(app=fake))
+        try:
+            async with aclosing(service.stream_master_data("token", "provinces", 0, 10)) as records:
+                async for _ in records:
+                    break  # the probe's consumer leaves after one record
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            return [record async for record in service.stream_master_data("token", "provinces", 0, 10)]
+        finally:
+            await upstream.use_transport(None)
+
+    assert len(asyncio.run(run())) == 10 and breaker.state == CircuitBreaker.CLOSED
+    print("✅ A stream closed mid-probe lets the next call probe")
+
+
+def test_stream_span_leaves_out_the_consumer():
+    """The consumer's spans and time between yields are not charged to the stream"""
+    fake = create_fake_stardust(SyntheticData(hospitals=0, patients=0, devices=0))
+    service = StardustAPIService()
+    root = Span("request")
+
+    async def run():
+        await upstream.use_transport(httpx.ASGITransport(app=fake))
+        token = _current.set(root)
+        try:
+            async for _ in service.stream_master_data("token", "provinces", 0, 5):
+                with span("consume"):
+                    await asyncio.sleep(0.02)
+        finally:
+            _current.reset(token)
+            await upstream.use_transport(None)
+
+    asyncio.run(run())
+    stream, *consumed = root.children
+    assert stream.name == "stream GET /admin/master-data/provinces" and not stream.children
+    assert [child.name for child in consumed] == ["consume"] * 5
+    assert stream.duration_ms < sum(child.duration_ms for child in consumed)
+    print(f"✅ Stream span times fetch and decode only ({stream.duration_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing streaming decoding...")
+    test_decoder_any_chunking()
+    test_decoder_root_and_missing_paths()
+    test_decoder_split_at_every_byte()
+    test_streamed_sync_matches_buffered()
+    test_failed_page_stops_the_sweep()
+    test_abandoned_stream_releases_probe()
+    test_stream_span_leaves_out_the_consumer()
+    print("🎉 All streaming tests passed!")
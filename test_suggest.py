@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Offline test for master data typeahead suggestions (prefix index)
+"""
+import asyncio
+import time
+
+from app.services.search import PrefixIndex
+from app.services.stardust_api import StardustAPIService
+
+SUB_DISTRICTS = [
+    {"_id": f"s{i}", "code": 100000 + i, "district_code": 1000 + i // 8, "province_code": 10 + i // 100,
+     "name": [{"code": "th", "name": f"ตำบลบางพลี{i}"}, {"code": "en", "name": f"Bang Phli {i}"}],
+     "is_active": i % 50 != 0}
+    for i in range(7000)
+]
+
+
+def make_service():
+    service = StardustAPIService()
+
+    async def fake_fetch_all(token, data_type, date_from=None):
+        return {"sub-districts": SUB_DISTRICTS}.get(data_type, [])
+
+    service.fetch_all_master_data = fake_fetch_all
+
+    async def fake_iter_all(token, data_type, date_from=None):
+        for record in await fake_fetch_all(token, data_type, date_from):
+            yield record
+
+    service.iter_all_master_data = fake_iter_all
+    return service
+
+
+def test_prefix_matching():
+    index = PrefixIndex([
+        {"code": 10, "th_name": "กรุงเทพมหานคร", "en_name": "Bangkok"},
+        {"code": 11, "th_name": "สมุทรปราการ", "en_name": "Samut Prakan"},
+        {"code": 1, "name": {"th": "โรงพยาบาลศิริราช", "en": "Siriraj Hospital"}},
+    ])
+    assert [r["code"] for r in index.suggest("ba")] == [10]
+    assert [r["code"] for r in index.suggest("prak")] == [11]      # later English word
+    assert [r["code"] for r in index.suggest("ศิริ")] == [1]        # Thai without "โรงพยาบาล"
+    assert [r["code"] for r in index.suggest("สมุ")] == [11]
+    assert [r["code"] for r in index.suggest("1")] == [1, 10, 11]  # codes, shortest first
+    assert index.suggest("zz") == []
+    print("✅ Prefix matching on names and codes")
+
+
+def test_sub_district_suggestions_fast_and_filtered():
+    """Top-k over ~7000 sub-districts in well under 5 ms, tiny payload"""
+    service = make_service()
+
+    async def run():
+        await service.suggest_master_data("token", "sub-districts", "warm-up")
+        start = time.perf_counter()
+        for _ in range(100):
+            matches = await service.suggest_master_data("token", "sub-districts", "บางพลี", 10)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / 100
+        filtered = await service.suggest_master_data("token", "sub-districts", "bang", 10, district_code=1001)
+        return matches, filtered, elapsed_ms
+
+    matches, filtered, elapsed_ms = asyncio.run(run())
+    assert len(matches) == 10 and all(m["is_active"] for m in matches)
+    assert len(filtered) == 8 and all(m["district_code"] == 1001 for m in filtered)  # s8 .. s15
+    assert elapsed_ms < 5, elapsed_ms
+    print(f"✅ Sub-district suggestions in {elapsed_ms:.3f} ms per lookup")
+
+
+if __name__ == "__main__":
+    print("⌨️  Testing typeahead suggestions")
+    test_prefix_matching()
+    test_sub_district_suggestions_fast_and_filtered()
+    print("🎉 All suggestion tests passed")